@@ -1,23 +1,83 @@
 import numpy as np
 import pandas as pd
-from sklearn.ensemble import RandomForestClassifier
+from sklearn.base import BaseEstimator, ClassifierMixin
+from sklearn.ensemble import RandomForestClassifier, HistGradientBoostingClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.pipeline import make_pipeline
 from sklearn.preprocessing import StandardScaler
-from sklearn.model_selection import train_test_split
-from datetime import datetime, timedelta
+from datetime import datetime
 from database import get_db
-from models import Checklist, Barn
-import joblib
+from models import Checklist
+from drift import save_training_baseline
+from logging_setup import get_logger
 import os
 
+logger = get_logger(__name__)
+
+# Estimator used by the global predictor, see RISK_MODELS
+RISK_MODEL = os.getenv("FARMTWIN_RISK_MODEL", "random_forest")
+
+FEATURE_COLUMNS = [
+    'hygiene_score', 'mortality_count', 'feed_quality',
+    'water_quality', 'ventilation_score', 'temperature', 'humidity'
+]
+# Used when a checklist field was left empty
+FEATURE_DEFAULTS = [7, 0, 8, 8, 7, 22, 55]
+
+def threshold_risk_levels(features):
+    """Vectorized calculate_risk_level over an (n, 7) array of checklist features"""
+    hygiene, mortality, feed_quality, water_quality, ventilation, temperature, humidity = (
+        np.asarray(features, dtype=float).T
+    )
+    
+    risk_score = (
+        np.where(hygiene < 5, 3, np.where(hygiene < 7, 1, 0))
+        + np.where(mortality > 3, 3, np.where(mortality > 1, 1, 0))
+        + np.where(feed_quality < 6, 2, np.where(feed_quality < 8, 1, 0))
+        + np.where(water_quality < 7, 2, np.where(water_quality < 8, 1, 0))
+        + np.where(ventilation < 6, 2, np.where(ventilation < 7, 1, 0))
+        + np.where((temperature < 15) | (temperature > 28), 2,
+                   np.where((temperature < 18) | (temperature > 25), 1, 0))
+        + np.where((humidity < 30) | (humidity > 80), 2,
+                   np.where((humidity < 40) | (humidity > 70), 1, 0))
+    )
+    
+    return np.where(risk_score >= 6, 2, np.where(risk_score >= 3, 1, 0))
+
+class ThresholdRiskModel(ClassifierMixin, BaseEstimator):
+    """The checklist threshold rules as an estimator: nothing to fit, one vectorized pass per batch"""
+    
+    def fit(self, X, y=None):
+        self.classes_ = np.array([0, 1, 2])
+        return self
+    
+    def predict(self, X):
+        return threshold_risk_levels(X)
+    
+    def predict_proba(self, X):
+        return np.eye(len(self.classes_))[threshold_risk_levels(X)]
+
+# Available estimators; linear models get their own scaler, trees don't need one
+RISK_MODELS = {
+    "random_forest": lambda: RandomForestClassifier(n_estimators=100, random_state=42),
+    "hist_gradient_boosting": lambda: HistGradientBoostingClassifier(random_state=42),
+    "logistic": lambda: make_pipeline(StandardScaler(), LogisticRegression(max_iter=1000)),
+    "threshold": ThresholdRiskModel,
+}
+
 class FarmRiskPredictor:
-    def __init__(self):
-        self.model = RandomForestClassifier(n_estimators=100, random_state=42)
-        self.scaler = StandardScaler()
+    def __init__(self, model_name=None):
+        self.model_name = model_name or RISK_MODEL
+        if self.model_name not in RISK_MODELS:
+            raise ValueError(
+                f"Unknown risk model '{self.model_name}', expected one of: {', '.join(RISK_MODELS)}"
+            )
+        self.model = RISK_MODELS[self.model_name]()
         self.is_trained = False
-        self.feature_columns = [
-            'hygiene_score', 'mortality_count', 'feed_quality', 
-            'water_quality', 'ventilation_score', 'temperature', 'humidity'
-        ]
+        self.model_version = None
+        self.feature_means = None
+        self.feature_columns = list(FEATURE_COLUMNS)
+        self.feature_defaults = list(FEATURE_DEFAULTS)
     
     def prepare_training_data(self):
         """Prepare training data from database"""
@@ -29,23 +89,14 @@ class FarmRiskPredictor:
             if len(checklists) < 10:  # Not enough data for training
                 return self.create_synthetic_data()
             
-            data = []
-            for checklist in checklists:
-                features = [
-                    checklist.hygiene_score,
-                    checklist.mortality_count,
-                    checklist.feed_quality,
-                    checklist.water_quality,
-                    checklist.ventilation_score,
-                    checklist.temperature,
-                    checklist.humidity
-                ]
-                
-                # Calculate risk level based on thresholds
-                risk_level = self.calculate_risk_level(features)
-                data.append(features + [risk_level])
+            df = pd.DataFrame(
+                [[getattr(checklist, column) for column in self.feature_columns] for checklist in checklists],
+                columns=self.feature_columns,
+                dtype=float
+            ).fillna(dict(zip(self.feature_columns, self.feature_defaults)))
             
-            df = pd.DataFrame(data, columns=self.feature_columns + ['risk_level'])
+            # Calculate risk level based on thresholds
+            df['risk_level'] = threshold_risk_levels(df[self.feature_columns])
             return df
             
         finally:
@@ -78,59 +129,7 @@ class FarmRiskPredictor:
     
     def calculate_risk_level(self, features):
         """Calculate risk level based on feature thresholds"""
-        hygiene, mortality, feed_quality, water_quality, ventilation, temperature, humidity = features
-        
-        risk_score = 0
-        
-        # Hygiene score (lower is worse)
-        if hygiene < 5:
-            risk_score += 3
-        elif hygiene < 7:
-            risk_score += 1
-        
-        # Mortality count (higher is worse)
-        if mortality > 3:
-            risk_score += 3
-        elif mortality > 1:
-            risk_score += 1
-        
-        # Feed quality (lower is worse)
-        if feed_quality < 6:
-            risk_score += 2
-        elif feed_quality < 8:
-            risk_score += 1
-        
-        # Water quality (lower is worse)
-        if water_quality < 7:
-            risk_score += 2
-        elif water_quality < 8:
-            risk_score += 1
-        
-        # Ventilation (lower is worse)
-        if ventilation < 6:
-            risk_score += 2
-        elif ventilation < 7:
-            risk_score += 1
-        
-        # Temperature (extreme values are worse)
-        if temperature < 15 or temperature > 28:
-            risk_score += 2
-        elif temperature < 18 or temperature > 25:
-            risk_score += 1
-        
-        # Humidity (extreme values are worse)
-        if humidity < 30 or humidity > 80:
-            risk_score += 2
-        elif humidity < 40 or humidity > 70:
-            risk_score += 1
-        
-        # Classify risk level
-        if risk_score >= 6:
-            return 2  # High risk
-        elif risk_score >= 3:
-            return 1  # Medium risk
-        else:
-            return 0  # Low risk
+        return int(threshold_risk_levels([features])[0])
     
     def train_model(self):
         """Train the risk prediction model"""
@@ -139,13 +138,24 @@ class FarmRiskPredictor:
         X = df[self.feature_columns]
         y = df['risk_level']
         
-        # Scale features
-        X_scaled = self.scaler.fit_transform(X)
-        
         # Train model
-        self.model.fit(X_scaled, y)
+        self.model.fit(X.to_numpy(dtype=float), y.to_numpy())
         self.is_trained = True
         
+        # Training means are the reference values for feature contributions
+        self.feature_means = X.mean().to_numpy(dtype=float)
+        self.model_version = f"{self.model_name}-{datetime.utcnow().strftime('%Y%m%d%H%M%S')}-{len(df)}"
+        
+        # Reference distribution for the checklist drift monitor
+        db = get_db()
+        try:
+            save_training_baseline(df, self.model_version, db)
+        except Exception as e:
+            db.rollback()
+            logger.warning("Failed to save training baseline: %s", e)
+        finally:
+            db.close()
+        
         return True
     
     def predict_risk(self, features):
@@ -157,66 +167,87 @@ class FarmRiskPredictor:
         if len(features) == len(self.feature_columns):
             features = [features]
         
-        features_scaled = self.scaler.transform(features)
-        prediction = self.model.predict(features_scaled)
-        probabilities = self.model.predict_proba(features_scaled)
+        predictions, probabilities = self.predict_risk_batch(features)
+        return predictions[0], probabilities[0]
+    
+    def predict_risk_batch(self, feature_rows):
+        """Predict risk levels and probabilities for many feature rows at once"""
+        if not self.is_trained:
+            self.train_model()
         
-        return prediction[0], probabilities[0]
+        if len(feature_rows) == 0:
+            return np.array([], dtype=int), np.empty((0, 3))
+        
+        probabilities = self.model.predict_proba(np.asarray(feature_rows, dtype=float))
+        predictions = self.model.classes_[probabilities.argmax(axis=1)]
+        
+        return predictions, probabilities
+    
+    def checklist_features(self, checklist):
+        """Feature row for a checklist, with defaults for empty fields"""
+        return [
+            getattr(checklist, column) or default
+            for column, default in zip(self.feature_columns, self.feature_defaults)
+        ]
+    
+    def build_feature_snapshots(self, feature_rows):
+        """Risk label and snapshot (probabilities, model version, contributions) per feature row
+        
+        A feature's contribution is how much it moves the expected risk (0-2)
+        compared with replacing it by its training mean. All rows, including
+        the occluded copies, are scored in a single predict_proba call.
+        """
+        if not self.is_trained:
+            self.train_model()
+        
+        if len(feature_rows) == 0:
+            return []
+        
+        n_features = len(self.feature_columns)
+        features = np.asarray(feature_rows, dtype=float)
+        
+        # Per input row: the original followed by one occluded copy per feature
+        rows = np.repeat(features[:, None, :], n_features + 1, axis=1)
+        occluded = np.arange(n_features)
+        rows[:, occluded + 1, occluded] = self.feature_means
+        
+        _, probabilities = self.predict_risk_batch(rows.reshape(-1, n_features))
+        probabilities = probabilities.reshape(len(features), n_features + 1, -1)
+        classes = self.model.classes_
+        expected = probabilities @ classes.astype(float)
+        contributions = expected[:, :1] - expected[:, 1:]
+        
+        computed_at = datetime.utcnow().isoformat()
+        results = []
+        for i in range(len(features)):
+            risk_label = self.get_risk_label(classes[probabilities[i, 0].argmax()])
+            results.append((risk_label, {
+                "risk_level": risk_label.lower(),
+                "probabilities": {
+                    self.get_risk_label(cls).lower(): round(float(p), 4)
+                    for cls, p in zip(classes, probabilities[i, 0])
+                },
+                "model_version": self.model_version,
+                "contributions": {
+                    column: round(float(value), 4)
+                    for column, value in zip(self.feature_columns, contributions[i])
+                },
+                "computed_at": computed_at
+            }))
+        
+        return results
+    
+    def build_risk_snapshots(self, checklists):
+        """Risk label and snapshot per checklist, including the source checklist id"""
+        results = self.build_feature_snapshots([self.checklist_features(cl) for cl in checklists])
+        for checklist, (_, snapshot) in zip(checklists, results):
+            snapshot["checklist_id"] = checklist.id
+        return results
     
     def get_risk_label(self, risk_level):
         """Convert risk level to label"""
         labels = {0: "Low", 1: "Medium", 2: "High"}
         return labels.get(risk_level, "Unknown")
-    
-    def predict_barn_risk(self, barn_id):
-        """Predict risk for a specific barn based on latest checklist"""
-        db = get_db()
-        try:
-            # Get latest checklist for barn
-            latest_checklist = db.query(Checklist).filter(
-                Checklist.barn_id == barn_id
-            ).order_by(Checklist.submitted_at.desc()).first()
-            
-            if not latest_checklist:
-                return "No data", None
-            
-            features = [
-                latest_checklist.hygiene_score or 7,
-                latest_checklist.mortality_count or 0,
-                latest_checklist.feed_quality or 8,
-                latest_checklist.water_quality or 8,
-                latest_checklist.ventilation_score or 7,
-                latest_checklist.temperature or 22,
-                latest_checklist.humidity or 55
-            ]
-            
-            risk_level, probabilities = self.predict_risk(features)
-            return self.get_risk_label(risk_level), probabilities
-            
-        finally:
-            db.close()
-    
-    def update_barn_risks(self):
-        """Update risk levels for all barns"""
-        db = get_db()
-        try:
-            barns = db.query(Barn).all()
-            
-            for barn in barns:
-                risk_label, _ = self.predict_barn_risk(barn.id)
-                if risk_label != "No data":
-                    barn.risk_level = risk_label.lower()
-                    barn.last_updated = datetime.utcnow()
-            
-            db.commit()
-            return True
-            
-        except Exception as e:
-            db.rollback()
-            print(f"Error updating barn risks: {e}")
-            return False
-        finally:
-            db.close()
 
 # Global predictor instance
 risk_predictor = FarmRiskPredictor()
@@ -0,0 +1,150 @@
+"""
+Ingest-time anomaly scoring for checklists.
+
+Each barn keeps an exponentially weighted mean and variance per feature
+(BarnFeatureBaseline, ANOMALY_ALPHA of weight on the newest checklist). A
+new checklist is scored against its barn's baseline, and once it is
+committed update_baselines folds it in with one upsert in a separate
+transaction, so a conflicting baseline write can never lose the checklist.
+The score is the largest per-feature z-score, so one query and a handful
+of arithmetic operations per checklist, whatever the history.
+Values outside PLAUSIBLE_RANGES are flagged even before a barn has history.
+The approval queue is ordered by anomaly_score.
+"""
+
+import math
+from datetime import datetime
+from sqlalchemy import case, func
+from database import dialect_insert
+from models import BarnFeatureBaseline
+
+ANOMALY_ALPHA = 0.1
+ANOMALY_THRESHOLD = 3.0  # z-score above which a feature is flagged
+ANOMALY_MIN_HISTORY = 5  # checklists before a barn baseline is trusted
+
+ANOMALY_FEATURES = [
+    'hygiene_score', 'mortality_count', 'feed_quality',
+    'water_quality', 'ventilation_score', 'temperature', 'humidity'
+]
+
+# Floor for the baseline standard deviation so steady barns don't flag tiny changes
+MIN_STD = {
+    "hygiene_score": 1.0,
+    "mortality_count": 1.0,
+    "feed_quality": 1.0,
+    "water_quality": 1.0,
+    "ventilation_score": 1.0,
+    "temperature": 1.5,
+    "humidity": 5.0,
+}
+
+# Only increases are suspicious for these features
+ONE_SIDED = {"mortality_count"}
+
+# Values outside these ranges are implausible for a barn regardless of its history
+PLAUSIBLE_RANGES = {
+    "mortality_count": (0, 10),
+    "temperature": (5, 35),
+    "humidity": (20, 95),
+}
+
+
+def _feature_score(feature, value, baseline):
+    """(score, expected value or None, reason) for one feature"""
+    score, expected, reason = 0.0, None, None
+
+    if baseline is not None and (baseline.count or 0) >= ANOMALY_MIN_HISTORY:
+        expected = baseline.mean
+        std = max(math.sqrt(max(baseline.variance or 0.0, 0.0)), MIN_STD[feature])
+        deviation = value - baseline.mean
+        if feature in ONE_SIDED:
+            deviation = max(deviation, 0.0)
+        score = abs(deviation) / std
+        reason = "far from barn baseline"
+
+    low, high = PLAUSIBLE_RANGES.get(feature, (-math.inf, math.inf))
+    if not low <= value <= high and score < ANOMALY_THRESHOLD:
+        score, reason = ANOMALY_THRESHOLD, "outside plausible range"
+
+    return score, expected, reason
+
+
+def score_checklist(checklist, db):
+    """Set anomaly_score/anomaly_flags on a checklist from its barn baseline; writes nothing"""
+    baselines = {
+        baseline.feature: baseline
+        for baseline in db.query(BarnFeatureBaseline).filter(
+            BarnFeatureBaseline.barn_id == checklist.barn_id
+        ).all()
+    }
+
+    max_score = 0.0
+    flags = []
+    for feature in ANOMALY_FEATURES:
+        value = getattr(checklist, feature)
+        if value is None:
+            continue
+        value = float(value)
+
+        baseline = baselines.get(feature)
+        score, expected, reason = _feature_score(feature, value, baseline)
+        max_score = max(max_score, score)
+        if score >= ANOMALY_THRESHOLD:
+            flags.append({
+                "feature": feature,
+                "value": value,
+                "expected": round(expected, 2) if expected is not None else None,
+                "score": round(score, 2),
+                "reason": reason
+            })
+
+    checklist.anomaly_score = round(max_score, 3)
+    checklist.anomaly_flags = flags
+    return flags
+
+
+def update_baselines(checklist, db, commit=True):
+    """Fold a committed checklist into its barn baseline
+    
+    The exponentially weighted update is done by the database in one
+    INSERT ... ON CONFLICT DO UPDATE, so concurrent checklists for the same
+    barn neither collide on a new baseline nor overwrite each other's update.
+    """
+    now = datetime.utcnow()
+    rows = [
+        {"barn_id": checklist.barn_id, "feature": feature, "count": 1,
+         "mean": float(getattr(checklist, feature)), "variance": 0.0, "updated_at": now}
+        for feature in ANOMALY_FEATURES
+        if getattr(checklist, feature) is not None
+    ]
+    if not rows:
+        return
+
+    baseline = BarnFeatureBaseline.__table__.c
+    statement = dialect_insert(db)(BarnFeatureBaseline).values(rows)
+    value = statement.excluded.mean
+    count = func.coalesce(baseline.count, 0)
+    diff = value - baseline.mean
+    db.execute(statement.on_conflict_do_update(
+        index_elements=[BarnFeatureBaseline.barn_id, BarnFeatureBaseline.feature],
+        set_={
+            "count": count + 1,
+            "mean": case((count == 0, value), else_=baseline.mean + ANOMALY_ALPHA * diff),
+            "variance": case(
+                (count == 0, 0.0),
+                else_=(1.0 - ANOMALY_ALPHA) * (func.coalesce(baseline.variance, 0.0) + ANOMALY_ALPHA * diff * diff)
+            ),
+            "updated_at": statement.excluded.updated_at,
+        }
+    ))
+    if commit:
+        db.commit()
+
+
+def describe_flags(flags):
+    """Short human-readable summary of anomaly flags"""
+    return "; ".join(
+        f"{flag['feature'].replace('_', ' ')} {flag['value']:g}"
+        + (f" (usually {flag['expected']:g})" if flag.get("expected") is not None else f" ({flag['reason']})")
+        for flag in flags or []
+    )
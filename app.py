@@ -3,6 +3,7 @@ import os
 from streamlit_option_menu import option_menu
 from auth import authenticate_user, get_user_role, logout_user, init_session_state
 from database import init_database, create_demo_data
+from risk_scheduler import get_risk_scheduler
 from components.dashboard import render_dashboard
 from components.admin import render_admin_panel
 from components.worker import render_worker_interface
@@ -11,6 +12,8 @@ from components.analytics import render_analytics
 from components.approvals import render_manager_approvals
 from components.notifications import render_notifications
 from translations import get_text, set_language
+from instrumentation import DEBUG_PANEL_ENABLED, instrument_render, start_page_timings
+from components.performance import render_performance_panel
 
 # Initialize session state
 init_session_state()
@@ -18,12 +21,16 @@ init_session_state()
 # Initialize database
 init_database()
 
+# Start the background barn risk recompute (once per process)
+get_risk_scheduler()
+
 # Create demo data if needed
 if not st.session_state.get('demo_data_created', False):
     create_demo_data()
     st.session_state.demo_data_created = True
 
 def main():
+    page_timings = start_page_timings()
     st.set_page_config(
         page_title="FarmTwin 360",
         page_icon="🌾",
@@ -457,7 +464,11 @@ def main():
         render_login()
     else:
         render_main_app()
+    
+    if DEBUG_PANEL_ENABLED:
+        render_performance_panel(page_timings)
 
+@instrument_render
 def render_login():
     # Beautiful header
     st.markdown("""
@@ -500,6 +511,7 @@ def render_login():
                 else:
                     st.error(get_text("login_error"))
 
+@instrument_render
 def render_main_app():
     user_role = st.session_state.role
     
@@ -0,0 +1 @@
+"""Performance benchmarks for FarmTwin360. Run modules with ``python -m benchmarks.<name>``."""
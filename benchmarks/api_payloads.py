@@ -0,0 +1,97 @@
+"""
+Measure mobile API payload sizes and latency per response format and encoding.
+
+Requests an endpoint (the 50-row checklist list by default) as an admin
+through the in-process FastAPI app, as objects and as columns, uncompressed
+and with each supported Content-Encoding. Also times encoding the same rows
+with the standard json module and with orjson. Run against a seeded database.
+
+    python -m benchmarks.api_payloads
+    python -m benchmarks.api_payloads --path /api/admin/barns --repeat 200
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+from fastapi.testclient import TestClient
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "mobile-backend"))
+import api
+from database import init_database, get_db
+from models import User
+
+
+def time_call(func, repeat):
+    """Median wall time of func() in seconds"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings))
+
+
+def admin_headers():
+    db = get_db()
+    try:
+        admin = db.query(User).filter(User.role == "admin").first()
+        if admin is None:
+            raise SystemExit("No admin user; seed the database first")
+        return {"Authorization": f"Bearer {api.create_jwt_token(admin.id, admin.role)}"}
+    finally:
+        db.close()
+
+
+def run(path="/api/checklists", repeat=100):
+    """Wire size and median latency per (format, encoding), as a DataFrame"""
+    client = TestClient(api.app)
+    headers = admin_headers()
+    encodings = ["identity", "gzip"] + (["br"] if api.BrotliMiddleware is not None else [])
+
+    results = []
+    for list_format in api.LIST_FORMATS:
+        url = f"{path}?format={list_format}"
+        for encoding in encodings:
+            request_headers = {**headers, "Accept-Encoding": encoding}
+            response = client.get(url, headers=request_headers)
+            response.raise_for_status()
+            results.append({
+                "format": list_format,
+                "encoding": response.headers.get("content-encoding", "identity"),
+                "bytes": int(response.headers.get("content-length", len(response.content))),
+                "latency_ms": time_call(lambda: client.get(url, headers=request_headers), repeat) * 1000,
+            })
+
+    df = pd.DataFrame(results).set_index(["format", "encoding"])
+    df["vs_baseline"] = df["bytes"] / df.loc[("objects", "identity"), "bytes"]
+    return df
+
+
+def encoder_timings(path="/api/checklists", repeat=100):
+    """Median ms to encode the endpoint's rows with json and orjson"""
+    rows = TestClient(api.app).get(path, headers=admin_headers()).json()
+    timings = {"json": time_call(lambda: json.dumps(rows, separators=(",", ":")), repeat) * 1000}
+    if api.orjson is not None:
+        timings["orjson"] = time_call(lambda: api.orjson.dumps(rows), repeat) * 1000
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--path", default="/api/checklists", help="list endpoint to request")
+    parser.add_argument("--repeat", type=int, default=100, help="timing repetitions per variant")
+    args = parser.parse_args()
+
+    init_database()
+    df = run(args.path, args.repeat)
+    print(df.to_string(float_format="{:,.3f}".format))
+    for encoder, ms in encoder_timings(args.path, args.repeat).items():
+        print(f"{encoder} encode: {ms:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Benchmarks of the dashboard and analytics data providers.
+
+Each provider is timed with a fresh session per call against every selected
+seeded scale (see conftest.py); rendering is not included.
+"""
+
+from datetime import timedelta
+from database import get_accessible_farm_ids
+from components.dashboard import get_recent_activities
+from components.role_dashboards import get_manager_dashboard_data
+from components.analytics import get_compliance_report
+
+
+def _farm_ids(seeded, user):
+    db = seeded.Session()
+    try:
+        return tuple(sorted(get_accessible_farm_ids(user.id, user.role, db)))
+    finally:
+        db.close()
+
+
+def _annotate(benchmark, seeded, group):
+    benchmark.group = group
+    benchmark.extra_info["checklists"] = seeded.checklists
+
+
+def test_recent_activities_manager(benchmark, seeded):
+    _annotate(benchmark, seeded, "recent_activities")
+    activities = benchmark(seeded.run, get_recent_activities, seeded.manager.id, seeded.manager.role)
+    assert activities["checklists"]
+
+
+def test_recent_activities_admin(benchmark, seeded):
+    _annotate(benchmark, seeded, "recent_activities")
+    activities = benchmark(seeded.run, get_recent_activities, seeded.admin.id, seeded.admin.role)
+    assert activities["checklists"]
+
+
+def test_manager_dashboard(benchmark, seeded):
+    _annotate(benchmark, seeded, "manager_dashboard")
+    data = benchmark(seeded.run, get_manager_dashboard_data, seeded.manager.id, seeded.manager.role)
+    assert data["barns"]
+
+
+def test_compliance_report_30_days(benchmark, seeded):
+    _annotate(benchmark, seeded, "compliance_report")
+    farm_ids = _farm_ids(seeded, seeded.admin)
+    today = seeded.latest.date()
+    df = benchmark(seeded.run, get_compliance_report, farm_ids, today - timedelta(days=30), today, today=today)
+    assert not df.empty
+
+
+def test_compliance_report_all_history(benchmark, seeded):
+    _annotate(benchmark, seeded, "compliance_report")
+    farm_ids = _farm_ids(seeded, seeded.admin)
+    today = seeded.latest.date()
+    df = benchmark(seeded.run, get_compliance_report, farm_ids, today - timedelta(days=366), today, today=today)
+    assert not df.empty
@@ -0,0 +1,90 @@
+"""
+Seeded databases for the data-provider benchmarks.
+
+Each scale in FARMTWIN_BENCH_SCALES (default "1k") is seeded once with
+benchmarks.seed into benchmarks/.data and reused by later runs, so results
+stay comparable across commits. The 1m database takes about a minute
+and a few hundred megabytes of disk to create.
+"""
+
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import pytest
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import sessionmaker
+from models import Checklist, User
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BENCHMARK_DIR, ".data")
+
+# Roughly the checklist count in the name; see benchmarks.seed for the other tables
+SCALES = {
+    "1k": {"farms": 2, "barns-per-farm": 8, "months": 1, "checklists-per-barn-per-day": 2},
+    "100k": {"farms": 10, "barns-per-farm": 14, "months": 6, "checklists-per-barn-per-day": 4},
+    "1m": {"farms": 50, "barns-per-farm": 20, "months": 12, "checklists-per-barn-per-day": 3},
+}
+
+SELECTED_SCALES = [scale.strip() for scale in os.getenv("FARMTWIN_BENCH_SCALES", "1k").split(",") if scale.strip()]
+
+
+class SeededDatabase:
+    """Session factory and reference users of one seeded scale"""
+
+    def __init__(self, scale, path):
+        self.scale = scale
+        self.engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+        self.Session = sessionmaker(bind=self.engine)
+
+        db = self.Session()
+        try:
+            self.checklists = db.query(func.count(Checklist.id)).scalar()
+            self.latest = db.query(func.max(Checklist.submitted_at)).scalar()
+            self.admin = db.query(User).filter(User.role == "admin").first()
+            self.manager = db.query(User).filter(User.role == "manager").order_by(User.id).first()
+            db.expunge_all()
+        finally:
+            db.close()
+
+    def run(self, provider, *args, **kwargs):
+        """Call provider with a fresh session as its db argument, as a page render would"""
+        db = self.Session()
+        try:
+            return provider(*args, db=db, **kwargs)
+        finally:
+            db.close()
+
+
+def _seed(scale):
+    """Path of the scale's database, seeding it on first use"""
+    options = SCALES[scale]
+    # The options are in the file name so changing a scale reseeds it
+    digest = hashlib.sha1(json.dumps(options, sort_keys=True).encode()).hexdigest()[:8]
+    path = os.path.join(DATA_DIR, f"{scale}-{digest}.db")
+    if os.path.exists(path):
+        return path
+
+    os.makedirs(DATA_DIR, exist_ok=True)
+    partial = path + ".partial"
+    if os.path.exists(partial):
+        os.remove(partial)
+    args = [arg for key, value in options.items() for arg in (f"--{key}", str(value))]
+    subprocess.run(
+        [sys.executable, "-m", "benchmarks.seed", *args],
+        cwd=os.path.dirname(BENCHMARK_DIR),
+        env={**os.environ, "DATABASE_URL": f"sqlite:///{partial}", "FARMTWIN_RISK_SCHEDULER": "0"},
+        check=True
+    )
+    os.replace(partial, path)
+    return path
+
+
+@pytest.fixture(scope="session", params=SELECTED_SCALES)
+def seeded(request):
+    if request.param not in SCALES:
+        raise pytest.UsageError(f"Unknown scale {request.param!r}; choose from {', '.join(SCALES)}")
+    database = SeededDatabase(request.param, _seed(request.param))
+    yield database
+    database.engine.dispose()
@@ -0,0 +1,267 @@
+"""
+Replay mixed mobile traffic against the FastAPI app and report latency.
+
+Runs four phases against a seeded database (see benchmarks.seed), each
+with --concurrency client threads:
+
+    shift_start      every worker logs in and loads farms, barns and alerts
+    checklist_burst  workers submit checklists, some as offline bulk syncs
+    approval_wave    managers log in, load their queues and approve
+    dashboard_poll   managers, vets and the admin poll stats, alerts, farms
+                     (with If-None-Match) and the change feed
+
+Requests go to the in-process app by default, or to a running server with
+--base-url. Reports count, errors, p50/p95/p99 and throughput per endpoint
+and per phase. Everything runs offline against SQLite or a local Postgres:
+
+    DATABASE_URL=sqlite:///benchmark.db python -m benchmarks.seed
+    DATABASE_URL=sqlite:///benchmark.db python -m benchmarks.load_test --concurrency 16
+"""
+
+import argparse
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+import httpx
+from fastapi.testclient import TestClient
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "mobile-backend"))
+import api
+from database import get_db
+from models import User
+from benchmarks.seed import BENCHMARK_PASSWORD
+
+PHASES = ["shift_start", "checklist_burst", "approval_wave", "dashboard_poll"]
+
+
+class TrafficRecorder:
+    """Thread-safe log of (phase, endpoint, status, seconds)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = []
+        self.phase_seconds = {}
+
+    def request(self, client, phase, method, url, endpoint, **kwargs):
+        started = time.perf_counter()
+        response = client.request(method, url, **kwargs)
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.requests.append((phase, f"{method} {endpoint}", response.status_code, elapsed))
+        return response
+
+
+class VirtualUser:
+    """A seeded user's token and cached view of the API"""
+
+    def __init__(self, user):
+        self.id = user.id
+        self.email = user.email
+        self.role = user.role
+        self.headers = {}
+        self.barn_ids = []
+        self.etags = {}
+        self.since = 0
+
+
+def load_users():
+    """Active seeded users by role"""
+    db = get_db()
+    try:
+        users = {}
+        for user in db.query(User).filter(User.is_active == True).order_by(User.id).all():
+            users.setdefault(user.role, []).append(VirtualUser(user))
+        return users
+    finally:
+        db.close()
+
+
+def login(client, recorder, phase, user, password):
+    response = recorder.request(client, phase, "POST", "/api/auth/login", "/api/auth/login",
+                                json={"email": user.email, "password": password})
+    response.raise_for_status()
+    user.headers = {"Authorization": f"Bearer {response.json()['token']}"}
+
+
+def conditional_get(client, recorder, phase, user, url, endpoint):
+    """GET with the user's cached ETag, as a polling client would"""
+    headers = dict(user.headers)
+    if url in user.etags:
+        headers["If-None-Match"] = user.etags[url]
+    response = recorder.request(client, phase, "GET", url, endpoint, headers=headers)
+    if "etag" in response.headers:
+        user.etags[url] = response.headers["etag"]
+    return response
+
+
+def random_checklist(rng, barn_id):
+    return {
+        "barn_id": int(barn_id),
+        "hygiene_score": int(np.clip(round(rng.normal(7, 2)), 1, 10)),
+        "mortality_count": int(rng.poisson(1)),
+        "feed_quality": int(np.clip(round(rng.normal(8, 1.5)), 1, 10)),
+        "water_quality": int(np.clip(round(rng.normal(8.5, 1)), 1, 10)),
+        "ventilation_score": int(np.clip(round(rng.normal(7.5, 1.5)), 1, 10)),
+        "temperature": round(float(rng.normal(22, 3)), 1),
+        "humidity": round(float(np.clip(rng.normal(55, 10), 0, 100)), 1),
+        "client_uuid": str(uuid.uuid4()),
+    }
+
+
+def shift_start(client, recorder, worker, password):
+    phase = "shift_start"
+    login(client, recorder, phase, worker, password)
+    farms = conditional_get(client, recorder, phase, worker, "/api/farms", "/api/farms")
+    for farm in farms.json() if farms.status_code == 200 else []:
+        barns = conditional_get(client, recorder, phase, worker, f"/api/farms/{farm['id']}/barns",
+                                "/api/farms/{farm_id}/barns")
+        if barns.status_code == 200:
+            worker.barn_ids.extend(barn["id"] for barn in barns.json())
+    recorder.request(client, phase, "GET", "/api/alerts", "/api/alerts", headers=worker.headers)
+
+
+def checklist_burst(client, recorder, worker, checklists, bulk_size, seed):
+    phase = "checklist_burst"
+    if not worker.barn_ids:
+        return
+    rng = np.random.default_rng(seed)
+    for _ in range(checklists):
+        recorder.request(client, phase, "POST", "/api/checklists", "/api/checklists",
+                         headers=worker.headers, json=random_checklist(rng, rng.choice(worker.barn_ids)))
+    # Catching up after a stretch without signal
+    if bulk_size:
+        items = [random_checklist(rng, rng.choice(worker.barn_ids)) for _ in range(bulk_size)]
+        recorder.request(client, phase, "POST", "/api/sync/bulk", "/api/sync/bulk",
+                         headers=worker.headers, json={"checklists": items})
+
+
+def approval_wave(client, recorder, manager, password, approvals):
+    phase = "approval_wave"
+    login(client, recorder, phase, manager, password)
+    pending = recorder.request(client, phase, "GET", "/api/manager/pending-checklists",
+                               "/api/manager/pending-checklists", headers=manager.headers)
+    for checklist in pending.json()[:approvals] if pending.status_code == 200 else []:
+        recorder.request(client, phase, "POST", f"/api/checklists/{checklist['id']}/approve",
+                         "/api/checklists/{checklist_id}/approve", headers=manager.headers)
+    recorder.request(client, phase, "GET", "/api/manager/pending-incidents",
+                     "/api/manager/pending-incidents", headers=manager.headers)
+
+
+def dashboard_poll(client, recorder, user, password, polls):
+    phase = "dashboard_poll"
+    if not user.headers:
+        login(client, recorder, phase, user, password)
+    for _ in range(polls):
+        conditional_get(client, recorder, phase, user, "/api/dashboard/stats", "/api/dashboard/stats")
+        conditional_get(client, recorder, phase, user, "/api/farms", "/api/farms")
+        recorder.request(client, phase, "GET", "/api/alerts", "/api/alerts", headers=user.headers)
+        changes = recorder.request(client, phase, "GET", f"/api/sync/changes?since={user.since}",
+                                   "/api/sync/changes", headers=user.headers)
+        if changes.status_code == 200:
+            user.since = changes.json()["version"]
+
+
+def run_phase(recorder, name, tasks, concurrency):
+    """Run (function, args) tasks on a thread pool and record the phase's wall time"""
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for future in [pool.submit(func, *args) for func, args in tasks]:
+            future.result()
+    recorder.phase_seconds[name] = time.perf_counter() - started
+
+
+def summarize(recorder):
+    """(per-endpoint DataFrame, per-phase DataFrame) with latency percentiles and throughput"""
+    df = pd.DataFrame(recorder.requests, columns=["phase", "endpoint", "status", "seconds"])
+    # 304 is the expected answer to an unchanged poll
+    df["error"] = (df["status"] >= 400)
+    df["ms"] = df["seconds"] * 1000
+
+    def stats(group, seconds):
+        return pd.Series({
+            "requests": len(group),
+            "errors": int(group["error"].sum()),
+            "p50_ms": np.percentile(group["ms"], 50),
+            "p95_ms": np.percentile(group["ms"], 95),
+            "p99_ms": np.percentile(group["ms"], 99),
+            "mean_ms": group["ms"].mean(),
+            "req_per_s": len(group) / seconds if seconds else float("nan"),
+        })
+
+    by_endpoint = pd.DataFrame({
+        endpoint: stats(group, sum(recorder.phase_seconds[phase] for phase in group["phase"].unique()))
+        for endpoint, group in df.groupby("endpoint")
+    }).T.sort_values("requests", ascending=False)
+    by_phase = pd.DataFrame({
+        phase: stats(df[df["phase"] == phase], recorder.phase_seconds[phase])
+        for phase in PHASES if phase in recorder.phase_seconds
+    }).T
+    for table in (by_endpoint, by_phase):
+        table[["requests", "errors"]] = table[["requests", "errors"]].astype(int)
+    return by_endpoint, by_phase
+
+
+def run(client, concurrency=8, checklists_per_worker=5, bulk_size=10, approvals_per_manager=20,
+        polls=5, password=BENCHMARK_PASSWORD, seed=42):
+    """Replay all phases through client and return the recorder"""
+    users = load_users()
+    workers = users.get("worker", [])
+    managers = users.get("manager", [])
+    pollers = managers + users.get("vet", []) + users.get("admin", [])
+    if not workers or not managers:
+        raise SystemExit("No workers or managers found; seed the database with benchmarks.seed first")
+
+    recorder = TrafficRecorder()
+    run_phase(recorder, "shift_start",
+              [(shift_start, (client, recorder, worker, password)) for worker in workers], concurrency)
+    run_phase(recorder, "checklist_burst",
+              [(checklist_burst, (client, recorder, worker, checklists_per_worker, bulk_size, seed + i))
+               for i, worker in enumerate(workers)], concurrency)
+    run_phase(recorder, "approval_wave",
+              [(approval_wave, (client, recorder, manager, password, approvals_per_manager))
+               for manager in managers], concurrency)
+    run_phase(recorder, "dashboard_poll",
+              [(dashboard_poll, (client, recorder, user, password, polls)) for user in pollers], concurrency)
+    return recorder
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", help="server to load instead of the in-process app, e.g. http://localhost:8000")
+    parser.add_argument("--concurrency", type=int, default=8, help="client threads per phase")
+    parser.add_argument("--checklists-per-worker", type=int, default=5)
+    parser.add_argument("--bulk-size", type=int, default=10, help="checklists per offline bulk sync (0 to skip)")
+    parser.add_argument("--approvals-per-manager", type=int, default=20)
+    parser.add_argument("--polls", type=int, default=5, help="dashboard polls per user")
+    parser.add_argument("--password", default=BENCHMARK_PASSWORD)
+    parser.add_argument("--seed", type=int, default=42, help="random seed")
+    args = parser.parse_args()
+    logging.getLogger("httpx").setLevel(logging.WARNING)  # one line per request otherwise
+
+    options = dict(
+        concurrency=args.concurrency, checklists_per_worker=args.checklists_per_worker,
+        bulk_size=args.bulk_size, approvals_per_manager=args.approvals_per_manager,
+        polls=args.polls, password=args.password, seed=args.seed
+    )
+    if args.base_url:
+        with httpx.Client(base_url=args.base_url, timeout=60) as client:
+            recorder = run(client, **options)
+    else:
+        # Server errors count as failed requests rather than stopping the run
+        with TestClient(api.app, raise_server_exceptions=False) as client:
+            recorder = run(client, **options)
+
+    by_endpoint, by_phase = summarize(recorder)
+    print(by_endpoint.to_string(float_format="{:,.1f}".format))
+    print()
+    print(by_phase.to_string(float_format="{:,.1f}".format))
+
+
+if __name__ == "__main__":
+    main()
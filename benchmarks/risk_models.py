@@ -0,0 +1,87 @@
+"""
+Compare the risk model estimators on accuracy, latency and size.
+
+Every estimator in ai_engine.RISK_MODELS is fitted on the same training
+split of the checklist data (stored checklists, or the synthetic demo set
+when there are too few) and scored on the held-out rows.
+
+    python -m benchmarks.risk_models
+    python -m benchmarks.risk_models --models random_forest threshold --batch-size 50000
+"""
+
+import argparse
+import pickle
+import time
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import train_test_split
+from ai_engine import FarmRiskPredictor, RISK_MODELS
+
+
+def time_call(func, repeat):
+    """Median wall time of func() in seconds"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings))
+
+
+def load_dataset(test_size=0.25, seed=42):
+    """Train/test split of the checklist features and threshold labels"""
+    predictor = FarmRiskPredictor("threshold")
+    df = predictor.prepare_training_data()
+    X = df[predictor.feature_columns].to_numpy(dtype=float)
+    y = df["risk_level"].to_numpy()
+    return train_test_split(X, y, test_size=test_size, random_state=seed)
+
+
+def benchmark_model(name, X_train, X_test, y_train, y_test, batch_size=10000, repeat=50):
+    """Fit time, latencies, pickled size and held-out accuracy of one estimator"""
+    predictor = FarmRiskPredictor(name)
+
+    start = time.perf_counter()
+    predictor.model.fit(X_train, y_train)
+    fit_seconds = time.perf_counter() - start
+    predictor.is_trained = True
+
+    predictions, _ = predictor.predict_risk_batch(X_test)
+    single_row = X_test[0].tolist()
+    batch = X_test[np.arange(batch_size) % len(X_test)]
+    batch_seconds = time_call(lambda: predictor.predict_risk_batch(batch), max(3, repeat // 10))
+
+    return {
+        "model": name,
+        "fit_ms": fit_seconds * 1000,
+        "single_ms": time_call(lambda: predictor.predict_risk(single_row), repeat) * 1000,
+        "batch_ms": batch_seconds * 1000,
+        "batch_rows_per_s": batch_size / batch_seconds,
+        "size_kb": len(pickle.dumps(predictor.model)) / 1024,
+        "accuracy": float((predictions == y_test).mean()),
+    }
+
+
+def run(models=None, batch_size=10000, repeat=50):
+    """Benchmark the given estimators (all of them by default) and return a DataFrame"""
+    X_train, X_test, y_train, y_test = load_dataset()
+    results = [
+        benchmark_model(name, X_train, X_test, y_train, y_test, batch_size, repeat)
+        for name in (models or RISK_MODELS)
+    ]
+    return pd.DataFrame(results).set_index("model")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--models", nargs="+", choices=list(RISK_MODELS), help="estimators to compare")
+    parser.add_argument("--batch-size", type=int, default=10000, help="rows per batch prediction")
+    parser.add_argument("--repeat", type=int, default=50, help="timing repetitions for single-row predictions")
+    args = parser.parse_args()
+
+    df = run(args.models, args.batch_size, args.repeat)
+    print(df.to_string(float_format="{:,.3f}".format))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+"""
+Seed a benchmark database at a configurable scale.
+
+Creates farms, barns, users of every role (workers and managers assigned to
+their farm), months of checklists, incidents and alerts, and the barns'
+anomaly baselines. Bulk rows are generated as numpy columns and written
+with executemany inserts, so large datasets take seconds rather than
+minutes. Every seeded user has the
+password BENCHMARK_PASSWORD.
+
+The target is DATABASE_URL, as for the app. Use a dedicated database:
+
+    DATABASE_URL=sqlite:///benchmark.db python -m benchmarks.seed --farms 20 --months 6
+    DATABASE_URL=postgresql://localhost/farmtwin_bench DATABASE_SSLMODE=disable \\
+        python -m benchmarks.seed --reset
+"""
+
+import argparse
+import time
+from datetime import datetime, timedelta
+import bcrypt
+import numpy as np
+import pandas as pd
+from sqlalchemy import insert
+from database import get_db, get_engine, init_database
+from changelog import backfill_changelog, seed_table_versions
+from models import Base, Farm, Barn, User, Checklist, Incident, Alert, BarnFeatureBaseline, user_farm_assignment
+from anomaly import ANOMALY_FEATURES
+
+BENCHMARK_PASSWORD = "benchmark123"
+INSERT_CHUNK_SIZE = 5000
+
+INCIDENT_TYPES = np.array(["disease", "equipment_failure", "biosecurity_breach", "feed_issue", "water_issue"])
+ALERT_TYPES = np.array(["checklist_submitted", "incident_reported", "high_risk", "missed_checklist"])
+SEVERITIES = np.array(["low", "medium", "high"])
+RISK_LEVELS = np.array(["low", "medium", "high"])
+
+
+def _insert_frame(db, table, df):
+    """executemany insert of a DataFrame in chunks; returns the row count"""
+    for start in range(0, len(df), INSERT_CHUNK_SIZE):
+        chunk = df.iloc[start:start + INSERT_CHUNK_SIZE]
+        # Object dtype gives the driver plain Python values, with None for NaN/NaT
+        db.execute(insert(table), chunk.astype(object).where(chunk.notna(), None).to_dict("records"))
+    return len(df)
+
+
+def _scores(rng, n, mean, std):
+    return np.clip(np.rint(rng.normal(mean, std, n)), 1, 10).astype(int)
+
+
+def _create_users(db, farms, workers_per_farm, vets, auditors, password_hash):
+    """Users per role; workers and the manager of each farm are assigned to it"""
+    users = {"admin": [], "manager": [], "worker": [], "vet": [], "auditor": []}
+
+    def add(role, name, email):
+        user = User(name=name, email=email, password_hash=password_hash, role=role, is_active=True)
+        db.add(user)
+        users[role].append(user)
+        return user
+
+    add("admin", "Benchmark Admin", "admin@bench.farmtwin")
+    for i in range(vets):
+        add("vet", f"Benchmark Vet {i + 1}", f"vet{i + 1}@bench.farmtwin")
+    for i in range(auditors):
+        add("auditor", f"Benchmark Auditor {i + 1}", f"auditor{i + 1}@bench.farmtwin")
+
+    farm_workers = {}
+    farm_managers = {}
+    for farm in farms:
+        farm_managers[farm.id] = add("manager", f"Manager {farm.name}", f"manager{farm.id}@bench.farmtwin")
+        farm_workers[farm.id] = [
+            add("worker", f"Worker {farm.id}-{i + 1}", f"worker{farm.id}_{i + 1}@bench.farmtwin")
+            for i in range(workers_per_farm)
+        ]
+    db.flush()
+
+    assignments = [{"user_id": farm_managers[farm.id].id, "farm_id": farm.id} for farm in farms]
+    assignments += [
+        {"user_id": worker.id, "farm_id": farm.id}
+        for farm in farms for worker in farm_workers[farm.id]
+    ]
+    db.execute(insert(user_farm_assignment), assignments)
+    return users, farm_workers, farm_managers
+
+
+def seed_database(farms=10, barns_per_farm=8, workers_per_farm=5, vets=2, auditors=1, months=6,
+                  checklists_per_barn_per_day=2, incidents_per_barn_per_month=3, alerts_per_user=50,
+                  pending_days=2, reset=False, seed=42):
+    """Seed DATABASE_URL and return the number of rows created per table"""
+    if reset:
+        Base.metadata.drop_all(bind=get_engine())
+    init_database()
+
+    rng = np.random.default_rng(seed)
+    now = datetime.utcnow()
+    start = now - timedelta(days=30 * months)
+    days = 30 * months
+    counts = {}
+
+    db = get_db()
+    try:
+        if db.query(Farm.id).first() is not None:
+            raise SystemExit("The database already has farms; use a dedicated database or --reset")
+
+        # Core inserts throughout keep the change log empty until the backfill below
+        _insert_frame(db, Farm.__table__, pd.DataFrame({
+            "name": [f"Benchmark Farm {i + 1}" for i in range(farms)],
+            "location": [f"Region {i % 5 + 1}" for i in range(farms)],
+            "description": "Generated for benchmarks",
+            "created_at": start,
+        }))
+        farm_rows = db.query(Farm).order_by(Farm.id).all()
+
+        n = farms * barns_per_farm
+        positions = np.tile(np.arange(barns_per_farm), farms)
+        _insert_frame(db, Barn.__table__, pd.DataFrame({
+            "farm_id": np.repeat([farm.id for farm in farm_rows], barns_per_farm),
+            "name": [f"F{farm.id}-B{j + 1}" for farm in farm_rows for j in range(barns_per_farm)],
+            "capacity": rng.integers(200, 2000, n),
+            "position_x": (positions % 4) * 10.0,
+            "position_y": (positions // 4) * 10.0,  # x/y is the ground plane
+            "position_z": 0.0,
+            "risk_level": rng.choice(RISK_LEVELS, n, p=[0.6, 0.3, 0.1]),
+            "last_updated": now,
+        }))
+        barn_rows = db.query(Barn).order_by(Barn.id).all()
+
+        # One hash for everyone: bcrypt is deliberately slow
+        password_hash = bcrypt.hashpw(BENCHMARK_PASSWORD.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
+        users, farm_workers, farm_managers = _create_users(
+            db, farm_rows, workers_per_farm, vets, auditors, password_hash
+        )
+        counts.update(farms=len(farm_rows), barns=len(barn_rows),
+                      users=sum(len(role_users) for role_users in users.values()))
+
+        barn_ids = np.array([barn.id for barn in barn_rows])
+        barn_farm_index = np.repeat(np.arange(farms), barns_per_farm)
+        worker_ids = np.array([[worker.id for worker in farm_workers[farm.id]] for farm in farm_rows])
+        manager_ids = np.array([farm_managers[farm.id].id for farm in farm_rows])
+
+        # Checklists: per barn and day, at random times, newest ones still pending approval
+        n = len(barn_ids) * days * checklists_per_barn_per_day
+        barn_index = np.repeat(np.arange(len(barn_ids)), days * checklists_per_barn_per_day)
+        farm_index = barn_farm_index[barn_index]
+        submitted_at = pd.Timestamp(start) + pd.to_timedelta(rng.uniform(0, days * 86400, n), unit="s")
+        approved = (submitted_at < pd.Timestamp(now - timedelta(days=pending_days))) & (rng.random(n) < 0.97)
+        checklists = pd.DataFrame({
+            "barn_id": barn_ids[barn_index],
+            "user_id": worker_ids[farm_index, rng.integers(0, workers_per_farm, n)],
+            "hygiene_score": _scores(rng, n, 7, 2),
+            "mortality_count": rng.poisson(1, n),
+            "feed_quality": _scores(rng, n, 8, 1.5),
+            "water_quality": _scores(rng, n, 8.5, 1),
+            "ventilation_score": _scores(rng, n, 7.5, 1.5),
+            "temperature": np.round(rng.normal(22, 3, n), 1),
+            "humidity": np.round(np.clip(rng.normal(55, 10, n), 0, 100), 1),
+            "submitted_at": submitted_at,
+            "approved": approved,
+            "approved_by": np.where(approved, manager_ids[farm_index], None),
+            "approved_at": np.where(approved, (submitted_at + pd.Timedelta(hours=4)).to_pydatetime(), None),
+        })
+        counts["checklists"] = _insert_frame(db, Checklist.__table__, checklists)
+
+        # Anomaly baselines, as the checklists above would have left them
+        baselines = (
+            checklists.melt(id_vars="barn_id", value_vars=ANOMALY_FEATURES, var_name="feature")
+            .groupby(["barn_id", "feature"])["value"]
+            .agg(count="size", mean="mean", variance="var")
+            .reset_index()
+        )
+        baselines["updated_at"] = now
+        counts["barn_feature_baselines"] = _insert_frame(db, BarnFeatureBaseline.__table__, baselines)
+
+        # Incidents: Poisson count per barn and month
+        n = int(rng.poisson(incidents_per_barn_per_month * months * len(barn_ids)))
+        barn_index = rng.integers(0, len(barn_ids), n)
+        farm_index = barn_farm_index[barn_index]
+        reported_at = pd.Timestamp(start) + pd.to_timedelta(rng.uniform(0, days * 86400, n), unit="s")
+        approved = (reported_at < pd.Timestamp(now - timedelta(days=pending_days))) & (rng.random(n) < 0.9)
+        incidents = pd.DataFrame({
+            "barn_id": barn_ids[barn_index],
+            "user_id": worker_ids[farm_index, rng.integers(0, workers_per_farm, n)],
+            "incident_type": rng.choice(INCIDENT_TYPES, n),
+            "severity": rng.choice(SEVERITIES, n, p=[0.5, 0.35, 0.15]),
+            "description": "Generated incident",
+            "resolved": rng.random(n) < 0.7,
+            "reported_at": reported_at,
+            "approved": approved,
+            "approved_by": np.where(approved, manager_ids[farm_index], None),
+        })
+        counts["incidents"] = _insert_frame(db, Incident.__table__, incidents)
+
+        # Alerts: a history per notified user, most of it read
+        notified = np.array([user.id for role in ("admin", "manager", "vet") for user in users[role]])
+        n = len(notified) * alerts_per_user
+        alerts = pd.DataFrame({
+            "type": rng.choice(ALERT_TYPES, n),
+            "message": "Generated alert",
+            "severity": rng.choice(SEVERITIES, n, p=[0.5, 0.35, 0.15]),
+            "barn_id": barn_ids[rng.integers(0, len(barn_ids), n)],
+            "user_id": np.repeat(notified, alerts_per_user),
+            "read": rng.random(n) < 0.8,
+            "created_at": pd.Timestamp(start) + pd.to_timedelta(rng.uniform(0, days * 86400, n), unit="s"),
+        })
+        counts["alerts"] = _insert_frame(db, Alert.__table__, alerts)
+
+        db.commit()
+
+        # Bulk inserts bypass the change-tracking listeners; log the rows for sync and ETags
+        counts["change_log"] = backfill_changelog(db)
+        seed_table_versions(db)
+        return counts
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--farms", type=int, default=10)
+    parser.add_argument("--barns-per-farm", type=int, default=8)
+    parser.add_argument("--workers-per-farm", type=int, default=5)
+    parser.add_argument("--vets", type=int, default=2)
+    parser.add_argument("--auditors", type=int, default=1)
+    parser.add_argument("--months", type=int, default=6, help="months of history")
+    parser.add_argument("--checklists-per-barn-per-day", type=int, default=2)
+    parser.add_argument("--incidents-per-barn-per-month", type=float, default=3)
+    parser.add_argument("--alerts-per-user", type=int, default=50)
+    parser.add_argument("--reset", action="store_true", help="drop all tables first")
+    parser.add_argument("--seed", type=int, default=42, help="random seed")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    counts = seed_database(
+        farms=args.farms, barns_per_farm=args.barns_per_farm, workers_per_farm=args.workers_per_farm,
+        vets=args.vets, auditors=args.auditors, months=args.months,
+        checklists_per_barn_per_day=args.checklists_per_barn_per_day,
+        incidents_per_barn_per_month=args.incidents_per_barn_per_month,
+        alerts_per_user=args.alerts_per_user, reset=args.reset, seed=args.seed
+    )
+    elapsed = time.perf_counter() - started
+    print(pd.Series(counts, name="rows").to_string())
+    print(f"Seeded in {elapsed:.1f}s; every user's password is {BENCHMARK_PASSWORD!r}")
+
+
+if __name__ == "__main__":
+    main()
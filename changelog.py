@@ -0,0 +1,251 @@
+"""
+Change tracking for the mobile delta sync.
+
+Every flushed insert, update or delete of a farm, barn, checklist,
+incident or alert appends a row to change_log in the same transaction.
+Bulk query.update()/delete() calls are tracked as well. A change_log id
+is the version a client passes back as ``since``. Each entry carries the
+farm (or, for alerts, the user) it belongs to, so the feed can be scoped
+without joining back to rows that may no longer exist.
+
+The same transaction bumps a counter per farm and table (table_versions),
+which the read endpoints turn into ETags without touching the data.
+"""
+
+from datetime import datetime, timedelta
+from sqlalchemy import event, insert, update, select, func, or_, and_
+from sqlalchemy.orm import Session
+from models import Farm, Barn, Checklist, Incident, Alert, ChangeLog, TableVersion
+
+TRACKED_TABLES = {
+    Farm: "farms",
+    Barn: "barns",
+    Checklist: "checklists",
+    Incident: "incidents",
+    Alert: "alerts",
+}
+
+FARM_SCOPED_TABLES = ["farms", "barns", "checklists", "incidents"]
+
+# Entries newer than this may still have uncommitted neighbours with lower ids
+CHANGE_FEED_SETTLE_SECONDS = 5
+
+
+def _scope_values(model, row):
+    """(farm_id, barn_id, user_id) of a tracked row or object"""
+    if model is Farm:
+        return row.id, None, None
+    if model is Barn:
+        return row.farm_id, None, None
+    if model is Alert:
+        return None, None, row.user_id
+    return None, row.barn_id, None
+
+
+def _build_entries(connection, changes):
+    """change_log rows for [(model, row, operation)], resolving farms through barns"""
+    scoped = [(model, row.id, operation, *_scope_values(model, row)) for model, row, operation in changes]
+
+    barn_ids = {barn_id for *_, barn_id, _ in scoped if barn_id is not None}
+    barn_farms = {}
+    if barn_ids:
+        barn_farms = dict(connection.execute(
+            select(Barn.id, Barn.farm_id).where(Barn.id.in_(barn_ids))
+        ).all())
+
+    now = datetime.utcnow()
+    return [{
+        "table_name": TRACKED_TABLES[model],
+        "row_id": row_id,
+        "operation": operation,
+        "farm_id": farm_id if farm_id is not None else barn_farms.get(barn_id),
+        "user_id": user_id,
+        "changed_at": now,
+    } for model, row_id, operation, farm_id, barn_id, user_id in scoped]
+
+
+def _bump_table_versions(connection, entries):
+    """Increment the counter of every (table, farm) touched by the entries"""
+    now = datetime.utcnow()
+    keys = {
+        (entry["table_name"], entry["farm_id"] or 0)
+        for entry in entries if entry["table_name"] in FARM_SCOPED_TABLES
+    }
+    for table_name, farm_id in sorted(keys):
+        updated = connection.execute(
+            update(TableVersion).where(
+                TableVersion.table_name == table_name,
+                TableVersion.farm_id == farm_id
+            ).values(version=TableVersion.version + 1, updated_at=now)
+        ).rowcount
+        if not updated:
+            connection.execute(insert(TableVersion).values(
+                table_name=table_name, farm_id=farm_id, version=1, updated_at=now
+            ))
+
+
+def _log_changes(connection, changes):
+    entries = _build_entries(connection, changes)
+    connection.execute(insert(ChangeLog), entries)
+    _bump_table_versions(connection, entries)
+
+
+@event.listens_for(Session, "after_flush")
+def _record_flush_changes(session, flush_context):
+    changes = []
+    for obj in session.new:
+        if type(obj) in TRACKED_TABLES:
+            changes.append((type(obj), obj, "upsert"))
+    for obj in session.dirty:
+        if type(obj) in TRACKED_TABLES and session.is_modified(obj, include_collections=False):
+            changes.append((type(obj), obj, "upsert"))
+    for obj in session.deleted:
+        if type(obj) in TRACKED_TABLES:
+            changes.append((type(obj), obj, "delete"))
+
+    if changes:
+        _log_changes(session.connection(), changes)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _record_bulk_changes(orm_execute_state):
+    """Track query.update()/delete(), which bypass the flush"""
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return None
+
+    mapper = orm_execute_state.bind_mapper
+    model = mapper.class_ if mapper is not None else None
+    if model not in TRACKED_TABLES:
+        return None
+
+    # Rows the statement will touch, read before it runs so deletes can be logged
+    scope_columns = {
+        Farm: [Farm.id],
+        Barn: [Barn.id, Barn.farm_id],
+        Alert: [Alert.id, Alert.user_id],
+    }.get(model, [model.id, model.barn_id])
+    affected = select(*scope_columns)
+    whereclause = orm_execute_state.statement.whereclause
+    if whereclause is not None:
+        affected = affected.where(whereclause)
+
+    session = orm_execute_state.session
+    rows = session.execute(affected).all()
+    result = orm_execute_state.invoke_statement()
+
+    if rows:
+        operation = "delete" if orm_execute_state.is_delete else "upsert"
+        _log_changes(session.connection(), [(model, row, operation) for row in rows])
+    return result
+
+
+def backfill_changelog(db):
+    """Log every existing row once so a first sync (since=0) sees data written before tracking"""
+    if db.query(ChangeLog.id).first() is not None:
+        return 0
+
+    now = datetime.utcnow()
+    total = 0
+    for model, table_name in TRACKED_TABLES.items():
+        if model is Farm:
+            query = select(Farm.id, Farm.id, None, None)
+        elif model is Barn:
+            query = select(Barn.id, Barn.farm_id, None, None)
+        elif model is Alert:
+            query = select(Alert.id, None, Alert.user_id, None)
+        else:
+            query = select(model.id, None, None, model.barn_id)
+
+        rows = db.execute(query).all()
+        if not rows:
+            continue
+
+        barn_farms = {}
+        if model in (Checklist, Incident):
+            barn_farms = dict(db.execute(select(Barn.id, Barn.farm_id)).all())
+
+        db.execute(insert(ChangeLog), [{
+            "table_name": table_name,
+            "row_id": row_id,
+            "operation": "upsert",
+            "farm_id": farm_id if farm_id is not None else barn_farms.get(barn_id),
+            "user_id": user_id,
+            "changed_at": now,
+        } for row_id, farm_id, user_id, barn_id in rows])
+        total += len(rows)
+
+    db.commit()
+    return total
+
+
+def seed_table_versions(db):
+    """Create missing version counters so concurrent first writes never race to insert them"""
+    existing = set(db.query(TableVersion.table_name, TableVersion.farm_id).all())
+    farm_ids = [0] + [farm_id for farm_id, in db.query(Farm.id).all()]
+    now = datetime.utcnow()
+    missing = [
+        {"table_name": table_name, "farm_id": farm_id, "version": 0, "updated_at": now}
+        for table_name in FARM_SCOPED_TABLES
+        for farm_id in farm_ids
+        if (table_name, farm_id) not in existing
+    ]
+    if missing:
+        db.execute(insert(TableVersion), missing)
+        db.commit()
+    return len(missing)
+
+
+def get_table_versions(db, tables, farm_ids=None):
+    """(((table, farm_id, version), ...), last modified) for the given tables; all farms when farm_ids is None"""
+    query = db.query(
+        TableVersion.table_name, TableVersion.farm_id, TableVersion.version, TableVersion.updated_at
+    ).filter(TableVersion.table_name.in_(list(tables)))
+    if farm_ids is not None:
+        query = query.filter(TableVersion.farm_id.in_(list(farm_ids)))
+
+    rows = query.order_by(TableVersion.table_name, TableVersion.farm_id).all()
+    versions = tuple((table_name, farm_id, version) for table_name, farm_id, version, _ in rows)
+    last_modified = max((updated_at for *_, updated_at in rows if updated_at), default=None)
+    return versions, last_modified
+
+
+def get_changes(db, since, limit, farm_ids, user_id):
+    """Latest change per row after `since` in the caller's scope
+
+    Returns ([(table_name, row_id, operation, version)], next_since, has_more).
+    """
+    scope = or_(
+        and_(ChangeLog.table_name.in_(FARM_SCOPED_TABLES), ChangeLog.farm_id.in_(list(farm_ids))),
+        and_(ChangeLog.table_name == "alerts", ChangeLog.user_id == user_id),
+    )
+
+    latest = db.query(
+        func.max(ChangeLog.id).label("version")
+    ).filter(
+        ChangeLog.id > since, scope
+    ).group_by(
+        ChangeLog.table_name, ChangeLog.row_id
+    ).order_by(
+        func.max(ChangeLog.id)
+    ).limit(limit + 1).all()
+
+    versions = [version for version, in latest]
+    has_more = len(versions) > limit
+    versions = versions[:limit]
+
+    entries = []
+    if versions:
+        entries = db.query(
+            ChangeLog.table_name, ChangeLog.row_id, ChangeLog.operation, ChangeLog.id
+        ).filter(ChangeLog.id.in_(versions)).order_by(ChangeLog.id).all()
+
+    if has_more:
+        next_since = versions[-1]
+    else:
+        # Stop short of very recent entries that concurrent transactions could still precede
+        settled = db.query(func.max(ChangeLog.id)).filter(
+            ChangeLog.changed_at <= datetime.utcnow() - timedelta(seconds=CHANGE_FEED_SETTLE_SECONDS)
+        ).scalar()
+        next_since = max(since, settled or 0)
+
+    return entries, next_since, has_more
@@ -1,11 +1,18 @@
 import streamlit as st
 import pandas as pd
-from database import get_db, assign_user_to_farm, unassign_user_from_farm, get_user_assigned_farms
+from database import get_db, assign_user_to_farm, unassign_user_from_farm, get_user_assigned_farms, bump_data_version
 from models import User, Farm, Barn
 from auth import create_user
 from utils import validate_email, validate_password, check_permissions
 from translations import get_text
+from drift import get_drift_report, DRIFT_PSI_THRESHOLD
+from slow_queries import SLOW_QUERY_MS, get_slow_queries, clear_slow_queries
+from logging_setup import get_logger
+from instrumentation import instrument_render
 
+logger = get_logger(__name__)
+
+@instrument_render
 def render_admin_panel():
     """Render admin panel with user and farm management"""
     if not check_permissions(["admin"]):
@@ -56,6 +63,7 @@ def render_admin_panel():
     with tabs[4]:
         render_system_settings()
 
+@instrument_render
 def render_user_management():
     """Render user management interface"""
     st.subheader(get_text("user_management"))
@@ -192,6 +200,7 @@ def render_user_management():
     finally:
         db.close()
 
+@instrument_render
 def render_farm_management():
     """Render farm management interface"""
     st.subheader("🏠 " + get_text("farm_management"))
@@ -256,6 +265,7 @@ def render_farm_management():
     finally:
         db.close()
 
+@instrument_render
 def render_farm_assignments():
     """Render farm assignment interface for managing user-farm relationships"""
     st.subheader("🔗 Farm Assignments")
@@ -380,6 +390,7 @@ def render_farm_assignments():
     finally:
         db.close()
 
+@instrument_render
 def render_barn_management():
     """Render barn management interface"""
     st.subheader("🏭 Barn Management")
@@ -452,6 +463,7 @@ def render_barn_management():
     finally:
         db.close()
 
+@instrument_render
 def render_system_settings():
     """Render system settings"""
     st.subheader(get_text("system_settings"))
@@ -474,6 +486,49 @@ def render_system_settings():
         with col3:
             st.metric("Total Barns", barn_count)
         
+        # Checklist feature drift against the model's training data
+        st.write("**Checklist Data Drift:**")
+        drift_report = get_drift_report(db)
+        if drift_report:
+            df = pd.DataFrame(drift_report)
+            df["drifting"] = df["psi"].fillna(0) >= DRIFT_PSI_THRESHOLD
+            st.dataframe(
+                df.style.format({
+                    "mean": "{:.2f}", "std": "{:.2f}",
+                    "training_mean": "{:.2f}", "training_std": "{:.2f}",
+                    "psi": "{:.3f}"
+                }, na_rep="—"),
+                use_container_width=True,
+                hide_index=True
+            )
+            st.caption(f"PSI ≥ {DRIFT_PSI_THRESHOLD} raises a data drift alert.")
+        else:
+            st.info("No checklist statistics collected yet.")
+        
+        # Statements above FARMTWIN_SLOW_QUERY_MS in this app process
+        st.write("**Slow Queries:**")
+        if SLOW_QUERY_MS <= 0:
+            st.caption("Slow-query recording is off. Set FARMTWIN_SLOW_QUERY_MS to a threshold in milliseconds to enable it.")
+        else:
+            slow_queries = get_slow_queries()
+            if slow_queries:
+                st.dataframe(
+                    pd.DataFrame(slow_queries)[["recorded_at", "duration_ms", "caller", "statement", "parameters"]]
+                    .style.format({"duration_ms": "{:.1f}"}),
+                    use_container_width=True,
+                    hide_index=True
+                )
+                for query in slow_queries[:10]:
+                    if query["plan"]:
+                        with st.expander(f"Plan: {query['caller']} ({query['duration_ms']:.1f} ms)"):
+                            st.code(query["statement"], language="sql")
+                            st.code(query["plan"])
+                if st.button("Clear Slow Queries"):
+                    clear_slow_queries()
+                    st.rerun()
+            else:
+                st.info(f"No queries slower than {SLOW_QUERY_MS:g} ms recorded yet.")
+        
         # System actions
         st.write("**System Actions:**")
         
@@ -501,7 +556,7 @@ def create_farm(name, location, description):
         return True
     except Exception as e:
         db.rollback()
-        print(f"Error creating farm: {e}")
+        logger.exception("Error creating farm")
         return False
     finally:
         db.close()
@@ -553,10 +608,11 @@ def create_barn(farm_id, name, capacity, position_x, position_y, position_z):
         )
         db.add(barn)
         db.commit()
+        bump_data_version(farm_id, db)
         return True
     except Exception as e:
         db.rollback()
-        print(f"Error creating barn: {e}")
+        logger.exception("Error creating barn")
         return False
     finally:
         db.close()
@@ -2,12 +2,40 @@ import streamlit as st
 import plotly.express as px
 import plotly.graph_objects as go
 import pandas as pd
+import os
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import func
 from datetime import datetime, timedelta
-from database import get_db
-from models import Barn, Checklist, Incident, Alert
+from database import get_read_db, get_accessible_farm_ids, get_data_versions, can_access_all_farms
+from models import Barn, Checklist, Incident, Alert, User
 from utils import check_permissions, export_data_to_csv
+from exports import (
+    EXPORT_FORMATS, write_export_file, get_export_filename, get_export_mime_type
+)
 from translations import get_text
+from timeseries import prepare_time_series
+from instrumentation import instrument_render
 
+# Analytics results are cached per (farm scope, date range, data version).
+# Approvals bump the version of the affected farm only, so entries for
+# other scopes stay valid; max_entries/ttl keep the cache memory bounded.
+# Versions and data both come from the read replica (when configured), never
+# sticking to the primary, so a cached entry always matches its version.
+ANALYTICS_CACHE_TTL = 3600
+ANALYTICS_CACHE_MAX_ENTRIES = 64
+
+def get_analytics_scope():
+    """Return the current user's accessible farm ids and their data versions"""
+    db = get_read_db()
+    try:
+        user_id = st.session_state.get('user').id
+        user_role = st.session_state.get('role')
+        farm_ids = tuple(sorted(get_accessible_farm_ids(user_id, user_role, db)))
+        return farm_ids, get_data_versions(farm_ids, db)
+    finally:
+        db.close()
+
+@instrument_render
 def render_analytics():
     """Render analytics dashboard"""
     if not check_permissions(["admin", "manager", "vet", "auditor"]):
@@ -31,516 +59,644 @@ def render_analytics():
             value=datetime.now().date()
         )
     
-    # Analytics tabs
-    tabs = st.tabs([
-        get_text("risk_analysis"),
-        get_text("mortality_trends"),
-        get_text("hygiene_scores"),
-        get_text("incident_reports"),
-        get_text("compliance_report")
-    ])
+    farm_ids, data_version = get_analytics_scope()
+    if not farm_ids:
+        st.info("No farms assigned. Please contact admin.")
+        return
     
-    with tabs[0]:
-        render_risk_analysis(start_date, end_date)
+    # Only the selected tab is loaded and rendered; st.tabs would build all five
+    analytics_tabs = get_analytics_tabs()
+    tab_labels = [label for label, _, _ in analytics_tabs]
+    selected_label = st.radio(
+        "Analytics view",
+        tab_labels,
+        horizontal=True,
+        label_visibility="collapsed",
+        key="analytics_tab"
+    )
+    selected_index = tab_labels.index(selected_label) if selected_label in tab_labels else 0
     
-    with tabs[1]:
-        render_mortality_trends(start_date, end_date)
+    # Warm the cache for the next tab while the selected one renders
+    next_index = (selected_index + 1) % len(analytics_tabs)
+    prefetch_analytics_tab(analytics_tabs[next_index][1], farm_ids, start_date, end_date, data_version)
     
-    with tabs[2]:
-        render_hygiene_analysis(start_date, end_date)
+    _, _, render_tab = analytics_tabs[selected_index]
+    render_tab(start_date, end_date, farm_ids, data_version)
+
+def get_analytics_tabs():
+    """Return (label, data loader, renderer) for each analytics view"""
+    return [
+        (get_text("risk_analysis"), load_risk_analysis, render_risk_analysis),
+        (get_text("mortality_trends"), load_checklist_scores, render_mortality_trends),
+        (get_text("hygiene_scores"), load_checklist_scores, render_hygiene_analysis),
+        (get_text("incident_reports"), load_incident_analysis, render_incident_analysis),
+        (get_text("compliance_report"), load_compliance_report, render_compliance_report)
+    ]
+
+@st.cache_resource
+def get_prefetch_executor():
+    """Single background worker shared by all sessions for analytics prefetching"""
+    return ThreadPoolExecutor(max_workers=1, thread_name_prefix="analytics-prefetch")
+
+def prefetch_analytics_tab(loader, farm_ids, start_date, end_date, data_version):
+    """Populate a loader's cache entry in the background; failures are ignored"""
+    try:
+        get_prefetch_executor().submit(loader, farm_ids, start_date, end_date, data_version)
+    except RuntimeError:
+        # Executor already shut down (server stopping)
+        pass
+
+@st.cache_data(ttl=ANALYTICS_CACHE_TTL, max_entries=ANALYTICS_CACHE_MAX_ENTRIES, show_spinner=False)
+def load_risk_analysis(farm_ids, start_date, end_date, data_version):
+    """Load barn risk positions and the model-scored daily risk trend"""
+    from ai_engine import risk_predictor
     
-    with tabs[3]:
-        render_incident_analysis(start_date, end_date)
+    db = get_read_db()
+    try:
+        barns = db.query(
+            Barn.name, Barn.position_x, Barn.position_y, Barn.risk_level
+        ).filter(Barn.farm_id.in_(farm_ids)).all()
+        
+        barn_df = pd.DataFrame([{
+            "Barn": barn.name,
+            "X": barn.position_x,
+            "Y": barn.position_y,
+            "Risk": {"high": 3, "medium": 2, "low": 1}.get(barn.risk_level, 1),
+            "Risk_Label": barn.risk_level.title() if barn.risk_level else "Low"
+        } for barn in barns], columns=["Barn", "X", "Y", "Risk", "Risk_Label"])
+        
+        checklists = db.query(
+            Checklist.submitted_at,
+            Checklist.hygiene_score,
+            Checklist.mortality_count,
+            Checklist.feed_quality,
+            Checklist.water_quality,
+            Checklist.ventilation_score,
+            Checklist.temperature,
+            Checklist.humidity
+        ).join(Barn, Checklist.barn_id == Barn.id).filter(
+            Barn.farm_id.in_(farm_ids),
+            Checklist.submitted_at >= start_date,
+            Checklist.submitted_at <= end_date,
+            Checklist.approved == True
+        ).all()
+        
+        daily_risk = pd.DataFrame(columns=["Date", "Risk_Numeric"])
+        bucket_label = "Daily"
+        if checklists:
+            features = [[
+                checklist.hygiene_score or 7,
+                checklist.mortality_count or 0,
+                checklist.feed_quality or 8,
+                checklist.water_quality or 8,
+                checklist.ventilation_score or 7,
+                checklist.temperature or 22,
+                checklist.humidity or 55
+            ] for checklist in checklists]
+            
+            # Score every checklist in one vectorized call (0/1/2 -> 1/2/3)
+            risk_levels, _ = risk_predictor.predict_risk_batch(features)
+            
+            df = pd.DataFrame({
+                "Date": [checklist.submitted_at.date() for checklist in checklists],
+                "Risk_Numeric": risk_levels + 1
+            })
+            daily_risk, bucket_label = prepare_time_series(
+                df, "Date", "Risk_Numeric", "mean", start_date, end_date
+            )
+        
+        return {"barns": barn_df, "daily_risk": daily_risk, "bucket_label": bucket_label}
     
-    with tabs[4]:
-        render_compliance_report(start_date, end_date)
+    finally:
+        db.close()
 
-def render_risk_analysis(start_date, end_date):
+@instrument_render
+def render_risk_analysis(start_date, end_date, farm_ids, data_version):
     """Render risk analysis charts"""
     st.subheader(get_text("risk_analysis"))
     
-    db = get_db()
-    try:
-        # Current risk distribution
-        barns = db.query(Barn).all()
+    data = load_risk_analysis(farm_ids, start_date, end_date, data_version)
+    barn_df = data["barns"]
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        st.write("**Current Risk Distribution**")
         
-        col1, col2 = st.columns(2)
+        risk_counts = {"High": 0, "Medium": 0, "Low": 0}
+        for risk_label, count in barn_df["Risk_Label"].value_counts().items():
+            risk_counts[risk_label] = risk_counts.get(risk_label, 0) + int(count)
         
-        with col1:
-            st.write("**Current Risk Distribution**")
-            
-            risk_counts = {"High": 0, "Medium": 0, "Low": 0}
-            for barn in barns:
-                risk_level = barn.risk_level.title() if barn.risk_level else "Low"
-                risk_counts[risk_level] = risk_counts.get(risk_level, 0) + 1
+        fig = px.pie(
+            values=list(risk_counts.values()),
+            names=list(risk_counts.keys()),
+            color_discrete_map={
+                "High": "#ff4444",
+                "Medium": "#ffaa00", 
+                "Low": "#44ff44"
+            },
+            title="Risk Level Distribution"
+        )
+        
+        st.plotly_chart(fig, use_container_width=True)
+    
+    with col2:
+        st.write("**Barn Risk Heatmap**")
+        
+        if not barn_df.empty:
+            fig = px.scatter(
+                barn_df, x="X", y="Y", 
+                color="Risk",
+                size="Risk",
+                hover_name="Barn",
+                hover_data=["Risk_Label"],
+                color_continuous_scale=["green", "yellow", "red"],
+                title="Farm Risk Heatmap"
+            )
             
-            fig = px.pie(
-                values=list(risk_counts.values()),
-                names=list(risk_counts.keys()),
-                color_discrete_map={
-                    "High": "#ff4444",
-                    "Medium": "#ffaa00", 
-                    "Low": "#44ff44"
-                },
-                title="Risk Level Distribution"
+            fig.update_layout(
+                xaxis_title="Position X",
+                yaxis_title="Position Y"
             )
             
             st.plotly_chart(fig, use_container_width=True)
+    
+    # Risk trends over time
+    st.write("**Risk Trends Over Time**")
+    
+    daily_risk = data["daily_risk"]
+    if not daily_risk.empty:
+        fig = px.line(
+            daily_risk, x="Date", y="Risk_Numeric",
+            title=f"Average Risk Level Trend ({data['bucket_label']})",
+            labels={"Risk_Numeric": "Average Risk Level"}
+        )
         
-        with col2:
-            st.write("**Barn Risk Heatmap**")
-            
-            if barns:
-                barn_data = []
-                for barn in barns:
-                    risk_numeric = {"high": 3, "medium": 2, "low": 1}.get(barn.risk_level, 1)
-                    barn_data.append({
-                        "Barn": barn.name,
-                        "X": barn.position_x,
-                        "Y": barn.position_y,
-                        "Risk": risk_numeric,
-                        "Risk_Label": barn.risk_level.title() if barn.risk_level else "Low"
-                    })
-                
-                df = pd.DataFrame(barn_data)
-                
-                fig = px.scatter(
-                    df, x="X", y="Y", 
-                    color="Risk",
-                    size="Risk",
-                    hover_name="Barn",
-                    hover_data=["Risk_Label"],
-                    color_continuous_scale=["green", "yellow", "red"],
-                    title="Farm Risk Heatmap"
-                )
-                
-                fig.update_layout(
-                    xaxis_title="Position X",
-                    yaxis_title="Position Y"
-                )
-                
-                st.plotly_chart(fig, use_container_width=True)
-        
-        # Risk trends over time
-        st.write("**Risk Trends Over Time**")
-        
-        checklists = db.query(Checklist).filter(
+        fig.update_layout(
+            yaxis=dict(
+                tickmode="array",
+                tickvals=[1, 2, 3],
+                ticktext=["Low", "Medium", "High"]
+            )
+        )
+        
+        st.plotly_chart(fig, use_container_width=True)
+
+@st.cache_data(ttl=ANALYTICS_CACHE_TTL, max_entries=ANALYTICS_CACHE_MAX_ENTRIES, show_spinner=False)
+def load_checklist_scores(farm_ids, start_date, end_date, data_version):
+    """Load approved checklist scores for the mortality and hygiene tabs"""
+    db = get_read_db()
+    try:
+        checklists = db.query(
+            Checklist.submitted_at,
+            Barn.name.label("barn_name"),
+            Checklist.mortality_count,
+            Checklist.hygiene_score,
+            Checklist.feed_quality,
+            Checklist.water_quality,
+            Checklist.ventilation_score
+        ).join(Barn, Checklist.barn_id == Barn.id).filter(
+            Barn.farm_id.in_(farm_ids),
             Checklist.submitted_at >= start_date,
             Checklist.submitted_at <= end_date,
             Checklist.approved == True
         ).all()
         
-        if checklists:
-            from ai_engine import risk_predictor
-            
-            trend_data = []
-            for checklist in checklists:
-                features = [
-                    checklist.hygiene_score or 7,
-                    checklist.mortality_count or 0,
-                    checklist.feed_quality or 8,
-                    checklist.water_quality or 8,
-                    checklist.ventilation_score or 7,
-                    checklist.temperature or 22,
-                    checklist.humidity or 55
-                ]
-                
-                risk_level, _ = risk_predictor.predict_risk(features)
-                risk_label = risk_predictor.get_risk_label(risk_level)
-                
-                trend_data.append({
-                    "Date": checklist.submitted_at.date(),
-                    "Barn": checklist.barn.name if checklist.barn else "Unknown",
-                    "Risk_Level": risk_label,
-                    "Risk_Numeric": {"High": 3, "Medium": 2, "Low": 1}[risk_label]
-                })
-            
-            if trend_data:
-                df = pd.DataFrame(trend_data)
-                
-                # Group by date and calculate average risk
-                daily_risk = df.groupby("Date")["Risk_Numeric"].mean().reset_index()
-                
-                fig = px.line(
-                    daily_risk, x="Date", y="Risk_Numeric",
-                    title="Average Risk Level Trend",
-                    labels={"Risk_Numeric": "Average Risk Level"}
-                )
-                
-                fig.update_layout(
-                    yaxis=dict(
-                        tickmode="array",
-                        tickvals=[1, 2, 3],
-                        ticktext=["Low", "Medium", "High"]
-                    )
-                )
-                
-                st.plotly_chart(fig, use_container_width=True)
+        return pd.DataFrame([{
+            "Date": checklist.submitted_at.date(),
+            "Barn": checklist.barn_name or "Unknown",
+            "Mortality_Count": checklist.mortality_count or 0,
+            "Hygiene_Score": checklist.hygiene_score or 0,
+            "Feed_Quality": checklist.feed_quality or 0,
+            "Water_Quality": checklist.water_quality or 0,
+            "Ventilation_Score": checklist.ventilation_score or 0
+        } for checklist in checklists], columns=[
+            "Date", "Barn", "Mortality_Count", "Hygiene_Score",
+            "Feed_Quality", "Water_Quality", "Ventilation_Score"
+        ])
     
     finally:
         db.close()
 
-def render_mortality_trends(start_date, end_date):
+@instrument_render
+def render_mortality_trends(start_date, end_date, farm_ids, data_version):
     """Render mortality trend analysis"""
     st.subheader(get_text("mortality_trends"))
     
-    db = get_db()
-    try:
-        checklists = db.query(Checklist).filter(
-            Checklist.submitted_at >= start_date,
-            Checklist.submitted_at <= end_date,
-            Checklist.approved == True
-        ).all()
+    scores = load_checklist_scores(farm_ids, start_date, end_date, data_version)
+    
+    if not scores.empty:
+        df = scores[["Date", "Barn", "Mortality_Count"]]
         
-        if checklists:
-            mortality_data = []
-            for checklist in checklists:
-                mortality_data.append({
-                    "Date": checklist.submitted_at.date(),
-                    "Barn": checklist.barn.name if checklist.barn else "Unknown",
-                    "Mortality_Count": checklist.mortality_count or 0
-                })
-            
-            df = pd.DataFrame(mortality_data)
-            
-            # Daily totals
-            daily_mortality = df.groupby("Date")["Mortality_Count"].sum().reset_index()
-            
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                st.write("**Daily Mortality Trend**")
-                
-                fig = px.line(
-                    daily_mortality, x="Date", y="Mortality_Count",
-                    title="Daily Mortality Count"
-                )
-                
-                st.plotly_chart(fig, use_container_width=True)
-            
-            with col2:
-                st.write("**Mortality by Barn**")
-                
-                barn_mortality = df.groupby("Barn")["Mortality_Count"].sum().reset_index()
-                
-                fig = px.bar(
-                    barn_mortality, x="Barn", y="Mortality_Count",
-                    title="Total Mortality by Barn"
-                )
-                
-                st.plotly_chart(fig, use_container_width=True)
-            
-            # Statistics
-            total_mortality = df["Mortality_Count"].sum()
-            avg_daily = daily_mortality["Mortality_Count"].mean()
-            
-            col1, col2, col3 = st.columns(3)
-            with col1:
-                st.metric("Total Mortality", total_mortality)
-            with col2:
-                st.metric("Average Daily", f"{avg_daily:.1f}")
-            with col3:
-                highest_day = daily_mortality.loc[daily_mortality["Mortality_Count"].idxmax()]
-                st.metric("Highest Single Day", f"{highest_day['Mortality_Count']} ({highest_day['Date']})")
-        
-        else:
-            st.info("No mortality data available for the selected period")
+        # Daily totals
+        daily_mortality = df.groupby("Date")["Mortality_Count"].sum().reset_index()
+        
+        # Bucketed/downsampled copy for the chart; stats below use daily totals
+        mortality_trend, bucket_label = prepare_time_series(
+            df, "Date", "Mortality_Count", "sum", start_date, end_date
+        )
+        
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            st.write(f"**{bucket_label} Mortality Trend**")
+            
+            fig = px.line(
+                mortality_trend, x="Date", y="Mortality_Count",
+                title=f"{bucket_label} Mortality Count"
+            )
+            
+            st.plotly_chart(fig, use_container_width=True)
+        
+        with col2:
+            st.write("**Mortality by Barn**")
+            
+            barn_mortality = df.groupby("Barn")["Mortality_Count"].sum().reset_index()
+            
+            fig = px.bar(
+                barn_mortality, x="Barn", y="Mortality_Count",
+                title="Total Mortality by Barn"
+            )
+            
+            st.plotly_chart(fig, use_container_width=True)
+        
+        # Statistics
+        total_mortality = df["Mortality_Count"].sum()
+        avg_daily = daily_mortality["Mortality_Count"].mean()
+        
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("Total Mortality", total_mortality)
+        with col2:
+            st.metric("Average Daily", f"{avg_daily:.1f}")
+        with col3:
+            highest_day = daily_mortality.loc[daily_mortality["Mortality_Count"].idxmax()]
+            st.metric("Highest Single Day", f"{highest_day['Mortality_Count']} ({highest_day['Date']})")
     
-    finally:
-        db.close()
+    else:
+        st.info("No mortality data available for the selected period")
 
-def render_hygiene_analysis(start_date, end_date):
+@instrument_render
+def render_hygiene_analysis(start_date, end_date, farm_ids, data_version):
     """Render hygiene score analysis"""
     st.subheader(get_text("hygiene_analysis"))
     
-    db = get_db()
-    try:
-        checklists = db.query(Checklist).filter(
-            Checklist.submitted_at >= start_date,
-            Checklist.submitted_at <= end_date,
-            Checklist.approved == True
-        ).all()
+    scores = load_checklist_scores(farm_ids, start_date, end_date, data_version)
+    
+    if not scores.empty:
+        df = scores[[
+            "Date", "Barn", "Hygiene_Score", "Feed_Quality",
+            "Water_Quality", "Ventilation_Score"
+        ]]
         
-        if checklists:
-            hygiene_data = []
-            for checklist in checklists:
-                hygiene_data.append({
-                    "Date": checklist.submitted_at.date(),
-                    "Barn": checklist.barn.name if checklist.barn else "Unknown",
-                    "Hygiene_Score": checklist.hygiene_score or 0,
-                    "Feed_Quality": checklist.feed_quality or 0,
-                    "Water_Quality": checklist.water_quality or 0,
-                    "Ventilation_Score": checklist.ventilation_score or 0
-                })
-            
-            df = pd.DataFrame(hygiene_data)
-            
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                st.write("**Average Hygiene Scores by Barn**")
-                
-                barn_hygiene = df.groupby("Barn").agg({
-                    "Hygiene_Score": "mean",
-                    "Feed_Quality": "mean",
-                    "Water_Quality": "mean",
-                    "Ventilation_Score": "mean"
-                }).round(1)
-                
-                fig = go.Figure()
-                
-                fig.add_trace(go.Bar(
-                    name="Hygiene",
-                    x=barn_hygiene.index,
-                    y=barn_hygiene["Hygiene_Score"]
-                ))
-                
-                fig.add_trace(go.Bar(
-                    name="Feed Quality",
-                    x=barn_hygiene.index,
-                    y=barn_hygiene["Feed_Quality"]
-                ))
-                
-                fig.add_trace(go.Bar(
-                    name="Water Quality",
-                    x=barn_hygiene.index,
-                    y=barn_hygiene["Water_Quality"]
-                ))
-                
-                fig.add_trace(go.Bar(
-                    name="Ventilation",
-                    x=barn_hygiene.index,
-                    y=barn_hygiene["Ventilation_Score"]
-                ))
-                
-                fig.update_layout(
-                    title="Quality Scores by Barn",
-                    barmode="group",
-                    yaxis_title="Score (1-10)"
-                )
-                
-                st.plotly_chart(fig, use_container_width=True)
-            
-            with col2:
-                st.write("**Hygiene Trends Over Time**")
-                
-                daily_hygiene = df.groupby("Date")["Hygiene_Score"].mean().reset_index()
-                
-                fig = px.line(
-                    daily_hygiene, x="Date", y="Hygiene_Score",
-                    title="Average Daily Hygiene Score"
-                )
-                
-                fig.update_layout(yaxis_range=[0, 10])
-                
-                st.plotly_chart(fig, use_container_width=True)
-            
-            # Score distribution
-            st.write("**Score Distribution**")
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            st.write("**Average Hygiene Scores by Barn**")
+            
+            barn_hygiene = df.groupby("Barn").agg({
+                "Hygiene_Score": "mean",
+                "Feed_Quality": "mean",
+                "Water_Quality": "mean",
+                "Ventilation_Score": "mean"
+            }).round(1)
             
             fig = go.Figure()
             
-            fig.add_trace(go.Histogram(
-                x=df["Hygiene_Score"],
+            fig.add_trace(go.Bar(
                 name="Hygiene",
-                opacity=0.7,
-                nbinsx=10
+                x=barn_hygiene.index,
+                y=barn_hygiene["Hygiene_Score"]
+            ))
+            
+            fig.add_trace(go.Bar(
+                name="Feed Quality",
+                x=barn_hygiene.index,
+                y=barn_hygiene["Feed_Quality"]
+            ))
+            
+            fig.add_trace(go.Bar(
+                name="Water Quality",
+                x=barn_hygiene.index,
+                y=barn_hygiene["Water_Quality"]
+            ))
+            
+            fig.add_trace(go.Bar(
+                name="Ventilation",
+                x=barn_hygiene.index,
+                y=barn_hygiene["Ventilation_Score"]
             ))
             
             fig.update_layout(
-                title="Hygiene Score Distribution",
-                xaxis_title="Score",
-                yaxis_title="Frequency"
+                title="Quality Scores by Barn",
+                barmode="group",
+                yaxis_title="Score (1-10)"
             )
             
             st.plotly_chart(fig, use_container_width=True)
+        
+        with col2:
+            st.write("**Hygiene Trends Over Time**")
+            
+            hygiene_trend, bucket_label = prepare_time_series(
+                df, "Date", "Hygiene_Score", "mean", start_date, end_date
+            )
             
-            # Export data
-            if st.button("Export Hygiene Data"):
-                export_data_to_csv(hygiene_data, f"hygiene_analysis_{start_date}_{end_date}.csv")
+            fig = px.line(
+                hygiene_trend, x="Date", y="Hygiene_Score",
+                title=f"Average {bucket_label} Hygiene Score"
+            )
+            
+            fig.update_layout(yaxis_range=[0, 10])
+            
+            st.plotly_chart(fig, use_container_width=True)
+        
+        # Score distribution
+        st.write("**Score Distribution**")
+        
+        fig = go.Figure()
+        
+        fig.add_trace(go.Histogram(
+            x=df["Hygiene_Score"],
+            name="Hygiene",
+            opacity=0.7,
+            nbinsx=10
+        ))
         
-        else:
-            st.info("No hygiene data available for the selected period")
+        fig.update_layout(
+            title="Hygiene Score Distribution",
+            xaxis_title="Score",
+            yaxis_title="Frequency"
+        )
+        
+        st.plotly_chart(fig, use_container_width=True)
+        
+        # Export data
+        if st.button("Export Hygiene Data"):
+            export_data_to_csv(df, f"hygiene_analysis_{start_date}_{end_date}.csv")
+        
+        render_export_controls(["checklists"], farm_ids, start_date, end_date, key="hygiene_export")
     
-    finally:
-        db.close()
+    else:
+        st.info("No hygiene data available for the selected period")
 
-def render_incident_analysis(start_date, end_date):
-    """Render incident analysis"""
-    st.subheader(get_text("incident_analysis"))
-    
-    db = get_db()
+@st.cache_data(ttl=ANALYTICS_CACHE_TTL, max_entries=ANALYTICS_CACHE_MAX_ENTRIES, show_spinner=False)
+def load_incident_analysis(farm_ids, start_date, end_date, data_version):
+    """Load approved incidents for the incident analysis tab"""
+    db = get_read_db()
     try:
-        incidents = db.query(Incident).filter(
+        incidents = db.query(
+            Incident.reported_at,
+            Incident.incident_type,
+            Incident.severity,
+            Incident.resolved,
+            Barn.name.label("barn_name"),
+            User.name.label("reporter_name")
+        ).join(Barn, Incident.barn_id == Barn.id).outerjoin(
+            User, Incident.user_id == User.id
+        ).filter(
+            Barn.farm_id.in_(farm_ids),
             Incident.reported_at >= start_date,
             Incident.reported_at <= end_date,
             Incident.approved == True
         ).all()
         
-        if incidents:
-            incident_data = []
-            for incident in incidents:
-                incident_data.append({
-                    "Date": incident.reported_at.date(),
-                    "Barn": incident.barn.name if incident.barn else "Unknown",
-                    "Type": incident.incident_type.replace("_", " ").title(),
-                    "Severity": incident.severity.title(),
-                    "Resolved": incident.resolved,
-                    "Reporter": incident.user.name if incident.user else "Unknown"
-                })
-            
-            df = pd.DataFrame(incident_data)
-            
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                st.write("**Incidents by Type**")
-                
-                type_counts = df["Type"].value_counts()
-                
-                fig = px.pie(
-                    values=type_counts.values,
-                    names=type_counts.index,
-                    title="Incident Distribution by Type"
-                )
-                
-                st.plotly_chart(fig, use_container_width=True)
-            
-            with col2:
-                st.write("**Incidents by Severity**")
-                
-                severity_counts = df["Severity"].value_counts()
-                
-                fig = px.bar(
-                    x=severity_counts.index,
-                    y=severity_counts.values,
-                    title="Incident Count by Severity",
-                    color=severity_counts.index,
-                    color_discrete_map={
-                        "High": "#ff4444",
-                        "Medium": "#ffaa00",
-                        "Low": "#44ff44"
-                    }
-                )
-                
-                st.plotly_chart(fig, use_container_width=True)
-            
-            # Resolution status
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                resolved_count = df["Resolved"].sum()
-                total_count = len(df)
-                resolution_rate = (resolved_count / total_count * 100) if total_count > 0 else 0
-                
-                st.metric("Resolution Rate", f"{resolution_rate:.1f}%")
-                st.metric("Resolved", resolved_count)
-                st.metric("Unresolved", total_count - resolved_count)
-            
-            with col2:
-                st.write("**Incidents Over Time**")
-                
-                daily_incidents = df.groupby("Date").size().reset_index(name="Count")
-                
-                fig = px.line(
-                    daily_incidents, x="Date", y="Count",
-                    title="Daily Incident Count"
-                )
-                
-                st.plotly_chart(fig, use_container_width=True)
-            
-            # Detailed incident table
-            st.write("**Incident Details**")
-            st.dataframe(df, use_container_width=True)
-            
-            # Export data
-            if st.button("Export Incident Data"):
-                export_data_to_csv(incident_data, f"incident_analysis_{start_date}_{end_date}.csv")
-        
-        else:
-            st.info("No incidents reported during the selected period")
+        return pd.DataFrame([{
+            "Date": incident.reported_at.date(),
+            "Barn": incident.barn_name or "Unknown",
+            "Type": incident.incident_type.replace("_", " ").title(),
+            "Severity": incident.severity.title(),
+            "Resolved": incident.resolved,
+            "Reporter": incident.reporter_name or "Unknown"
+        } for incident in incidents], columns=[
+            "Date", "Barn", "Type", "Severity", "Resolved", "Reporter"
+        ])
     
     finally:
         db.close()
 
-def render_compliance_report(start_date, end_date):
-    """Render compliance report"""
-    st.subheader(get_text("compliance_report"))
+@instrument_render
+def render_incident_analysis(start_date, end_date, farm_ids, data_version):
+    """Render incident analysis"""
+    st.subheader(get_text("incident_analysis"))
     
-    db = get_db()
-    try:
-        # Checklist compliance
-        barns = db.query(Barn).all()
-        
-        compliance_data = []
-        for barn in barns:
-            checklists = db.query(Checklist).filter(
-                Checklist.barn_id == barn.id,
-                Checklist.submitted_at >= start_date,
-                Checklist.submitted_at <= end_date,
-                Checklist.approved == True
-            ).count()
-            
-            # Expected checklists (1 per day)
-            days = (datetime.now().date() - start_date).days + 1
-            expected = min(days, (end_date - start_date).days + 1)
-            
-            compliance_rate = (checklists / expected * 100) if expected > 0 else 0
-            
-            compliance_data.append({
-                "Barn": barn.name,
-                "Expected_Checklists": expected,
-                "Submitted_Checklists": checklists,
-                "Compliance_Rate": compliance_rate,
-                "Status": "Compliant" if compliance_rate >= 80 else "Non-Compliant"
-            })
-        
-        df = pd.DataFrame(compliance_data)
-        
-        # Compliance metrics
-        col1, col2, col3 = st.columns(3)
+    df = load_incident_analysis(farm_ids, start_date, end_date, data_version)
+    
+    if not df.empty:
+        col1, col2 = st.columns(2)
         
         with col1:
-            avg_compliance = df["Compliance_Rate"].mean()
-            st.metric("Average Compliance", f"{avg_compliance:.1f}%")
+            st.write("**Incidents by Type**")
+            
+            type_counts = df["Type"].value_counts()
+            
+            fig = px.pie(
+                values=type_counts.values,
+                names=type_counts.index,
+                title="Incident Distribution by Type"
+            )
+            
+            st.plotly_chart(fig, use_container_width=True)
         
         with col2:
-            compliant_barns = len(df[df["Status"] == "Compliant"])
-            st.metric("Compliant Barns", f"{compliant_barns}/{len(df)}")
+            st.write("**Incidents by Severity**")
+            
+            severity_counts = df["Severity"].value_counts()
+            
+            fig = px.bar(
+                x=severity_counts.index,
+                y=severity_counts.values,
+                title="Incident Count by Severity",
+                color=severity_counts.index,
+                color_discrete_map={
+                    "High": "#ff4444",
+                    "Medium": "#ffaa00",
+                    "Low": "#44ff44"
+                }
+            )
+            
+            st.plotly_chart(fig, use_container_width=True)
         
-        with col3:
-            total_expected = df["Expected_Checklists"].sum()
-            total_submitted = df["Submitted_Checklists"].sum()
-            overall_rate = (total_submitted / total_expected * 100) if total_expected > 0 else 0
-            st.metric("Overall Rate", f"{overall_rate:.1f}%")
-        
-        # Compliance chart
-        fig = px.bar(
-            df, x="Barn", y="Compliance_Rate",
-            title="Checklist Compliance by Barn",
-            color="Status",
-            color_discrete_map={
-                "Compliant": "#44ff44",
-                "Non-Compliant": "#ff4444"
-            }
-        )
+        # Resolution status
+        col1, col2 = st.columns(2)
         
-        fig.add_hline(y=80, line_dash="dash", line_color="orange", 
-                      annotation_text="80% Compliance Threshold")
+        with col1:
+            resolved_count = df["Resolved"].sum()
+            total_count = len(df)
+            resolution_rate = (resolved_count / total_count * 100) if total_count > 0 else 0
+            
+            st.metric("Resolution Rate", f"{resolution_rate:.1f}%")
+            st.metric("Resolved", resolved_count)
+            st.metric("Unresolved", total_count - resolved_count)
         
-        st.plotly_chart(fig, use_container_width=True)
+        with col2:
+            st.write("**Incidents Over Time**")
+            
+            incident_trend, bucket_label = prepare_time_series(
+                df.assign(Count=1), "Date", "Count", "count", start_date, end_date
+            )
+            
+            fig = px.line(
+                incident_trend, x="Date", y="Count",
+                title=f"{bucket_label} Incident Count"
+            )
+            
+            st.plotly_chart(fig, use_container_width=True)
         
-        # Detailed compliance table
-        st.write("**Detailed Compliance Report**")
+        # Detailed incident table
+        st.write("**Incident Details**")
         st.dataframe(df, use_container_width=True)
         
-        # Generate PDF report (placeholder)
-        if st.button("Generate PDF Report"):
-            st.info("PDF generation feature would be implemented with ReportLab")
-        
         # Export data
-        if st.button("Export Compliance Data"):
-            export_data_to_csv(compliance_data, f"compliance_report_{start_date}_{end_date}.csv")
+        if st.button("Export Incident Data"):
+            export_data_to_csv(df, f"incident_analysis_{start_date}_{end_date}.csv")
+        
+        render_export_controls(["incidents"], farm_ids, start_date, end_date, key="incident_export")
     
+    else:
+        st.info("No incidents reported during the selected period")
+
+def get_compliance_report(farm_ids, start_date, end_date, db, today=None):
+    """Per-barn checklist compliance of the given farms as a DataFrame"""
+    barns = db.query(Barn.id, Barn.name).filter(Barn.farm_id.in_(farm_ids)).all()
+    
+    # One grouped count instead of a query per barn
+    submitted_counts = dict(
+        db.query(Checklist.barn_id, func.count(Checklist.id)).join(
+            Barn, Checklist.barn_id == Barn.id
+        ).filter(
+            Barn.farm_id.in_(farm_ids),
+            Checklist.submitted_at >= start_date,
+            Checklist.submitted_at <= end_date,
+            Checklist.approved == True
+        ).group_by(Checklist.barn_id).all()
+    )
+    
+    # Expected checklists (1 per day)
+    days = ((today or datetime.now().date()) - start_date).days + 1
+    expected = min(days, (end_date - start_date).days + 1)
+    
+    compliance_data = []
+    for barn in barns:
+        checklists = submitted_counts.get(barn.id, 0)
+        compliance_rate = (checklists / expected * 100) if expected > 0 else 0
+        
+        compliance_data.append({
+            "Barn": barn.name,
+            "Expected_Checklists": expected,
+            "Submitted_Checklists": checklists,
+            "Compliance_Rate": compliance_rate,
+            "Status": "Compliant" if compliance_rate >= 80 else "Non-Compliant"
+        })
+    
+    return pd.DataFrame(compliance_data, columns=[
+        "Barn", "Expected_Checklists", "Submitted_Checklists",
+        "Compliance_Rate", "Status"
+    ])
+
+@st.cache_data(ttl=ANALYTICS_CACHE_TTL, max_entries=ANALYTICS_CACHE_MAX_ENTRIES, show_spinner=False)
+def load_compliance_report(farm_ids, start_date, end_date, data_version):
+    """Load per-barn checklist compliance for the compliance tab"""
+    db = get_read_db()
+    try:
+        return get_compliance_report(farm_ids, start_date, end_date, db)
     finally:
         db.close()
+
+@instrument_render
+def render_compliance_report(start_date, end_date, farm_ids, data_version):
+    """Render compliance report"""
+    st.subheader(get_text("compliance_report"))
+    
+    df = load_compliance_report(farm_ids, start_date, end_date, data_version)
+    
+    # Compliance metrics
+    col1, col2, col3 = st.columns(3)
+    
+    with col1:
+        avg_compliance = df["Compliance_Rate"].mean() if not df.empty else 0
+        st.metric("Average Compliance", f"{avg_compliance:.1f}%")
+    
+    with col2:
+        compliant_barns = len(df[df["Status"] == "Compliant"])
+        st.metric("Compliant Barns", f"{compliant_barns}/{len(df)}")
+    
+    with col3:
+        total_expected = df["Expected_Checklists"].sum()
+        total_submitted = df["Submitted_Checklists"].sum()
+        overall_rate = (total_submitted / total_expected * 100) if total_expected > 0 else 0
+        st.metric("Overall Rate", f"{overall_rate:.1f}%")
+    
+    # Compliance chart
+    fig = px.bar(
+        df, x="Barn", y="Compliance_Rate",
+        title="Checklist Compliance by Barn",
+        color="Status",
+        color_discrete_map={
+            "Compliant": "#44ff44",
+            "Non-Compliant": "#ff4444"
+        }
+    )
+    
+    fig.add_hline(y=80, line_dash="dash", line_color="orange", 
+                  annotation_text="80% Compliance Threshold")
+    
+    st.plotly_chart(fig, use_container_width=True)
+    
+    # Detailed compliance table
+    st.write("**Detailed Compliance Report**")
+    st.dataframe(df, use_container_width=True)
+    
+    # Generate PDF report (placeholder)
+    if st.button("Generate PDF Report"):
+        st.info("PDF generation feature would be implemented with ReportLab")
+    
+    # Export data
+    if st.button("Export Compliance Data"):
+        export_data_to_csv(df, f"compliance_report_{start_date}_{end_date}.csv")
+    
+    render_export_controls(
+        ["checklists", "incidents", "alerts", "visitors"],
+        farm_ids, start_date, end_date, key="audit_export"
+    )
+
+@instrument_render
+def render_export_controls(kinds, farm_ids, start_date, end_date, key):
+    """Render streaming CSV/Parquet export controls for raw audit data"""
+    with st.expander("📦 Export Raw Data"):
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            kind = st.selectbox("Data", kinds, format_func=str.title, key=f"{key}_kind")
+        
+        with col2:
+            file_format = st.selectbox("Format", EXPORT_FORMATS, format_func=str.upper, key=f"{key}_format")
+        
+        # Streamlit holds a download's bytes in server memory, so files are only
+        # built on request; the mobile API's /api/export/{kind} streams instead
+        st.caption("Large exports: use the API endpoint /api/export/{kind}, which streams the file.")
+        
+        if st.button("Prepare Export", key=f"{key}_prepare"):
+            try:
+                with st.spinner("Preparing export..."):
+                    path = write_export_file(
+                        kind, farm_ids, start_date, end_date, file_format,
+                        include_unscoped=can_access_all_farms(st.session_state.get('role'))
+                    )
+            except RuntimeError as e:
+                st.error(str(e))
+                return
+            
+            try:
+                with open(path, "rb") as f:
+                    data = f.read()
+            finally:
+                os.remove(path)
+            
+            st.download_button(
+                label=f"Download {file_format.upper()}",
+                data=data,
+                file_name=get_export_filename(kind, start_date, end_date, file_format),
+                mime=get_export_mime_type(file_format),
+                key=f"{key}_download"
+            )
@@ -1,12 +1,19 @@
 import streamlit as st
 from datetime import datetime
-from database import get_db, get_accessible_farm_ids
+from sqlalchemy import func
+from database import get_db, get_accessible_farm_ids, bump_data_version, mark_user_write
 from models import Checklist, Incident, Barn
 from utils import check_permissions, create_alert
-from ai_engine import risk_predictor
+from risk_scheduler import request_risk_recompute
+from anomaly import ANOMALY_THRESHOLD, describe_flags
 from components.notifications import notify_worker_on_checklist_approval, notify_worker_on_incident_approval
+from logging_setup import get_logger
+from instrumentation import instrument_render
 
+logger = get_logger(__name__)
 
+
+@instrument_render
 def render_manager_approvals():
     """Managers approve worker-submitted checklists and incidents before they appear in dashboards/analytics."""
     if not check_permissions(["manager", "admin"]):
@@ -37,12 +44,15 @@ def render_manager_approvals():
                 db.query(Checklist)
                 .join(Barn, Checklist.barn_id == Barn.id)
                 .filter(Checklist.approved == False, Barn.farm_id.in_(accessible_farm_ids))
-                .order_by(Checklist.submitted_at.desc())
+                .order_by(func.coalesce(Checklist.anomaly_score, 0).desc(), Checklist.submitted_at.desc())
                 .all()
             )
         if pending_checklists:
             for cl in pending_checklists:
-                with st.expander(f"Barn: {cl.barn.name if cl.barn else 'Unknown'} | By: {cl.user.name if cl.user else 'Unknown'} | At: {cl.submitted_at.strftime('%Y-%m-%d %H:%M')}"):
+                anomalous = (cl.anomaly_score or 0) >= ANOMALY_THRESHOLD
+                with st.expander(f"{'🚩 ' if anomalous else ''}Barn: {cl.barn.name if cl.barn else 'Unknown'} | By: {cl.user.name if cl.user else 'Unknown'} | At: {cl.submitted_at.strftime('%Y-%m-%d %H:%M')}"):
+                    if anomalous:
+                        st.warning(f"Unusual values: {describe_flags(cl.anomaly_flags)}")
                     col1, col2 = st.columns(2)
                     with col1:
                         st.write(f"Hygiene: {cl.hygiene_score}")
@@ -61,41 +71,20 @@ def render_manager_approvals():
                         cl.approved_by = user_id
                         cl.approved_at = datetime.utcnow()
                         db.commit()
+                        mark_user_write(user_id)
+                        if cl.barn:
+                            bump_data_version(cl.barn.farm_id, db)
                         
                         # Notify the worker
                         try:
                             approver_name = st.session_state.user.name
                             notify_worker_on_checklist_approval(cl, approver_name)
                         except Exception as e:
-                            print(f"Warning: Failed to send approval notification: {e}")
+                            logger.warning("Failed to send approval notification: %s", e)
                         
-                        # After approval, compute risk and update barn
-                        features = [
-                            cl.hygiene_score or 7,
-                            cl.mortality_count or 0,
-                            cl.feed_quality or 8,
-                            cl.water_quality or 8,
-                            cl.ventilation_score or 7,
-                            cl.temperature or 22,
-                            cl.humidity or 55,
-                        ]
-                        risk_level, _ = risk_predictor.predict_risk(features)
-                        risk_label = risk_predictor.get_risk_label(risk_level)
-                        barn = db.query(Barn).filter(Barn.id == cl.barn_id).first()
-                        if barn:
-                            barn.risk_level = risk_label.lower()
-                            barn.last_updated = datetime.utcnow()
-                            db.commit()
-                        # High risk alert
-                        if risk_label == "High":
-                            create_alert(
-                                "high_risk",
-                                f"High risk detected in {cl.barn.name if cl.barn else 'Barn'} after approved checklist",
-                                "high",
-                                barn_id=cl.barn_id,
-                                user_id=cl.user_id,
-                            )
-                        st.success("✅ Checklist approved! Worker has been notified.")
+                        # Barn risk is recomputed by the background scheduler
+                        request_risk_recompute([cl.barn_id], db)
+                        st.success("✅ Checklist approved! Worker has been notified. Barn risk will update shortly.")
                         st.rerun()
             else:
                 st.info("No pending checklists.")
@@ -123,13 +112,16 @@ def render_manager_approvals():
                             inc.approved_by = user_id
                             inc.approved_at = datetime.utcnow()
                             db.commit()
+                            mark_user_write(user_id)
+                            if inc.barn:
+                                bump_data_version(inc.barn.farm_id, db)
                             
                             # Notify the worker
                             try:
                                 approver_name = st.session_state.user.name
                                 notify_worker_on_incident_approval(inc, approver_name)
                             except Exception as e:
-                                print(f"Warning: Failed to send approval notification: {e}")
+                                logger.warning("Failed to send approval notification: %s", e)
                             
                             # Create alert for high severity incidents after approval
                             if inc.severity == "high":
@@ -3,8 +3,8 @@ import plotly.graph_objects as go
 import plotly.express as px
 import pandas as pd
 from datetime import datetime, timedelta
-from database import get_db, get_accessible_farm_ids
-from models import Barn, Checklist, Incident, Alert, Farm
+from database import get_read_db, get_accessible_farm_ids
+from models import Barn, Checklist, Incident, Alert, Farm, User
 from utils import get_dashboard_metrics, display_alerts_sidebar, get_risk_color
 from components.visualization import render_3d_farm
 from translations import get_text
@@ -18,7 +18,9 @@ from components.role_dashboards import (
     render_visitor_dashboard,
     render_default_dashboard
 )
+from instrumentation import instrument_render
 
+@instrument_render
 def render_dashboard():
     """Render main dashboard - routes to role-specific dashboards"""
     st.title(get_text("dashboard"))
@@ -41,66 +43,84 @@ def render_dashboard():
     else:
         render_default_dashboard()
 
+def get_recent_activities(user_id, user_role, db, checklist_limit=5, incident_limit=3):
+    """Recent approved checklists and incidents in the user's farms, as plain dicts"""
+    farm_ids = get_accessible_farm_ids(user_id, user_role, db)
+    barn_ids = [barn_id for barn_id, in db.query(Barn.id).filter(Barn.farm_id.in_(farm_ids)).all()] if farm_ids else []
+    activities = {"farm_ids": farm_ids, "barn_ids": barn_ids, "checklists": [], "incidents": []}
+    if not barn_ids:
+        return activities
+    
+    # Names are joined in rather than loaded per row through the relationships
+    recent_checklists = db.query(
+        Checklist.id, Checklist.submitted_at, Barn.name, User.name
+    ).outerjoin(Barn, Checklist.barn_id == Barn.id).outerjoin(User, Checklist.user_id == User.id).filter(
+        Checklist.barn_id.in_(barn_ids),
+        Checklist.approved == True
+    ).order_by(
+        Checklist.submitted_at.desc()
+    ).limit(checklist_limit).all()
+    
+    recent_incidents = db.query(
+        Incident.id, Incident.reported_at, Incident.severity, Incident.incident_type, Barn.name
+    ).outerjoin(Barn, Incident.barn_id == Barn.id).filter(
+        Incident.barn_id.in_(barn_ids),
+        Incident.approved == True
+    ).order_by(
+        Incident.reported_at.desc()
+    ).limit(incident_limit).all()
+    
+    activities["checklists"] = [{
+        "id": checklist_id,
+        "barn_name": barn_name or "Unknown",
+        "user_name": user_name or "Unknown",
+        "submitted_at": submitted_at
+    } for checklist_id, submitted_at, barn_name, user_name in recent_checklists]
+    activities["incidents"] = [{
+        "id": incident_id,
+        "barn_name": barn_name or "Unknown",
+        "severity": severity,
+        "incident_type": incident_type,
+        "reported_at": reported_at
+    } for incident_id, reported_at, severity, incident_type, barn_name in recent_incidents]
+    return activities
+
+@instrument_render
 def render_recent_activities():
     """Render recent activities panel filtered by assigned farms"""
-    db = get_db()
+    db = get_read_db(st.session_state.get('user').id)
     try:
-        # Get user's accessible farms
         user_id = st.session_state.get('user').id
         user_role = st.session_state.get('role')
-        accessible_farm_ids = get_accessible_farm_ids(user_id, user_role, db)
-        
-        if not accessible_farm_ids:
-            st.info("No farms assigned. Please contact admin.")
-            return
-        
-        # Get barn IDs from accessible farms
-        barns_in_farms = db.query(Barn).filter(Barn.farm_id.in_(accessible_farm_ids)).all()
-        barn_ids = [b.id for b in barns_in_farms]
-        
-        if not barn_ids:
-            st.info("No barns available in assigned farms.")
-            return
-        
-# Get recent checklists filtered by accessible barns (approved only)
-        recent_checklists = db.query(Checklist).filter(
-            Checklist.barn_id.in_(barn_ids),
-            Checklist.approved == True
-        ).order_by(
-            Checklist.submitted_at.desc()
-        ).limit(5).all()
-        
-        # Get recent incidents filtered by accessible barns (approved only)
-        recent_incidents = db.query(Incident).filter(
-            Incident.barn_id.in_(barn_ids),
-            Incident.approved == True
-        ).order_by(
-            Incident.reported_at.desc()
-        ).limit(3).all()
-        
-        st.write("**Recent Checklists:**")
-        for checklist in recent_checklists:
-            barn_name = checklist.barn.name if checklist.barn else "Unknown"
-            user_name = checklist.user.name if checklist.user else "Unknown"
-            
-            st.write(f"• {barn_name} - {user_name}")
-            st.write(f"  *{checklist.submitted_at.strftime('%Y-%m-%d %H:%M')}*")
-        
-        st.write("**Recent Incidents:**")
-        for incident in recent_incidents:
-            barn_name = incident.barn.name if incident.barn else "Unknown"
-            severity_icon = {"high": "🔴", "medium": "🟡", "low": "🟢"}.get(incident.severity, "⚪")
-            
-            st.write(f"• {severity_icon} {barn_name}")
-            st.write(f"  {incident.incident_type.replace('_', ' ').title()}")
-            st.write(f"  *{incident.reported_at.strftime('%Y-%m-%d %H:%M')}*")
-    
+        activities = get_recent_activities(user_id, user_role, db)
     finally:
         db.close()
+    
+    if not activities["farm_ids"]:
+        st.info("No farms assigned. Please contact admin.")
+        return
+    
+    if not activities["barn_ids"]:
+        st.info("No barns available in assigned farms.")
+        return
+    
+    st.write("**Recent Checklists:**")
+    for checklist in activities["checklists"]:
+        st.write(f"• {checklist['barn_name']} - {checklist['user_name']}")
+        st.write(f"  *{checklist['submitted_at'].strftime('%Y-%m-%d %H:%M')}*")
+    
+    st.write("**Recent Incidents:**")
+    for incident in activities["incidents"]:
+        severity_icon = {"high": "🔴", "medium": "🟡", "low": "🟢"}.get(incident["severity"], "⚪")
+        
+        st.write(f"• {severity_icon} {incident['barn_name']}")
+        st.write(f"  {incident['incident_type'].replace('_', ' ').title()}")
+        st.write(f"  *{incident['reported_at'].strftime('%Y-%m-%d %H:%M')}*")
 
+@instrument_render
 def render_risk_distribution_chart():
     """Render risk distribution pie chart filtered by assigned farms"""
-    db = get_db()
+    db = get_read_db(st.session_state.get('user').id)
     try:
         # Get user's accessible farms
         user_id = st.session_state.get('user').id
@@ -134,9 +154,10 @@ def render_risk_distribution_chart():
     finally:
         db.close()
 
+@instrument_render
 def render_checklist_trends():
     """Render checklist submission trends filtered by assigned farms"""
-    db = get_db()
+    db = get_read_db(st.session_state.get('user').id)
     try:
         # Get user's accessible farms
         user_id = st.session_state.get('user').id
@@ -1,8 +1,10 @@
 import streamlit as st
-from database import get_db
+from database import get_db, mark_user_write
 from models import Alert
 from datetime import datetime
+from instrumentation import instrument_render
 
+@instrument_render
 def render_notifications():
     """Render notification center in sidebar"""
     if not st.session_state.get('authenticated', False):
@@ -95,6 +97,7 @@ def render_notifications():
                         Alert.read == False
                     ).update({"read": True})
                     db.commit()
+                    mark_user_write(user_id)
                     st.rerun()
         else:
             st.sidebar.info("No notifications yet")
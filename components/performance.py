@@ -0,0 +1,25 @@
+import streamlit as st
+import pandas as pd
+
+def render_performance_panel(timings):
+    """Render wall, SQL and inference time of this page's components in the sidebar"""
+    finished = [timing for timing in timings if timing.wall_seconds is not None]
+    if not finished:
+        return
+
+    top_level = [timing for timing in finished if timing.depth == 0]
+
+    with st.sidebar.expander("⏱️ Page Performance"):
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Render", f"{sum(t.wall_seconds for t in top_level) * 1000:.0f} ms")
+        col2.metric("SQL", f"{sum(t.sql_statements for t in top_level)}")
+        col3.metric("SQL time", f"{sum(t.sql_seconds for t in top_level) * 1000:.0f} ms")
+
+        # Nested components are indented under their parent; times include children
+        st.dataframe(pd.DataFrame([{
+            "Component": "· " * timing.depth + timing.name,
+            "Wall (ms)": round(timing.wall_seconds * 1000, 1),
+            "SQL": timing.sql_statements,
+            "SQL (ms)": round(timing.sql_seconds * 1000, 1),
+            "Inference (ms)": round(timing.inference_seconds * 1000, 1)
+        } for timing in finished]), use_container_width=True, hide_index=True)
@@ -1,13 +1,16 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime, timedelta
-from database import get_db, get_accessible_farm_ids
+from database import get_db, get_read_db, get_accessible_farm_ids
 from models import Barn, Checklist, Incident, Alert, Farm, User
 from utils import get_dashboard_metrics, display_alerts_sidebar, get_risk_color
-from components.visualization import render_3d_farm
+from components.visualization import render_3d_farm, render_spread_simulation, render_risk_heatmap
+from components.what_if import render_scenario_planner
 from translations import get_text
-from ai_engine import risk_predictor
+from risk_scheduler import request_risk_recompute, get_pending_count, get_latest_run
+from instrumentation import instrument_render
 
+@instrument_render
 def render_admin_dashboard():
     """Admin dashboard - Full system overview"""
     display_alerts_sidebar()
@@ -102,13 +105,10 @@ def render_admin_dashboard():
         
         with col3:
             if st.button("🔄 Update AI Predictions", use_container_width=True, key="admin_ai"):
-                with st.spinner(get_text("updating_predictions")):
-                    success = risk_predictor.update_barn_risks()
-                    if success:
-                        st.success(get_text("predictions_updated"))
-                        st.rerun()
-                    else:
-                        st.error(get_text("predictions_error"))
+                barn_ids = [barn_id for barn_id, in db.query(Barn.id).all()]
+                request_risk_recompute(barn_ids, db)
+                st.success(get_text("predictions_queued"))
+            render_risk_refresh_status(db)
         
         # Handle admin quick actions
         if st.session_state.get('admin_quick_action'):
@@ -145,6 +145,32 @@ def render_admin_dashboard():
     finally:
         db.close()
 
+def get_manager_dashboard_data(user_id, user_role, db):
+    """Barns and approval queue sizes of the manager's farms"""
+    farm_ids = get_accessible_farm_ids(user_id, user_role, db)
+    data = {"farm_ids": farm_ids, "barns": [], "barn_ids": [], "high_risk_barns": 0,
+            "pending_checklists": 0, "pending_incidents": 0}
+    if not farm_ids:
+        return data
+    
+    barns = db.query(Barn).filter(Barn.farm_id.in_(farm_ids)).all()
+    barn_ids = [b.id for b in barns]
+    data.update(
+        barns=barns,
+        barn_ids=barn_ids,
+        high_risk_barns=len([b for b in barns if b.risk_level == "high"]),
+        pending_checklists=db.query(Checklist).filter(
+            Checklist.barn_id.in_(barn_ids),
+            Checklist.approved == False
+        ).count(),
+        pending_incidents=db.query(Incident).filter(
+            Incident.barn_id.in_(barn_ids),
+            Incident.approved == False
+        ).count()
+    )
+    return data
+
+@instrument_render
 def render_manager_dashboard():
     """Manager dashboard - Farm and approval management"""
     display_alerts_sidebar()
@@ -155,15 +181,19 @@ def render_manager_dashboard():
     try:
         user_id = st.session_state.get('user').id
         user_role = st.session_state.get('role')
-        accessible_farm_ids = get_accessible_farm_ids(user_id, user_role, db)
+        read_db = get_read_db(user_id)
+        try:
+            data = get_manager_dashboard_data(user_id, user_role, read_db)
+        finally:
+            read_db.close()
+        accessible_farm_ids = data["farm_ids"]
         
         if not accessible_farm_ids:
             st.warning("No farms assigned to you. Please contact admin.")
             return
         
-        # Get metrics for assigned farms
-        barns = db.query(Barn).filter(Barn.farm_id.in_(accessible_farm_ids)).all()
-        barn_ids = [b.id for b in barns]
+        barns = data["barns"]
+        barn_ids = data["barn_ids"]
         
         col1, col2, col3, col4 = st.columns(4)
         
@@ -171,29 +201,20 @@ def render_manager_dashboard():
             st.metric("Assigned Barns", len(barns))
         
         with col2:
-            high_risk = len([b for b in barns if b.risk_level == "high"])
-            st.metric("High Risk Barns", high_risk)
+            st.metric("High Risk Barns", data["high_risk_barns"])
         
         with col3:
-            pending_checklists = db.query(Checklist).filter(
-                Checklist.barn_id.in_(barn_ids),
-                Checklist.approved == False
-            ).count()
-            st.metric("Pending Checklists", pending_checklists)
+            st.metric("Pending Checklists", data["pending_checklists"])
         
         with col4:
-            pending_incidents = db.query(Incident).filter(
-                Incident.barn_id.in_(barn_ids),
-                Incident.approved == False
-            ).count()
-            st.metric("Pending Incidents", pending_incidents)
+            st.metric("Pending Incidents", data["pending_incidents"])
         
         # Main content
         col1, col2 = st.columns([2, 1])
         
         with col1:
             st.subheader("Farm Visualization")
-            render_3d_farm()
+            render_3d_farm(accessible_farm_ids)
         
         with col2:
             st.subheader(get_text("recent_activities"))
@@ -210,6 +231,14 @@ def render_manager_dashboard():
             st.subheader(get_text("checklist_trends"))
             render_checklist_trends()
         
+        # Stored model confidence per barn
+        with st.expander("📈 Barn Risk Details"):
+            render_barn_risk_table(barns)
+        
+        # What-if scenarios on barn risk
+        with st.expander("🔮 What-if Scenarios"):
+            render_scenario_planner(accessible_farm_ids)
+        
         # Manager Quick Actions
         st.divider()
         st.subheader("📌 Manager Quick Actions")
@@ -227,13 +256,9 @@ def render_manager_dashboard():
         
         with col3:
             if st.button("🔄 Update Risk Predictions", use_container_width=True, key="mgr_ai"):
-                with st.spinner("Updating predictions..."):
-                    success = risk_predictor.update_barn_risks()
-                    if success:
-                        st.success("Predictions updated successfully")
-                        st.rerun()
-                    else:
-                        st.error("Error updating predictions")
+                request_risk_recompute(barn_ids, db)
+                st.success(get_text("predictions_queued"))
+            render_risk_refresh_status(db)
         
         # Handle manager quick actions
         if st.session_state.get('manager_quick_action'):
@@ -248,13 +273,14 @@ def render_manager_dashboard():
     finally:
         db.close()
 
+@instrument_render
 def render_worker_dashboard():
     """Worker dashboard - Task-focused view"""
     display_alerts_sidebar()
     
     st.markdown("### 👷 Worker Dashboard - My Tasks & Submissions")
     
-    db = get_db()
+    db = get_read_db(st.session_state.get('user').id)
     try:
         user_id = st.session_state.get('user').id
         user_role = st.session_state.get('role')
@@ -342,13 +368,14 @@ def render_worker_dashboard():
     finally:
         db.close()
 
+@instrument_render
 def render_vet_dashboard():
     """Vet dashboard - Health and disease monitoring"""
     display_alerts_sidebar()
     
     st.markdown("### 🩺 Veterinarian Dashboard - Health Monitoring")
     
-    db = get_db()
+    db = get_read_db(st.session_state.get('user').id)
     try:
         user_id = st.session_state.get('user').id
         user_role = st.session_state.get('role')
@@ -394,7 +421,7 @@ def render_vet_dashboard():
         
         with col1:
             st.subheader("Farm Overview")
-            render_3d_farm()
+            render_3d_farm(accessible_farm_ids)
         
         with col2:
             st.subheader("Recent Activities")
@@ -423,10 +450,26 @@ def render_vet_dashboard():
             st.dataframe(df, use_container_width=True)
         else:
             st.info("No disease or high-severity incidents reported.")
+        
+        # Model confidence and main risk drivers per barn
+        st.divider()
+        st.subheader("🧬 Barn Risk Confidence")
+        render_barn_risk_table(barns)
+        
+        # Risk interpolated between barns, to spot hot areas of a farm
+        st.divider()
+        st.subheader("🌡️ Risk Heatmap")
+        render_risk_heatmap(accessible_farm_ids)
+        
+        # Projected spread between neighbouring barns
+        st.divider()
+        st.subheader("🦠 Disease Spread Simulation")
+        render_spread_simulation(accessible_farm_ids)
     
     finally:
         db.close()
 
+@instrument_render
 def render_auditor_dashboard():
     """Auditor dashboard - System-wide audit view"""
     display_alerts_sidebar()
@@ -479,6 +522,7 @@ def render_auditor_dashboard():
     
     st.info("✓ As an Auditor, you have read-only access to all farms and data for audit purposes.")
 
+@instrument_render
 def render_visitor_dashboard():
     """Visitor dashboard - Limited access view"""
     st.markdown("### 👤 Welcome, Visitor")
@@ -493,10 +537,61 @@ def render_visitor_dashboard():
     finally:
         db.close()
 
+@instrument_render
 def render_default_dashboard():
     """Default dashboard for unknown roles"""
     st.warning("Your role could not be determined. Please contact administrator.")
 
+@instrument_render
+def render_risk_refresh_status(db):
+    """Render the background risk recompute progress"""
+    pending = get_pending_count(db)
+    run = get_latest_run(db)
+    
+    if run and run.status == "running":
+        st.caption(f"⏳ Updating risk: {run.barns_done}/{run.barns_total} barns")
+    elif pending:
+        st.caption(f"⏳ {pending} barns queued for a risk update")
+    elif run and run.status == "failed":
+        st.caption(f"⚠️ Last risk update failed: {run.error}")
+    elif run and run.finished_at:
+        st.caption(f"✅ Risk updated {run.finished_at.strftime('%Y-%m-%d %H:%M')} ({run.barns_changed} changed)")
+
+@instrument_render
+def render_barn_risk_table(barns):
+    """Render barn risk probabilities and top drivers from the stored risk snapshots"""
+    rows = []
+    for barn in barns:
+        snapshot = barn.risk_snapshot
+        if not snapshot:
+            continue
+        probabilities = snapshot.get("probabilities", {})
+        contributions = snapshot.get("contributions", {})
+        top_driver = max(contributions, key=contributions.get) if contributions else None
+        rows.append({
+            "Barn": barn.name,
+            "Risk": (barn.risk_level or "low").upper(),
+            "P(High)": probabilities.get("high", 0.0),
+            "P(Medium)": probabilities.get("medium", 0.0),
+            "Top Driver": (
+                top_driver.replace('_', ' ').title()
+                if top_driver and contributions[top_driver] > 0 else "—"
+            ),
+            "Checklist": snapshot.get("checklist_id"),
+            "Model": snapshot.get("model_version")
+        })
+    
+    if not rows:
+        st.info("No risk assessments yet. Approve a checklist or update risk predictions.")
+        return
+    
+    df = pd.DataFrame(rows).sort_values("P(High)", ascending=False)
+    st.dataframe(
+        df.style.format({"P(High)": "{:.0%}", "P(Medium)": "{:.0%}"}),
+        use_container_width=True,
+        hide_index=True
+    )
+
 # Import these functions from the main dashboard module
 def render_recent_activities():
     """Import from dashboard.py"""
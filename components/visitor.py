@@ -4,7 +4,9 @@ from database import get_db
 from models import Visitor, Farm
 from utils import generate_qr_code
 from translations import get_text
+from instrumentation import instrument_render
 
+@instrument_render
 def render_visitor_interface():
     """Render visitor check-in interface"""
     st.title(get_text("visitor_check_in"))
@@ -28,6 +30,7 @@ def render_visitor_interface():
     with tabs[3]:
         render_visitor_log()
 
+@instrument_render
 def render_check_in_form():
     """Render visitor check-in form"""
     st.subheader(get_text("visitor_registration"))
@@ -151,6 +154,7 @@ def render_check_in_form():
     finally:
         db.close()
 
+@instrument_render
 def render_sop_guidelines():
     """Render Standard Operating Procedures"""
     st.subheader(get_text("sop_guidelines"))
@@ -219,6 +223,7 @@ def render_sop_guidelines():
     *By proceeding with your visit, you acknowledge that you have read, understood, and agree to comply with all Standard Operating Procedures.*
     """)
 
+@instrument_render
 def render_visitor_log():
     """Render visitor log (accessible to visitors and authorized personnel)"""
     if st.session_state.role not in ["admin", "manager", "vet", "visitor"]:
@@ -264,6 +269,7 @@ def render_visitor_log():
     finally:
         db.close()
 
+@instrument_render
 def render_visitor_checkout():
     """Render visitor checkout interface"""
     st.subheader("My Visit Status & Checkout")
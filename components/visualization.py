@@ -2,222 +2,435 @@ import streamlit as st
 import plotly.graph_objects as go
 import pandas as pd
 import numpy as np
-from database import get_db
-from models import Barn
+import plotly.express as px
+from database import get_db, get_accessible_farm_ids, get_data_versions
+from models import Farm
 from utils import get_risk_color
+from spatial_index import Viewport, get_scope_version, get_scope_bounds, query_barns
+from heatmap import RiskHeatmapEngine, load_barn_risk_points
+from simulation import run_risk_simulation
+from instrumentation import instrument_render
 
-def render_3d_farm():
-    """Render 3D farm visualization"""
-    db = get_db()
-    try:
-        barns = db.query(Barn).all()
-        
-        if not barns:
-            st.warning("No barns available for visualization")
-            return
-        
-        # Create 3D scatter plot
-        fig = go.Figure()
-        
-        for barn in barns:
-            risk_color = get_risk_color(barn.risk_level or "low")
-            
-            fig.add_trace(go.Scatter3d(
-                x=[barn.position_x],
-                y=[barn.position_y], 
-                z=[barn.position_z],
-                mode='markers+text',
-                marker=dict(
-                    size=20,
-                    color=risk_color,
-                    opacity=0.8,
-                    line=dict(width=2, color='black')
-                ),
-                text=[barn.name],
-                textposition="top center",
-                name=f"{barn.name} ({barn.risk_level.title() if barn.risk_level else 'Unknown'})",
-                hovertemplate=f"""
-                <b>{barn.name}</b><br>
-                Risk Level: {barn.risk_level.title() if barn.risk_level else 'Unknown'}<br>
-                Capacity: {barn.capacity}<br>
-                Position: ({barn.position_x}, {barn.position_y}, {barn.position_z})<br>
-                <extra></extra>
-                """
-            ))
-        
-        # Add ground plane
-        ground_size = 100
-        xx, yy = np.meshgrid(
-            np.linspace(-10, ground_size, 10),
-            np.linspace(-10, ground_size, 10)
+RISK_NUMERIC = {"low": 1, "medium": 2, "high": 3}
+
+# Discrete low/medium/high colors for a numeric 1-3 risk array
+RISK_COLORSCALE = [
+    [0.0, get_risk_color("low")], [0.333, get_risk_color("low")],
+    [0.333, get_risk_color("medium")], [0.666, get_risk_color("medium")],
+    [0.666, get_risk_color("high")], [1.0, get_risk_color("high")]
+]
+
+# Barn name labels are drawn only for small farms; larger ones rely on hover
+MAX_3D_LABELS = 50
+
+# Days simulated when the 3D view is colored by projected spread risk
+SPREAD_HORIZON_DAYS = 30
+
+def build_3d_farm_figure(barns, spread=None):
+    """Build the 3D farm figure as one marker trace colored by a risk array"""
+    names = [barn.name for barn in barns]
+    risk_levels = [barn.risk_level or "low" for barn in barns]
+    x = np.array([barn.x for barn in barns], dtype=float)
+    y = np.array([barn.y for barn in barns], dtype=float)
+    z = np.array([barn.z for barn in barns], dtype=float)
+    
+    if spread is None:
+        marker_color = dict(
+            color=[RISK_NUMERIC.get(level, 1) for level in risk_levels],
+            colorscale=RISK_COLORSCALE,
+            cmin=1,
+            cmax=3
         )
-        zz = np.zeros_like(xx) - 5
-        
-        fig.add_trace(go.Surface(
-            x=xx, y=yy, z=zz,
-            colorscale='Greens',
-            opacity=0.3,
-            showscale=False,
-            name="Ground"
-        ))
-        
-        # Layout configuration
-        fig.update_layout(
-            title="FarmTwin 360 - Digital Farm Visualization",
-            scene=dict(
-                xaxis_title="X Position (meters)",
-                yaxis_title="Y Position (meters)",
-                zaxis_title="Z Position (meters)",
-                camera=dict(
-                    eye=dict(x=1.5, y=1.5, z=1.5)
-                ),
-                aspectmode='cube'
-            ),
-            height=600,
-            margin=dict(l=0, r=0, t=50, b=0)
+        spread_hover = ""
+    else:
+        marker_color = dict(
+            color=[spread.get(barn.id, 0.0) for barn in barns],
+            colorscale='RdYlGn_r',
+            cmin=0,
+            cmax=1,
+            colorbar=dict(title="Spread Risk", tickformat=".0%")
         )
-        
-        st.plotly_chart(fig, use_container_width=True)
-        
-        # Legend
-        st.markdown("""
-        **Legend:**
-        - 🟢 **Green**: Low Risk
-        - 🟡 **Yellow**: Medium Risk  
-        - 🔴 **Red**: High Risk
-        """)
-        
-        # Farm statistics
-        col1, col2, col3 = st.columns(3)
-        
-        risk_counts = {"high": 0, "medium": 0, "low": 0}
-        total_capacity = 0
-        
-        for barn in barns:
-            risk_level = barn.risk_level or "low"
-            risk_counts[risk_level] += 1
-            total_capacity += barn.capacity or 0
-        
-        with col1:
-            st.metric("Total Barns", len(barns))
-        
-        with col2:
-            st.metric("Total Capacity", total_capacity)
-        
-        with col3:
-            high_risk_pct = (risk_counts["high"] / len(barns) * 100) if barns else 0
-            st.metric("High Risk %", f"{high_risk_pct:.1f}%")
+        spread_hover = "Projected Spread Risk: %{marker.color:.0%}<br>"
+    
+    fig = go.Figure()
+    
+    fig.add_trace(go.Scatter3d(
+        x=x,
+        y=y,
+        z=z,
+        mode='markers+text' if len(barns) <= MAX_3D_LABELS else 'markers',
+        marker=dict(
+            size=20 if len(barns) <= MAX_3D_LABELS else 8,
+            opacity=0.8,
+            line=dict(width=2, color='black'),
+            **marker_color
+        ),
+        text=names,
+        textposition="top center",
+        customdata=np.column_stack([
+            [level.title() for level in risk_levels],
+            [barn.capacity for barn in barns]
+        ]),
+        hovertemplate=(
+            "<b>%{text}</b><br>"
+            "Risk Level: %{customdata[0]}<br>"
+            "Capacity: %{customdata[1]}<br>"
+            + spread_hover +
+            "Position: (%{x}, %{y}, %{z})<br>"
+            "<extra></extra>"
+        ),
+        showlegend=False,
+        name="Barns"
+    ))
+    
+    # Add ground plane
+    ground_size = 100
+    xx, yy = np.meshgrid(
+        np.linspace(-10, ground_size, 10),
+        np.linspace(-10, ground_size, 10)
+    )
+    zz = np.zeros_like(xx) - 5
     
+    fig.add_trace(go.Surface(
+        x=xx, y=yy, z=zz,
+        colorscale='Greens',
+        opacity=0.3,
+        showscale=False,
+        name="Ground",
+        hoverinfo="skip"
+    ))
+    
+    # Layout configuration
+    fig.update_layout(
+        title="FarmTwin 360 - Digital Farm Visualization",
+        scene=dict(
+            xaxis_title="X Position (meters)",
+            yaxis_title="Y Position (meters)",
+            zaxis_title="Z Position (meters)",
+            camera=dict(
+                eye=dict(x=1.5, y=1.5, z=1.5)
+            ),
+            aspectmode='cube'
+        ),
+        height=600,
+        margin=dict(l=0, r=0, t=50, b=0)
+    )
+    
+    return fig
+
+def get_map_farm_ids(farm_ids=None):
+    """Farms a map should show: the given ids, or the current user's accessible farms"""
+    if farm_ids is not None:
+        return list(farm_ids)
+    
+    db = get_db()
+    try:
+        user_id = st.session_state.get('user').id
+        user_role = st.session_state.get('role')
+        return get_accessible_farm_ids(user_id, user_role, db)
     finally:
         db.close()
 
-def render_2d_farm_map():
-    """Render 2D farm map view"""
+@instrument_render
+def render_viewport_controls(scope_version, key):
+    """Render X/Y extent sliders for a map; returns None for the full extent"""
+    bounds = get_scope_bounds(scope_version)
+    if bounds is None:
+        return None
+    
+    # Pad degenerate axes so the sliders always have a range
+    x_min, x_max = float(bounds.x_min), float(bounds.x_max)
+    y_min, y_max = float(bounds.y_min), float(bounds.y_max)
+    if x_min == x_max:
+        x_min, x_max = x_min - 1, x_max + 1
+    if y_min == y_max:
+        y_min, y_max = y_min - 1, y_max + 1
+    
+    with st.expander("🔍 Map Extent"):
+        x_range = st.slider("X range (meters)", x_min, x_max, (x_min, x_max), key=f"{key}_x_range")
+        y_range = st.slider("Y range (meters)", y_min, y_max, (y_min, y_max), key=f"{key}_y_range")
+    
+    if x_range == (x_min, x_max) and y_range == (y_min, y_max):
+        return None
+    return (x_range[0], x_range[1], y_range[0], y_range[1])
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def load_risk_simulation(scope_version, data_version, steps):
+    """Risk spread simulation for the barns in scope, cached per barn set, data version and horizon"""
+    return run_risk_simulation(query_barns(scope_version), steps)
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def load_3d_farm(scope_version, viewport=None, data_version=None):
+    """Build the 3D figure and barn statistics; cached until a barn in scope changes
+
+    When data_version is given, barns are colored by projected spread risk.
+    """
+    barns = query_barns(scope_version, Viewport(*viewport) if viewport else None)
+    
+    spread = None
+    if data_version is not None:
+        simulation = load_risk_simulation(scope_version, data_version, SPREAD_HORIZON_DAYS)
+        spread = dict(zip(simulation["barn_ids"], simulation["history"][-1].tolist()))
+    
+    risk_counts = {"high": 0, "medium": 0, "low": 0}
+    total_capacity = 0
+    
+    for barn in barns:
+        risk_counts[barn.risk_level] = risk_counts.get(barn.risk_level, 0) + 1
+        total_capacity += barn.capacity or 0
+    
+    stats = {
+        "total_barns": len(barns),
+        "total_capacity": total_capacity,
+        "risk_counts": risk_counts
+    }
+    
+    return (build_3d_farm_figure(barns, spread) if barns else None), stats
+
+@instrument_render
+def render_3d_farm(farm_ids=None):
+    """Render 3D farm visualization for the user's farms"""
+    farm_ids = get_map_farm_ids(farm_ids)
+    scope_version = get_scope_version(farm_ids)
+    viewport = render_viewport_controls(scope_version, key="farm_3d")
+    
+    color_by = st.radio(
+        "Color barns by",
+        ["Current risk", f"Projected spread ({SPREAD_HORIZON_DAYS} days)"],
+        horizontal=True,
+        key="farm_3d_color_by"
+    )
+    
+    data_version = None
+    if color_by != "Current risk":
+        db = get_db()
+        try:
+            data_version = get_data_versions(farm_ids, db)
+        finally:
+            db.close()
+    
+    fig, stats = load_3d_farm(scope_version, viewport, data_version)
+    
+    if fig is None:
+        st.warning("No barns available for visualization")
+        return
+    
+    st.plotly_chart(fig, use_container_width=True)
+    
+    # Legend
+    st.markdown("""
+    **Legend:**
+    - 🟢 **Green**: Low Risk
+    - 🟡 **Yellow**: Medium Risk  
+    - 🔴 **Red**: High Risk
+    """)
+    
+    # Farm statistics
+    col1, col2, col3 = st.columns(3)
+    
+    total_barns = stats["total_barns"]
+    
+    with col1:
+        st.metric("Total Barns", total_barns)
+    
+    with col2:
+        st.metric("Total Capacity", stats["total_capacity"])
+    
+    with col3:
+        high_risk_pct = (stats["risk_counts"]["high"] / total_barns * 100) if total_barns else 0
+        st.metric("High Risk %", f"{high_risk_pct:.1f}%")
+
+@instrument_render
+def render_spread_simulation(farm_ids=None):
+    """Render projected disease spread between barns for the vet dashboard"""
+    farm_ids = get_map_farm_ids(farm_ids)
+    scope_version = get_scope_version(farm_ids)
+    
+    if not scope_version:
+        st.info("No barns available for simulation.")
+        return
+    
+    horizon = st.slider("Simulation horizon (days)", 7, 180, SPREAD_HORIZON_DAYS, key="spread_horizon")
+    
     db = get_db()
     try:
-        barns = db.query(Barn).all()
-        
-        if not barns:
-            st.warning("No barns available for visualization")
-            return
-        
-        # Create 2D scatter plot
-        fig = go.Figure()
-        
-        for barn in barns:
-            risk_color = get_risk_color(barn.risk_level or "low")
-            
-            fig.add_trace(go.Scatter(
-                x=[barn.position_x],
-                y=[barn.position_y],
-                mode='markers+text',
-                marker=dict(
-                    size=30,
-                    color=risk_color,
-                    opacity=0.8,
-                    line=dict(width=2, color='black')
-                ),
-                text=[barn.name],
-                textposition="middle center",
-                name=f"{barn.name}",
-                hovertemplate=f"""
-                <b>{barn.name}</b><br>
-                Risk Level: {barn.risk_level.title() if barn.risk_level else 'Unknown'}<br>
-                Capacity: {barn.capacity}<br>
-                <extra></extra>
-                """
-            ))
-        
-        fig.update_layout(
-            title="Farm Layout - Top View",
-            xaxis_title="X Position (meters)",
-            yaxis_title="Y Position (meters)",
-            height=500,
-            showlegend=False
+        data_version = get_data_versions(farm_ids, db)
+    finally:
+        db.close()
+    
+    simulation = load_risk_simulation(scope_version, data_version, horizon)
+    history = simulation["history"]
+    
+    df = pd.DataFrame({
+        "Barn": simulation["names"],
+        "Current Risk": history[0],
+        "Projected Risk": history[-1]
+    })
+    df["Change"] = df["Projected Risk"] - df["Current Risk"]
+    df = df.sort_values("Projected Risk", ascending=False)
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        st.write(f"**Highest Projected Risk after {horizon} days**")
+        st.dataframe(
+            df.head(10).style.format({
+                "Current Risk": "{:.0%}",
+                "Projected Risk": "{:.0%}",
+                "Change": "{:+.0%}"
+            }),
+            use_container_width=True
         )
+    
+    with col2:
+        st.write("**Spread Over Time (Top 5 Barns)**")
         
+        top = df.head(5).index.to_numpy()
+        trend = pd.DataFrame(history[:, top], columns=df["Barn"].head(5).tolist())
+        trend["Day"] = np.arange(len(history))
+        trend = trend.melt(id_vars="Day", var_name="Barn", value_name="Infection Probability")
+        
+        fig = px.line(trend, x="Day", y="Infection Probability", color="Barn")
+        fig.update_layout(height=350, yaxis_tickformat=".0%", yaxis_range=[0, 1])
         st.plotly_chart(fig, use_container_width=True)
+
+@instrument_render
+def render_2d_farm_map(farm_ids=None):
+    """Render 2D farm map view"""
+    scope_version = get_scope_version(get_map_farm_ids(farm_ids))
+    viewport = render_viewport_controls(scope_version, key="farm_2d")
+    barns = query_barns(scope_version, Viewport(*viewport) if viewport else None)
     
-    finally:
-        db.close()
+    if not barns:
+        st.warning("No barns available for visualization")
+        return
+    
+    # Single trace for all barns, colored per point
+    fig = go.Figure(data=go.Scatter(
+        x=[barn.x for barn in barns],
+        y=[barn.y for barn in barns],
+        mode='markers+text',
+        marker=dict(
+            size=30,
+            color=[get_risk_color(barn.risk_level) for barn in barns],
+            opacity=0.8,
+            line=dict(width=2, color='black')
+        ),
+        text=[barn.name for barn in barns],
+        textposition="middle center",
+        customdata=[[barn.risk_level.title(), barn.capacity] for barn in barns],
+        hovertemplate=(
+            "<b>%{text}</b><br>"
+            "Risk Level: %{customdata[0]}<br>"
+            "Capacity: %{customdata[1]}<br>"
+            "<extra></extra>"
+        )
+    ))
+    
+    fig.update_layout(
+        title="Farm Layout - Top View",
+        xaxis_title="X Position (meters)",
+        yaxis_title="Y Position (meters)",
+        height=500,
+        showlegend=False
+    )
+    
+    st.plotly_chart(fig, use_container_width=True)
+
+@st.cache_resource(max_entries=256)
+def get_heatmap_engine(farm_id):
+    """Long-lived interpolation engine for one farm, updated incrementally"""
+    return RiskHeatmapEngine()
+
+def load_risk_surface(farm_id, data_version, barn_set_version):
+    """Interpolated risk grid for a farm; barn risk is reloaded only when a version moved"""
+    engine = get_heatmap_engine(farm_id)
+    version = (data_version, barn_set_version)
+    if engine.version != version:
+        engine.update(load_barn_risk_points(farm_id), version=version)
+    return engine.surface()
 
-def render_risk_heatmap():
-    """Render risk level heatmap"""
+@instrument_render
+def render_risk_heatmap(farm_ids=None):
+    """Render interpolated risk heatmap for one of the user's farms"""
+    scope_version = get_scope_version(get_map_farm_ids(farm_ids))
+    
+    if not scope_version:
+        st.warning("No barn data available")
+        return
+    
     db = get_db()
     try:
-        barns = db.query(Barn).all()
-        
-        if not barns:
-            st.warning("No barn data available")
-            return
-        
-        # Create heatmap data
-        positions = []
-        risk_levels = []
-        barn_names = []
-        
-        for barn in barns:
-            positions.append([barn.position_x, barn.position_y])
-            risk_numeric = {"high": 3, "medium": 2, "low": 1}.get(barn.risk_level, 1)
-            risk_levels.append(risk_numeric)
-            barn_names.append(barn.name)
-        
-        if positions:
-            fig = go.Figure(data=go.Scatter(
-                x=[pos[0] for pos in positions],
-                y=[pos[1] for pos in positions],
-                mode='markers',
-                marker=dict(
-                    size=40,
-                    color=risk_levels,
-                    colorscale='RdYlGn_r',  # Red-Yellow-Green reversed
-                    colorbar=dict(
-                        title="Risk Level",
-                        tickmode="array",
-                        tickvals=[1, 2, 3],
-                        ticktext=["Low", "Medium", "High"]
-                    ),
-                    cmin=1,
-                    cmax=3
-                ),
-                text=barn_names,
-                textposition="middle center",
-                hovertemplate="<b>%{text}</b><br>Risk: %{marker.color}<extra></extra>"
-            ))
-            
-            fig.update_layout(
-                title="Risk Level Heatmap",
-                xaxis_title="X Position",
-                yaxis_title="Y Position",
-                height=500
-            )
-            
-            st.plotly_chart(fig, use_container_width=True)
-    
+        scoped_farm_ids = [farm_id for farm_id, _ in scope_version]
+        farm_names = dict(db.query(Farm.id, Farm.name).filter(Farm.id.in_(scoped_farm_ids)).all())
+        data_versions = dict(get_data_versions(scoped_farm_ids, db))
     finally:
         db.close()
+    
+    # Barn coordinates are per farm, so the surface is drawn for one farm at a time
+    farm_id = scoped_farm_ids[0]
+    if len(scoped_farm_ids) > 1:
+        farm_id = st.selectbox(
+            "Farm",
+            scoped_farm_ids,
+            format_func=lambda fid: farm_names.get(fid, f"Farm {fid}"),
+            key="risk_heatmap_farm"
+        )
+    
+    farm_scope = tuple((fid, version) for fid, version in scope_version if fid == farm_id)
+    barn_set_version = farm_scope[0][1]
+    viewport = render_viewport_controls(farm_scope, key="risk_heatmap")
+    
+    surface = load_risk_surface(farm_id, data_versions.get(farm_id, 0), barn_set_version)
+    barns = query_barns(farm_scope, Viewport(*viewport) if viewport else None)
+    
+    fig = go.Figure()
+    
+    if surface is not None:
+        grid_x, grid_y, z = surface
+        fig.add_trace(go.Heatmap(
+            x=grid_x,
+            y=grid_y,
+            z=z,
+            colorscale='RdYlGn_r',  # Red-Yellow-Green reversed
+            zmin=1,
+            zmax=3,
+            zsmooth="best",
+            colorbar=dict(
+                title="Risk Level",
+                tickmode="array",
+                tickvals=[1, 2, 3],
+                ticktext=["Low", "Medium", "High"]
+            ),
+            hovertemplate="X: %{x:.0f}<br>Y: %{y:.0f}<br>Risk: %{z:.2f}<extra></extra>"
+        ))
+    
+    fig.add_trace(go.Scatter(
+        x=[barn.x for barn in barns],
+        y=[barn.y for barn in barns],
+        mode='markers+text',
+        marker=dict(size=10, color='black', symbol='square'),
+        text=[barn.name for barn in barns],
+        textposition="top center",
+        hovertemplate="<b>%{text}</b><extra></extra>",
+        showlegend=False
+    ))
+    
+    fig.update_layout(
+        title="Risk Level Heatmap",
+        xaxis_title="X Position",
+        yaxis_title="Y Position",
+        height=500
+    )
+    
+    if viewport:
+        fig.update_xaxes(range=[viewport[0], viewport[1]])
+        fig.update_yaxes(range=[viewport[2], viewport[3]])
+    
+    st.plotly_chart(fig, use_container_width=True)
 
-def render_facility_overview():
+@instrument_render
+def render_facility_overview(farm_ids=None):
     """Render facility overview with different building types"""
     st.subheader("Facility Overview")
     
@@ -229,20 +442,17 @@ def render_facility_overview():
         {"name": "Veterinary Clinic", "type": "medical", "x": 70, "y": 25, "status": "operational"},
     ]
     
-    # Add barn data
-    db = get_db()
-    try:
-        barns = db.query(Barn).all()
-        for barn in barns:
-            facilities.append({
-                "name": barn.name,
-                "type": "barn",
-                "x": barn.position_x,
-                "y": barn.position_y,
-                "status": barn.risk_level or "low"
-            })
-    finally:
-        db.close()
+    # Add barn data for the user's farms within the selected extent
+    scope_version = get_scope_version(get_map_farm_ids(farm_ids))
+    viewport = render_viewport_controls(scope_version, key="facility_overview")
+    for barn in query_barns(scope_version, Viewport(*viewport) if viewport else None):
+        facilities.append({
+            "name": barn.name,
+            "type": "barn",
+            "x": barn.x,
+            "y": barn.y,
+            "status": barn.risk_level
+        })
     
     # Create visualization
     fig = go.Figure()
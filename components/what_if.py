@@ -0,0 +1,126 @@
+import streamlit as st
+import pandas as pd
+import plotly.graph_objects as go
+from database import get_db, get_data_versions
+from models import Barn
+from scenarios import FEATURE_COLUMNS, DEFAULT_SAMPLES, get_scenario_result
+from instrumentation import instrument_render
+
+# Slider ranges for the feature shifts a manager can apply
+ADJUSTMENT_RANGES = {
+    "ventilation_score": (-5.0, 5.0, 1.0),
+    "hygiene_score": (-5.0, 5.0, 1.0),
+    "feed_quality": (-5.0, 5.0, 1.0),
+    "water_quality": (-5.0, 5.0, 1.0),
+    "mortality_count": (0.0, 10.0, 1.0),
+    "temperature": (-10.0, 10.0, 0.5),
+    "humidity": (-30.0, 30.0, 1.0),
+}
+
+@instrument_render
+def render_scenario_planner(farm_ids):
+    """Render the what-if scenario planner for barn risk"""
+    db = get_db()
+    try:
+        barns = db.query(Barn.id, Barn.name).filter(Barn.farm_id.in_(farm_ids)).order_by(Barn.name).all()
+        data_version = get_data_versions(farm_ids, db)
+    finally:
+        db.close()
+
+    if not barns:
+        st.info("No barns available for scenarios.")
+        return
+
+    barn_names = {barn.id: barn.name for barn in barns}
+
+    target_barn_ids = st.multiselect(
+        "Barns affected",
+        list(barn_names.keys()),
+        format_func=lambda barn_id: barn_names[barn_id],
+        key="what_if_barns"
+    )
+
+    st.write("**Change in conditions**")
+    adjustments = {}
+    cols = st.columns(4)
+    for i, feature in enumerate(FEATURE_COLUMNS):
+        low, high, step = ADJUSTMENT_RANGES[feature]
+        with cols[i % 4]:
+            adjustments[feature] = st.slider(
+                feature.replace("_", " ").title(),
+                low, high, 0.0, step,
+                key=f"what_if_{feature}"
+            )
+
+    samples = st.select_slider(
+        "Monte Carlo samples",
+        options=[100, 250, 500, 1000, 2500],
+        value=DEFAULT_SAMPLES,
+        key="what_if_samples"
+    )
+
+    if not st.button("▶️ Run Scenario", key="what_if_run"):
+        return
+
+    if not target_barn_ids or not any(adjustments.values()):
+        st.warning("Select at least one barn and one change to simulate.")
+        return
+
+    with st.spinner("Running scenario..."):
+        result = get_scenario_result(
+            list(barn_names.keys()), adjustments, target_barn_ids, data_version, samples
+        )
+
+    df = pd.DataFrame({
+        "Barn": [barn_names[barn_id] for barn_id in result["barn_ids"]],
+        "Affected": result["targets"],
+        "Baseline P(High)": result["baseline"]["mean"],
+        "Scenario P(High)": result["scenario"]["mean"],
+        "Scenario 5%": result["scenario"]["p05"],
+        "Scenario 95%": result["scenario"]["p95"],
+    })
+    df["Change"] = df["Scenario P(High)"] - df["Baseline P(High)"]
+    df = df.sort_values("Scenario P(High)", ascending=False)
+
+    fig = go.Figure()
+
+    fig.add_trace(go.Bar(
+        name="Baseline",
+        x=df["Barn"],
+        y=df["Baseline P(High)"],
+        marker_color="#44ff44"
+    ))
+
+    fig.add_trace(go.Bar(
+        name="Scenario",
+        x=df["Barn"],
+        y=df["Scenario P(High)"],
+        marker_color="#ff4444",
+        error_y=dict(
+            type="data",
+            symmetric=False,
+            array=df["Scenario 95%"] - df["Scenario P(High)"],
+            arrayminus=df["Scenario P(High)"] - df["Scenario 5%"]
+        )
+    ))
+
+    fig.update_layout(
+        title=f"Probability of High Risk ({result['samples']} samples, 90% band)",
+        barmode="group",
+        yaxis_tickformat=".0%",
+        yaxis_range=[0, 1],
+        height=400
+    )
+
+    st.plotly_chart(fig, use_container_width=True)
+
+    st.dataframe(
+        df.style.format({
+            "Baseline P(High)": "{:.0%}",
+            "Scenario P(High)": "{:.0%}",
+            "Scenario 5%": "{:.0%}",
+            "Scenario 95%": "{:.0%}",
+            "Change": "{:+.0%}"
+        }),
+        use_container_width=True
+    )
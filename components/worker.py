@@ -1,13 +1,20 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime
-from database import get_db, get_accessible_farm_ids
+from database import get_db, get_accessible_farm_ids, mark_user_write
 from models import Barn, Checklist, Incident, Farm
 from utils import save_uploaded_file, create_alert
 from translations import get_text
 from ai_engine import risk_predictor
+from drift import record_checklist
+from anomaly import score_checklist, update_baselines
 from components.notifications import notify_users_on_checklist, notify_users_on_incident
+from logging_setup import get_logger
+from instrumentation import instrument_render
 
+logger = get_logger(__name__)
+
+@instrument_render
 def render_worker_interface():
     """Render worker interface for data input"""
     st.title(get_text("worker_interface"))
@@ -27,6 +34,7 @@ def render_worker_interface():
     with tabs[2]:
         render_my_submissions()
 
+@instrument_render
 def render_checklist_form():
     """Render checklist submission form"""
     st.subheader(get_text("daily_checklist"))
@@ -170,15 +178,36 @@ def render_checklist_form():
                     photo_path=photo_path
                 )
                 
+                # Compare with the barn's rolling baseline so managers review outliers first
+                try:
+                    score_checklist(checklist, db)
+                except Exception as e:
+                    logger.warning("Failed to score checklist anomalies: %s", e)
+                
                 db.add(checklist)
                 db.commit()
+                mark_user_write(user_id)
                 db.refresh(checklist)
                 
                 # Send notifications to managers and admins
                 try:
                     notify_users_on_checklist(checklist, st.session_state.user.name)
                 except Exception as e:
-                    print(f"Warning: Failed to send notifications: {e}")
+                    logger.warning("Failed to send notifications: %s", e)
+                
+                # Fold the committed checklist into its barn's anomaly baseline
+                try:
+                    update_baselines(checklist, db)
+                except Exception as e:
+                    db.rollback()
+                    logger.warning("Failed to update anomaly baseline: %s", e)
+                
+                # Update the drift monitor's running feature statistics
+                try:
+                    record_checklist(checklist, db)
+                except Exception as e:
+                    db.rollback()
+                    logger.warning("Failed to update drift statistics: %s", e)
                 
                 # Mark as pending manager approval; risk update happens upon approval
                 st.success("✅ Checklist submitted successfully! ⏳ Pending manager review - You'll be notified when approved.")
@@ -187,6 +216,7 @@ def render_checklist_form():
     finally:
         db.close()
 
+@instrument_render
 def render_incident_form():
     """Render incident reporting form"""
     st.subheader(get_text("incident_report"))
@@ -280,13 +310,14 @@ def render_incident_form():
                     
                     db.add(incident)
                     db.commit()
+                    mark_user_write(user_id)
                     db.refresh(incident)
                     
                     # Send notifications to managers, admins, and vets (if high severity)
                     try:
                         notify_users_on_incident(incident, st.session_state.user.name)
                     except Exception as e:
-                        print(f"Warning: Failed to send notifications: {e}")
+                        logger.warning("Failed to send notifications: %s", e)
                     
                     # Manager approval required before alerts/dashboards
                     if severity == 'high' or incident_type == 'disease':
@@ -297,6 +328,7 @@ def render_incident_form():
     finally:
         db.close()
 
+@instrument_render
 def render_my_submissions():
     """Render user's submission history"""
     st.subheader(get_text("my_submissions"))
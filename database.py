@@ -1,47 +1,90 @@
 import os
+import threading
+import time
 import streamlit as st
-from sqlalchemy import create_engine, text
+from datetime import datetime
+from sqlalchemy import create_engine, inspect, text, func
 from sqlalchemy.orm import sessionmaker, Session
-from models import Base, User, Farm, Barn, Checklist, Incident, Visitor, Alert
+from sqlalchemy.dialects import postgresql, sqlite
+from models import Base, User, Farm, Barn, Checklist, Incident, Visitor, Alert, FarmDataVersion
+from changelog import backfill_changelog, seed_table_versions  # also registers the change tracking listeners
+from logging_setup import get_logger
+import instrumentation  # registers the SQL timing listeners
+from slow_queries import SLOW_QUERY_MS, install_slow_query_recorder
 import bcrypt
 
+logger = get_logger(__name__)
+
+# Optional read replica for analytics, dashboards, exports and list endpoints.
+# Unset, every read uses the primary. A user who has just written reads from
+# the primary for REPLICA_STICKY_SECONDS so they see their own changes
+# despite replication lag; this is tracked per process.
+DATABASE_REPLICA_URL = os.getenv("DATABASE_REPLICA_URL")
+REPLICA_STICKY_SECONDS = float(os.getenv("DATABASE_REPLICA_STICKY_SECONDS", "10"))
+
+_recent_writes = {}  # user_id -> time.monotonic() of their last write
+_recent_writes_lock = threading.Lock()
+
 
 # =========================
 # DATABASE ENGINE
 # =========================
 
-@st.cache_resource
-def get_engine():
-    database_url = os.getenv("DATABASE_URL")
-
-    if not database_url:
-        database_url = "sqlite:///farmtwin.db"
-
+def _create_engine(database_url):
     if database_url.startswith("sqlite"):
         connect_args = {"check_same_thread": False}
     else:
         connect_args = {
-            "sslmode": "require",
+            "sslmode": os.getenv("DATABASE_SSLMODE", "require"),  # "disable" for a local server
             "connect_timeout": 10,
         }
 
-    return create_engine(
+    engine = create_engine(
         database_url,
         pool_pre_ping=True,
         pool_recycle=300,
         connect_args=connect_args
     )
 
+    # Opt-in: FARMTWIN_SLOW_QUERY_MS sets the threshold
+    if SLOW_QUERY_MS > 0:
+        install_slow_query_recorder(engine, SLOW_QUERY_MS)
+
+    return engine
+
+
+@st.cache_resource
+def get_engine():
+    return _create_engine(os.getenv("DATABASE_URL") or "sqlite:///farmtwin.db")
+
+
+@st.cache_resource
+def get_read_engine():
+    """Engine of the read replica, or the primary when DATABASE_REPLICA_URL is unset"""
+    if not DATABASE_REPLICA_URL:
+        return get_engine()
+    return _create_engine(DATABASE_REPLICA_URL)
+
 
 def get_session_factory():
     engine = get_engine()
     return sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
+def get_read_session_factory():
+    return sessionmaker(autocommit=False, autoflush=False, bind=get_read_engine())
+
+
 def init_database():
     engine = get_engine()
     Base.metadata.create_all(bind=engine)
     migrate_schema()
+    db = get_db()
+    try:
+        backfill_changelog(db)
+        seed_table_versions(db)
+    finally:
+        db.close()
 
 
 def get_db() -> Session:
@@ -49,27 +92,90 @@ def get_db() -> Session:
     return SessionLocal()
 
 
+def dialect_insert(db):
+    """insert() of the session's dialect, which supports on_conflict_do_update/do_nothing"""
+    return postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+
+
+def mark_user_write(user_id):
+    """Route the user's reads to the primary for the next REPLICA_STICKY_SECONDS"""
+    if not DATABASE_REPLICA_URL or user_id is None:
+        return
+    now = time.monotonic()
+    with _recent_writes_lock:
+        _recent_writes[user_id] = now
+        # Drop expired entries now and then so the map stays small
+        if len(_recent_writes) > 1000:
+            for stale_id in [uid for uid, at in _recent_writes.items() if now - at > REPLICA_STICKY_SECONDS]:
+                del _recent_writes[stale_id]
+
+
+def get_read_db(user_id=None) -> Session:
+    """Session for read-only work: the replica, or the primary if user_id wrote recently"""
+    if not DATABASE_REPLICA_URL:
+        return get_db()
+    if user_id is not None:
+        with _recent_writes_lock:
+            last_write = _recent_writes.get(user_id)
+        if last_write is not None and time.monotonic() - last_write < REPLICA_STICKY_SECONDS:
+            return get_db()
+    SessionLocal = get_read_session_factory()
+    return SessionLocal()
+
+
 # =========================
 # SCHEMA MIGRATION
 # =========================
 
 def migrate_schema():
+    """Add model columns and indexes missing from databases created by older versions"""
     engine = get_engine()
-    with engine.connect() as conn:
-
-        def add_column(table, column_def):
-            try:
-                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column_def}"))
-            except:
-                pass
-
-        add_column("checklists", "approved BOOLEAN DEFAULT 0")
-        add_column("checklists", "approved_by INTEGER")
-        add_column("checklists", "approved_at DATETIME")
-
-        add_column("incidents", "approved BOOLEAN DEFAULT 0")
-        add_column("incidents", "approved_by INTEGER")
-        add_column("incidents", "approved_at DATETIME")
+    existing_columns = {}
+
+    def run_ddl(statement):
+        # One transaction per statement: on Postgres a failed statement aborts its
+        # transaction, which would otherwise make every later statement fail too
+        try:
+            with engine.begin() as conn:
+                conn.execute(text(statement))
+        except Exception:
+            logger.exception("Schema migration failed: %s", statement)
+
+    def add_column(column, default=None):
+        table = column.table.name
+        if table not in existing_columns:
+            existing_columns[table] = {c["name"] for c in inspect(engine).get_columns(table)}
+        if column.name in existing_columns[table]:
+            return
+        column_def = f"{column.name} {column.type.compile(dialect=engine.dialect)}"
+        if default is not None:
+            column_def += f" DEFAULT {default}"
+        run_ddl(f"ALTER TABLE {table} ADD COLUMN {column_def}")
+
+    def add_unique_index(column):
+        table = column.table.name
+        run_ddl(f"CREATE UNIQUE INDEX IF NOT EXISTS ix_{table}_{column.name} ON {table} ({column.name})")
+
+    checklists = Checklist.__table__.c
+    incidents = Incident.__table__.c
+
+    add_column(checklists.approved, default="FALSE")
+    add_column(checklists.approved_by)
+    add_column(checklists.approved_at)
+
+    add_column(incidents.approved, default="FALSE")
+    add_column(incidents.approved_by)
+    add_column(incidents.approved_at)
+
+    add_column(Barn.__table__.c.risk_snapshot)
+
+    add_column(checklists.anomaly_score)
+    add_column(checklists.anomaly_flags)
+
+    add_column(checklists.client_uuid)
+    add_unique_index(checklists.client_uuid)
+    add_column(incidents.client_uuid)
+    add_unique_index(incidents.client_uuid)
 
 
 # =========================
@@ -94,6 +200,64 @@ def get_accessible_farm_ids(user_id: int, user_role: str, db: Session):
     return get_user_assigned_farms(user_id, db)
 
 
+# =========================
+# DATA VERSIONS (CACHE KEYS)
+# =========================
+
+def bump_data_version(farm_id: int, db: Session):
+    """Increment a farm's data version so cached views of that farm are recomputed"""
+    if farm_id is None:
+        return
+    updated = db.query(FarmDataVersion).filter(FarmDataVersion.farm_id == farm_id).update(
+        {"version": FarmDataVersion.version + 1, "updated_at": datetime.utcnow()},
+        synchronize_session=False
+    )
+    if not updated:
+        db.add(FarmDataVersion(farm_id=farm_id, version=1, updated_at=datetime.utcnow()))
+    db.commit()
+
+
+def get_data_versions(farm_ids, db: Session):
+    """Return ((farm_id, version), ...) for the given farms, usable as a cache key"""
+    farm_ids = sorted(farm_ids)
+    if not farm_ids:
+        return ()
+    rows = db.query(FarmDataVersion.farm_id, FarmDataVersion.version).filter(
+        FarmDataVersion.farm_id.in_(farm_ids)
+    ).all()
+    versions = dict(rows)
+    return tuple((farm_id, versions.get(farm_id, 0)) for farm_id in farm_ids)
+
+
+def get_latest_approved_checklists(barn_ids, db: Session):
+    """Each barn's latest approved checklist; the higher id wins a submitted_at tie"""
+    ranked = db.query(
+        Checklist.id,
+        func.row_number().over(
+            partition_by=Checklist.barn_id,
+            order_by=(Checklist.submitted_at.desc(), Checklist.id.desc())
+        ).label("rank")
+    ).filter(
+        Checklist.barn_id.in_(list(barn_ids)),
+        Checklist.approved == True
+    ).subquery()
+    return db.query(Checklist).join(ranked, Checklist.id == ranked.c.id).filter(ranked.c.rank == 1).all()
+
+
+def get_barn_set_versions(db: Session, farm_ids):
+    """Per-farm barn fingerprint (count, max id, latest update) for figure and index caches"""
+    farm_ids = list(farm_ids)
+    if not farm_ids:
+        return {}
+    rows = db.query(
+        Barn.farm_id, func.count(Barn.id), func.max(Barn.id), func.max(Barn.last_updated)
+    ).filter(Barn.farm_id.in_(farm_ids)).group_by(Barn.farm_id).all()
+    return {
+        farm_id: (count, max_id, last_updated.isoformat() if last_updated else None)
+        for farm_id, count, max_id, last_updated in rows
+    }
+
+
 # =========================
 # USER ↔ FARM ASSIGNMENT
 # =========================
@@ -165,7 +329,7 @@ def create_demo_data():
 
     except Exception as e:
         db.rollback()
-        print("Demo setup error:", e)
+        logger.exception("Demo setup error")
 
     finally:
         db.close()
\ No newline at end of file
@@ -0,0 +1,201 @@
+"""
+Streaming drift and data-quality statistics for checklist features.
+
+Every inserted checklist updates, per farm and feature, a running mean and
+variance (Welford) and an exponentially decayed histogram over fixed bins.
+That is a constant amount of work per checklist and never rescans history.
+The decayed histogram reflects roughly the last 1 / DRIFT_DECAY checklists
+and is compared with the training data's histogram (saved by
+FarmRiskPredictor.train_model) using the population stability index (PSI).
+When a feature's PSI crosses DRIFT_PSI_THRESHOLD a data_drift Alert is
+sent to admins and managers, at most once per DRIFT_ALERT_COOLDOWN_HOURS per
+farm and feature.
+"""
+
+import math
+import os
+from bisect import bisect_right
+from datetime import datetime, timedelta
+import numpy as np
+from database import dialect_insert
+from models import Barn, Farm, Alert, FeatureBaseline, FeatureStat, User
+
+# Inner bin edges per feature; values below/above fall in the outer bins
+DRIFT_BINS = {
+    "hygiene_score": [1.5, 2.5, 3.5, 4.5, 5.5, 6.5, 7.5, 8.5, 9.5],
+    "mortality_count": [0.5, 1.5, 2.5, 3.5, 5.5, 10.5, 20.5],
+    "feed_quality": [1.5, 2.5, 3.5, 4.5, 5.5, 6.5, 7.5, 8.5, 9.5],
+    "water_quality": [1.5, 2.5, 3.5, 4.5, 5.5, 6.5, 7.5, 8.5, 9.5],
+    "ventilation_score": [1.5, 2.5, 3.5, 4.5, 5.5, 6.5, 7.5, 8.5, 9.5],
+    "temperature": [10.0, 15.0, 18.0, 20.0, 22.0, 24.0, 26.0, 28.0, 32.0],
+    "humidity": [20.0, 30.0, 40.0, 50.0, 60.0, 70.0, 80.0, 90.0],
+}
+
+# Values outside these ranges count as data-quality problems
+VALID_RANGES = {
+    "hygiene_score": (1, 10),
+    "mortality_count": (0, 100),
+    "feed_quality": (1, 10),
+    "water_quality": (1, 10),
+    "ventilation_score": (1, 10),
+    "temperature": (-10, 50),
+    "humidity": (0, 100),
+}
+
+DRIFT_DECAY = float(os.getenv("FARMTWIN_DRIFT_DECAY", "0.01"))
+DRIFT_PSI_THRESHOLD = float(os.getenv("FARMTWIN_DRIFT_PSI", "0.25"))
+DRIFT_MIN_SAMPLES = 100  # below this the histogram is too noisy for PSI
+DRIFT_ALERT_COOLDOWN_HOURS = 24
+PSI_EPSILON = 1e-4
+
+
+def population_stability_index(expected, actual):
+    """PSI between two histograms over the same bins (counts or shares)"""
+    expected = np.asarray(expected, dtype=float)
+    actual = np.asarray(actual, dtype=float)
+    if expected.sum() <= 0 or actual.sum() <= 0:
+        return 0.0
+    expected = np.maximum(expected / expected.sum(), PSI_EPSILON)
+    actual = np.maximum(actual / actual.sum(), PSI_EPSILON)
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+
+def save_training_baseline(df, model_version, db):
+    """Store per-feature histogram, mean and std of the training data"""
+    now = datetime.utcnow()
+    for feature, edges in DRIFT_BINS.items():
+        values = df[feature].to_numpy(dtype=float)
+        counts = np.bincount(np.searchsorted(edges, values, side="right"), minlength=len(edges) + 1)
+        baseline = db.query(FeatureBaseline).filter(FeatureBaseline.feature == feature).first()
+        if baseline is None:
+            baseline = FeatureBaseline(feature=feature)
+            db.add(baseline)
+        baseline.model_version = model_version
+        baseline.count = len(values)
+        baseline.mean = float(values.mean()) if len(values) else 0.0
+        baseline.std = float(values.std()) if len(values) else 0.0
+        baseline.histogram = (counts / max(len(values), 1)).round(6).tolist()
+        baseline.created_at = now
+    db.commit()
+
+
+def _update_stat(stat, value, edges):
+    """Fold one value into a FeatureStat row (Welford mean/variance, decayed histogram)"""
+    low, high = VALID_RANGES[stat.feature]
+    if value is None:
+        stat.missing = (stat.missing or 0) + 1
+        return
+    if not low <= value <= high:
+        stat.out_of_range = (stat.out_of_range or 0) + 1
+
+    count = (stat.count or 0) + 1
+    mean = stat.mean or 0.0
+    delta = value - mean
+    mean += delta / count
+    stat.m2 = (stat.m2 or 0.0) + delta * (value - mean)
+    stat.mean = mean
+    stat.count = count
+
+    histogram = [h * (1.0 - DRIFT_DECAY) for h in (stat.histogram or [0.0] * (len(edges) + 1))]
+    histogram[bisect_right(edges, value)] += 1.0
+    stat.histogram = histogram
+
+
+def record_checklist(checklist, db, farm_id=None, commit=True):
+    """Update the farm's feature statistics with one checklist; returns the drifted features
+
+    With commit=False the changes are only flushed, for callers batching many checklists.
+    """
+    if farm_id is None:
+        farm_id = db.query(Barn.farm_id).filter(Barn.id == checklist.barn_id).scalar()
+    if farm_id is None:
+        return []
+
+    # Create missing rows with an upsert, then lock them for the read-modify-write:
+    # concurrent checklists of one farm would otherwise collide on the first insert
+    # and lose counts, corrupting the Welford mean/M2. On SQLite the insert takes
+    # the database write lock, which serializes writers the same way.
+    insert = dialect_insert(db)
+    db.execute(insert(FeatureStat).values([
+        {"farm_id": farm_id, "feature": feature, "count": 0, "mean": 0.0, "m2": 0.0,
+         "missing": 0, "out_of_range": 0}
+        for feature in DRIFT_BINS
+    ]).on_conflict_do_nothing(index_elements=[FeatureStat.farm_id, FeatureStat.feature]))
+    stats = {
+        stat.feature: stat
+        for stat in db.query(FeatureStat)
+        .filter(FeatureStat.farm_id == farm_id)
+        .with_for_update()
+        .populate_existing()
+        .all()
+    }
+    baselines = {baseline.feature: baseline for baseline in db.query(FeatureBaseline).all()}
+
+    now = datetime.utcnow()
+    drifted = []
+    for feature, edges in DRIFT_BINS.items():
+        stat = stats[feature]
+        value = getattr(checklist, feature)
+        _update_stat(stat, float(value) if value is not None else None, edges)
+        stat.updated_at = now
+
+        baseline = baselines.get(feature)
+        if baseline is None or not baseline.histogram or stat.count < DRIFT_MIN_SAMPLES:
+            continue
+
+        stat.psi = population_stability_index(baseline.histogram, stat.histogram)
+        if stat.psi < DRIFT_PSI_THRESHOLD:
+            continue
+        if stat.last_alert_at and now - stat.last_alert_at < timedelta(hours=DRIFT_ALERT_COOLDOWN_HOURS):
+            continue
+
+        stat.last_alert_at = now
+        drifted.append(feature)
+
+    if drifted:
+        farm_name = db.query(Farm.name).filter(Farm.id == farm_id).scalar() or f"Farm {farm_id}"
+        details = ", ".join(
+            f"{feature.replace('_', ' ')} (PSI {stats[feature].psi:.2f}, "
+            f"mean {stats[feature].mean:.1f} vs {baselines[feature].mean:.1f} in training)"
+            for feature in drifted
+        )
+        recipients = db.query(User).filter(User.role.in_(['admin', 'manager']), User.is_active == True).all()
+        db.add_all([Alert(
+            type="data_drift",
+            message=f"📉 Checklist data drift on {farm_name}: {details}",
+            severity="medium",
+            barn_id=checklist.barn_id,
+            user_id=recipient.id
+        ) for recipient in recipients])
+
+    if commit:
+        db.commit()
+    else:
+        db.flush()
+    return drifted
+
+
+def get_drift_report(db, farm_ids=None):
+    """Current statistics per farm and feature next to the training baseline"""
+    query = db.query(FeatureStat, Farm.name).join(Farm, FeatureStat.farm_id == Farm.id)
+    if farm_ids is not None:
+        query = query.filter(FeatureStat.farm_id.in_(farm_ids))
+    baselines = {baseline.feature: baseline for baseline in db.query(FeatureBaseline).all()}
+
+    report = []
+    for stat, farm_name in query.order_by(Farm.name, FeatureStat.feature).all():
+        baseline = baselines.get(stat.feature)
+        variance = stat.m2 / (stat.count - 1) if stat.count and stat.count > 1 else 0.0
+        report.append({
+            "farm": farm_name,
+            "feature": stat.feature,
+            "count": stat.count,
+            "mean": stat.mean,
+            "std": math.sqrt(max(variance, 0.0)),
+            "training_mean": baseline.mean if baseline else None,
+            "training_std": baseline.std if baseline else None,
+            "psi": stat.psi,
+            "missing": stat.missing,
+            "out_of_range": stat.out_of_range,
+        })
+    return report
@@ -0,0 +1,240 @@
+"""
+Streaming exports for audit data (checklists, incidents, alerts, visitors).
+
+Rows are read from the database with a server-side cursor in fixed-size
+chunks and written straight to a CSV generator or a Parquet/CSV temp file,
+so large exports never materialize the full result set in memory.
+
+Rows not tied to any farm (alerts without a barn) are only exported with
+include_unscoped=True, for roles that can see every farm.
+"""
+
+import csv
+import io
+import os
+import tempfile
+from datetime import datetime, timedelta
+from sqlalchemy import select, or_
+from database import get_read_db
+from models import Barn, Checklist, Incident, Alert, Visitor, User
+
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_FORMATS = ["csv", "parquet"]
+
+# Column name -> (SQL expression, type) for every exportable table.
+# Types drive the Parquet schema so later chunks always match the first.
+# "unscoped" matches rows that belong to no farm, if the table has any.
+EXPORT_SOURCES = {
+    "checklists": {
+        "date_column": Checklist.submitted_at,
+        "farm_column": Barn.farm_id,
+        "columns": [
+            ("id", Checklist.id, "int"),
+            ("farm_id", Barn.farm_id, "int"),
+            ("barn", Barn.name, "str"),
+            ("submitted_by", User.name, "str"),
+            ("hygiene_score", Checklist.hygiene_score, "int"),
+            ("mortality_count", Checklist.mortality_count, "int"),
+            ("feed_quality", Checklist.feed_quality, "int"),
+            ("water_quality", Checklist.water_quality, "int"),
+            ("ventilation_score", Checklist.ventilation_score, "int"),
+            ("temperature", Checklist.temperature, "float"),
+            ("humidity", Checklist.humidity, "float"),
+            ("notes", Checklist.notes, "str"),
+            ("gps_lat", Checklist.gps_lat, "float"),
+            ("gps_lng", Checklist.gps_lng, "float"),
+            ("submitted_at", Checklist.submitted_at, "datetime"),
+            ("approved", Checklist.approved, "bool"),
+            ("approved_at", Checklist.approved_at, "datetime"),
+        ],
+        "joins": lambda stmt: stmt.join(Barn, Checklist.barn_id == Barn.id).outerjoin(
+            User, Checklist.user_id == User.id
+        ),
+    },
+    "incidents": {
+        "date_column": Incident.reported_at,
+        "farm_column": Barn.farm_id,
+        "columns": [
+            ("id", Incident.id, "int"),
+            ("farm_id", Barn.farm_id, "int"),
+            ("barn", Barn.name, "str"),
+            ("reported_by", User.name, "str"),
+            ("incident_type", Incident.incident_type, "str"),
+            ("severity", Incident.severity, "str"),
+            ("description", Incident.description, "str"),
+            ("actions_taken", Incident.actions_taken, "str"),
+            ("resolved", Incident.resolved, "bool"),
+            ("reported_at", Incident.reported_at, "datetime"),
+            ("approved", Incident.approved, "bool"),
+            ("approved_at", Incident.approved_at, "datetime"),
+        ],
+        "joins": lambda stmt: stmt.join(Barn, Incident.barn_id == Barn.id).outerjoin(
+            User, Incident.user_id == User.id
+        ),
+    },
+    "alerts": {
+        "date_column": Alert.created_at,
+        "farm_column": Barn.farm_id,
+        "columns": [
+            ("id", Alert.id, "int"),
+            ("farm_id", Barn.farm_id, "int"),
+            ("barn", Barn.name, "str"),
+            ("type", Alert.type, "str"),
+            ("severity", Alert.severity, "str"),
+            ("message", Alert.message, "str"),
+            ("user_id", Alert.user_id, "int"),
+            ("read", Alert.read, "bool"),
+            ("created_at", Alert.created_at, "datetime"),
+        ],
+        "joins": lambda stmt: stmt.outerjoin(Barn, Alert.barn_id == Barn.id),
+        "unscoped": Alert.barn_id.is_(None),
+    },
+    "visitors": {
+        "date_column": Visitor.check_in_time,
+        "farm_column": Visitor.farm_id,
+        "columns": [
+            ("id", Visitor.id, "int"),
+            ("farm_id", Visitor.farm_id, "int"),
+            ("name", Visitor.name, "str"),
+            ("company", Visitor.company, "str"),
+            ("email", Visitor.email, "str"),
+            ("phone", Visitor.phone, "str"),
+            ("purpose", Visitor.purpose, "str"),
+            ("check_in_time", Visitor.check_in_time, "datetime"),
+            ("check_out_time", Visitor.check_out_time, "datetime"),
+        ],
+        "joins": lambda stmt: stmt,
+    },
+}
+
+
+def get_export_columns(kind):
+    """Return the column names of an export kind"""
+    return [name for name, _, _ in EXPORT_SOURCES[kind]["columns"]]
+
+
+def build_export_statement(kind, farm_ids, start_date=None, end_date=None, include_unscoped=False):
+    """Build the SELECT for an export, filtered by farms and an inclusive date range"""
+    if kind not in EXPORT_SOURCES:
+        raise ValueError(f"Unknown export type: {kind}")
+
+    source = EXPORT_SOURCES[kind]
+    stmt = select(*[column.label(name) for name, column, _ in source["columns"]])
+    stmt = source["joins"](stmt)
+    farm_filter = source["farm_column"].in_(list(farm_ids))
+    if include_unscoped and "unscoped" in source:
+        farm_filter = or_(farm_filter, source["unscoped"])
+    stmt = stmt.where(farm_filter)
+
+    if start_date is not None:
+        stmt = stmt.where(source["date_column"] >= start_date)
+    if end_date is not None:
+        # Include the whole end day
+        stmt = stmt.where(source["date_column"] < end_date + timedelta(days=1))
+
+    return stmt.order_by(source["date_column"])
+
+
+def iter_export_chunks(kind, farm_ids, start_date=None, end_date=None, chunk_size=EXPORT_CHUNK_SIZE,
+                       include_unscoped=False):
+    """Yield lists of row tuples from a server-side cursor, chunk_size rows at a time"""
+    stmt = build_export_statement(kind, farm_ids, start_date, end_date, include_unscoped)
+
+    db = get_read_db()
+    try:
+        result = db.execute(stmt.execution_options(yield_per=chunk_size))
+        for partition in result.partitions(chunk_size):
+            yield [tuple(row) for row in partition]
+    finally:
+        db.close()
+
+
+def _format_csv_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def stream_csv(kind, farm_ids, start_date=None, end_date=None, chunk_size=EXPORT_CHUNK_SIZE,
+               include_unscoped=False):
+    """Generate CSV text one chunk at a time (header first)"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    writer.writerow(get_export_columns(kind))
+    yield buffer.getvalue()
+
+    for rows in iter_export_chunks(kind, farm_ids, start_date, end_date, chunk_size, include_unscoped):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([_format_csv_value(value) for value in row] for row in rows)
+        yield buffer.getvalue()
+
+
+def _parquet_schema(kind):
+    import pyarrow as pa
+
+    arrow_types = {
+        "int": pa.int64(),
+        "float": pa.float64(),
+        "str": pa.string(),
+        "bool": pa.bool_(),
+        "datetime": pa.timestamp("us"),
+    }
+    return pa.schema([
+        (name, arrow_types[column_type])
+        for name, _, column_type in EXPORT_SOURCES[kind]["columns"]
+    ])
+
+
+def write_export_file(kind, farm_ids, start_date=None, end_date=None, file_format="csv",
+                      chunk_size=EXPORT_CHUNK_SIZE, include_unscoped=False):
+    """Write an export to a temp file and return its path; the caller removes it"""
+    if file_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {file_format}")
+
+    fd, path = tempfile.mkstemp(prefix=f"farmtwin_{kind}_", suffix=f".{file_format}")
+    try:
+        if file_format == "csv":
+            with os.fdopen(fd, "w", newline="", encoding="utf-8") as f:
+                for text in stream_csv(kind, farm_ids, start_date, end_date, chunk_size, include_unscoped):
+                    f.write(text)
+        else:
+            os.close(fd)
+            _write_parquet(kind, farm_ids, start_date, end_date, path, chunk_size, include_unscoped)
+    except Exception:
+        os.remove(path)
+        raise
+
+    return path
+
+
+def _write_parquet(kind, farm_ids, start_date, end_date, path, chunk_size, include_unscoped):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise RuntimeError("Parquet export requires the 'pyarrow' package")
+
+    schema = _parquet_schema(kind)
+
+    # An empty result still produces a valid file carrying the schema
+    with pq.ParquetWriter(path, schema, compression="snappy") as writer:
+        for rows in iter_export_chunks(kind, farm_ids, start_date, end_date, chunk_size, include_unscoped):
+            columns = list(zip(*rows))
+            batch = pa.record_batch(
+                [pa.array(column, type=schema.field(i).type) for i, column in enumerate(columns)],
+                schema=schema
+            )
+            writer.write_batch(batch)
+
+
+def get_export_filename(kind, start_date=None, end_date=None, file_format="csv"):
+    """Build a download filename for an export"""
+    date_part = f"_{start_date}_{end_date}" if start_date and end_date else ""
+    return f"{kind}_export{date_part}.{file_format}"
+
+
+def get_export_mime_type(file_format):
+    """Return the MIME type for an export format"""
+    return "text/csv" if file_format == "csv" else "application/vnd.apache.parquet"
@@ -6,6 +6,9 @@ Run this once to create notifications for historical data.
 from database import get_db
 from models import Incident, Checklist, User, Alert, Barn
 from datetime import datetime
+from logging_setup import get_logger
+
+logger = get_logger(__name__)
 
 def generate_incident_notifications():
     """Generate notifications for existing incidents"""
@@ -14,8 +17,7 @@ def generate_incident_notifications():
         # Get all incidents without notifications
         incidents = db.query(Incident).all()
         
-        print(f"\nFound {len(incidents)} incidents in database")
-        print("=" * 60)
+        logger.info("Found %d incidents in database", len(incidents))
         
         notifications_created = 0
         
@@ -25,7 +27,7 @@ def generate_incident_notifications():
             barn = db.query(Barn).filter(Barn.id == incident.barn_id).first()
             
             if not user or not barn:
-                print(f"⚠️  Skipping incident {incident.id} - missing user or barn")
+                logger.warning("Skipping incident %s - missing user or barn", incident.id)
                 continue
             
             # Determine who to notify
@@ -39,13 +41,9 @@ def generate_incident_notifications():
                 User.is_active == True
             ).all()
             
-            print(f"\nIncident #{incident.id}:")
-            print(f"  Reporter: {user.name}")
-            print(f"  Barn: {barn.name}")
-            print(f"  Type: {incident.incident_type}")
-            print(f"  Severity: {incident.severity}")
-            print(f"  Approved: {'Yes' if incident.approved else 'No'}")
-            print(f"  Notifying {len(notification_users)} users: {notification_roles}")
+            logger.debug("Incident #%s by %s at %s (%s, %s, approved=%s): notifying %d users with roles %s",
+                         incident.id, user.name, barn.name, incident.incident_type, incident.severity,
+                         incident.approved, len(notification_users), notification_roles)
             
             # Create notifications
             for notif_user in notification_users:
@@ -57,7 +55,7 @@ def generate_incident_notifications():
                 ).first()
                 
                 if existing:
-                    print(f"    ↳ {notif_user.name} - already has notification, skipping")
+                    logger.debug("%s already has a notification, skipping", notif_user.name)
                     continue
                 
                 alert = Alert(
@@ -71,16 +69,14 @@ def generate_incident_notifications():
                 )
                 db.add(alert)
                 notifications_created += 1
-                print(f"    ✓ Created notification for {notif_user.name}")
+                logger.debug("Created notification for %s", notif_user.name)
         
         db.commit()
-        print(f"\n{'=' * 60}")
-        print(f"✅ Successfully created {notifications_created} notifications!")
-        print(f"{'=' * 60}\n")
+        logger.info("Created %d notifications", notifications_created)
         
     except Exception as e:
         db.rollback()
-        print(f"\n❌ Error: {e}")
+        logger.exception("Failed to generate notifications")
     finally:
         db.close()
 
@@ -92,8 +88,7 @@ def generate_checklist_notifications():
         # Get all checklists without notifications
         checklists = db.query(Checklist).all()
         
-        print(f"\nFound {len(checklists)} checklists in database")
-        print("=" * 60)
+        logger.info("Found %d checklists in database", len(checklists))
         
         notifications_created = 0
         
@@ -103,7 +98,7 @@ def generate_checklist_notifications():
             barn = db.query(Barn).filter(Barn.id == checklist.barn_id).first()
             
             if not user or not barn:
-                print(f"⚠️  Skipping checklist {checklist.id} - missing user or barn")
+                logger.warning("Skipping checklist %s - missing user or barn", checklist.id)
                 continue
             
             # Get users to notify (admins and managers)
@@ -112,11 +107,8 @@ def generate_checklist_notifications():
                 User.is_active == True
             ).all()
             
-            print(f"\nChecklist #{checklist.id}:")
-            print(f"  Reporter: {user.name}")
-            print(f"  Barn: {barn.name}")
-            print(f"  Approved: {'Yes' if checklist.approved else 'No'}")
-            print(f"  Notifying {len(notification_users)} users: ['admin', 'manager']")
+            logger.debug("Checklist #%s by %s at %s (approved=%s): notifying %d admins and managers",
+                         checklist.id, user.name, barn.name, checklist.approved, len(notification_users))
             
             # Create notifications
             for notif_user in notification_users:
@@ -128,7 +120,7 @@ def generate_checklist_notifications():
                 ).first()
                 
                 if existing:
-                    print(f"    ↳ {notif_user.name} - already has notification, skipping")
+                    logger.debug("%s already has a notification, skipping", notif_user.name)
                     continue
                 
                 alert = Alert(
@@ -142,34 +134,27 @@ def generate_checklist_notifications():
                 )
                 db.add(alert)
                 notifications_created += 1
-                print(f"    ✓ Created notification for {notif_user.name}")
+                logger.debug("Created notification for %s", notif_user.name)
         
         db.commit()
-        print(f"\n{'=' * 60}")
-        print(f"✅ Successfully created {notifications_created} notifications!")
-        print(f"{'=' * 60}\n")
+        logger.info("Created %d notifications", notifications_created)
         
     except Exception as e:
         db.rollback()
-        print(f"\n❌ Error: {e}")
+        logger.exception("Failed to generate notifications")
     finally:
         db.close()
 
 
 if __name__ == "__main__":
-    print("\n" + "=" * 60)
-    print("  RETROACTIVE NOTIFICATION GENERATOR")
-    print("=" * 60)
-    print("\nThis script will create notifications for existing incidents")
-    print("and checklists that were submitted before the notification")
-    print("system was implemented.\n")
+    logger.info("Creating notifications for incidents and checklists submitted before the notification system")
     
     # Generate notifications for incidents
-    print("\n📋 PROCESSING INCIDENTS...")
+    logger.info("Processing incidents")
     generate_incident_notifications()
     
     # Generate notifications for checklists
-    print("\n📋 PROCESSING CHECKLISTS...")
+    logger.info("Processing checklists")
     generate_checklist_notifications()
     
-    print("\n✅ Done! Refresh your dashboard to see the notifications.\n")
+    logger.info("Done! Refresh your dashboard to see the notifications.")
@@ -0,0 +1,149 @@
+"""
+Interpolated barn risk surface for the risk heatmap.
+
+Barn risk values are spread over a regular grid with inverse distance
+weighting (IDW). The engine keeps the weighted-sum numerator and the
+weight denominator per grid cell, so when only a few barns change their
+old contribution is subtracted and the new one added instead of
+recomputing the whole surface.
+"""
+
+import threading
+import numpy as np
+from database import get_db
+from models import Barn
+
+HEATMAP_RESOLUTION = 80
+IDW_POWER = 2.0
+BOUNDS_PADDING = 10.0  # meters around the outermost barns
+BOUNDS_SNAP = 10.0  # bounds are rounded so small moves don't force a rebuild
+REBUILD_FRACTION = 0.5  # above this share of changed barns a full rebuild is cheaper
+WEIGHT_BATCH = 256
+
+RISK_NUMERIC = {"low": 1.0, "medium": 2.0, "high": 3.0}
+
+
+class RiskHeatmapEngine:
+    """Incrementally maintained IDW surface for one farm"""
+
+    def __init__(self, resolution=HEATMAP_RESOLUTION, power=IDW_POWER):
+        self.resolution = resolution
+        self.power = power
+        self.points = {}
+        self.bounds = None
+        self.grid_x = None
+        self.grid_y = None
+        self.numerator = None
+        self.denominator = None
+        self.version = None  # the data version the points were loaded at, set by update()
+        self.lock = threading.Lock()
+
+    def _compute_bounds(self, points):
+        xs = [x for x, _, _ in points.values()]
+        ys = [y for _, y, _ in points.values()]
+
+        def snap_down(value):
+            return np.floor((value - BOUNDS_PADDING) / BOUNDS_SNAP) * BOUNDS_SNAP
+
+        def snap_up(value):
+            return np.ceil((value + BOUNDS_PADDING) / BOUNDS_SNAP) * BOUNDS_SNAP
+
+        return (snap_down(min(xs)), snap_up(max(xs)), snap_down(min(ys)), snap_up(max(ys)))
+
+    def _weights(self, xs, ys):
+        """IDW weights with shape (len(xs), resolution, resolution)"""
+        dx = self.grid_x[None, None, :] - np.asarray(xs, dtype=float)[:, None, None]
+        dy = self.grid_y[None, :, None] - np.asarray(ys, dtype=float)[:, None, None]
+        dist_sq = dx * dx + dy * dy
+        # Small epsilon keeps the surface finite exactly on a barn
+        return 1.0 / np.power(dist_sq + 1e-6, self.power / 2.0)
+
+    def _accumulate(self, points, sign):
+        items = list(points)
+        for start in range(0, len(items), WEIGHT_BATCH):
+            batch = items[start:start + WEIGHT_BATCH]
+            xs = [x for x, _, _ in batch]
+            ys = [y for _, y, _ in batch]
+            values = np.array([value for _, _, value in batch], dtype=float)
+
+            weights = self._weights(xs, ys)
+            self.numerator += sign * np.tensordot(values, weights, axes=1)
+            self.denominator += sign * weights.sum(axis=0)
+
+    def _rebuild(self, points):
+        self.bounds = self._compute_bounds(points)
+        x_min, x_max, y_min, y_max = self.bounds
+        self.grid_x = np.linspace(x_min, x_max, self.resolution)
+        self.grid_y = np.linspace(y_min, y_max, self.resolution)
+        self.numerator = np.zeros((self.resolution, self.resolution))
+        self.denominator = np.zeros((self.resolution, self.resolution))
+        self._accumulate(points.values(), 1.0)
+
+    def update(self, points, version=None):
+        """Sync the surface with {barn_id: (x, y, value)}; returns the number of barns touched"""
+        with self.lock:
+            self.version = version
+            if not points:
+                self.points = {}
+                self.bounds = None
+                return 0
+
+            removed = [self.points[barn_id] for barn_id in self.points.keys() - points.keys()]
+            added = {
+                barn_id: point for barn_id, point in points.items()
+                if self.points.get(barn_id) != point
+            }
+            replaced = [self.points[barn_id] for barn_id in added if barn_id in self.points]
+            touched = len(removed) + len(added)
+
+            if touched == 0:
+                return 0
+
+            if (
+                self.bounds is None
+                or self._compute_bounds(points) != self.bounds
+                or touched > REBUILD_FRACTION * len(points)
+            ):
+                self._rebuild(points)
+            else:
+                self._accumulate(removed + replaced, -1.0)
+                self._accumulate(added.values(), 1.0)
+
+            self.points = dict(points)
+            return touched
+
+    def surface(self, decimals=2):
+        """Return (grid_x, grid_y, z) with z as a compact float32 array"""
+        with self.lock:
+            if self.bounds is None:
+                return None
+            z = self.numerator / np.maximum(self.denominator, 1e-12)
+            return (
+                self.grid_x.astype(np.float32),
+                self.grid_y.astype(np.float32),
+                np.round(z, decimals).astype(np.float32)
+            )
+
+
+def load_barn_risk_points(farm_id):
+    """{barn_id: (x, y, expected risk 1-3)} from each barn's stored risk snapshot"""
+    db = get_db()
+    try:
+        barns = db.query(
+            Barn.id, Barn.position_x, Barn.position_y, Barn.risk_level, Barn.risk_snapshot
+        ).filter(Barn.farm_id == farm_id).all()
+    finally:
+        db.close()
+
+    points = {}
+    for barn in barns:
+        value = RISK_NUMERIC.get(barn.risk_level, 1.0)
+        probabilities = (barn.risk_snapshot or {}).get("probabilities")
+        if probabilities:
+            # Expected risk level on the 1-3 scale from class probabilities
+            value = round(sum(
+                RISK_NUMERIC[label] * p for label, p in probabilities.items() if label in RISK_NUMERIC
+            ), 3)
+        points[barn.id] = (barn.position_x or 0.0, barn.position_y or 0.0, value)
+
+    return points
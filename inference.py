@@ -0,0 +1,200 @@
+"""
+Barn risk scoring with request micro-batching.
+
+One process holds the loaded model (normally the mobile backend, which
+serves POST /api/inference/score). Concurrent scoring requests are queued
+for up to INFERENCE_MAX_WAIT_MS and scored together with one vectorized
+predict_proba call.
+
+Other processes, such as the Streamlit app, call score_features or
+score_checklists. When FARMTWIN_INFERENCE_URL is set they use that service
+and never load the model. Without it, or when the service cannot be
+reached, they score in-process through a local batcher.
+"""
+
+import json
+import math
+import os
+import queue
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import Future
+from logging_setup import get_logger
+from instrumentation import measure_inference, record_inference_batch
+
+logger = get_logger(__name__)
+
+INFERENCE_URL = os.getenv("FARMTWIN_INFERENCE_URL")  # e.g. http://localhost:8000
+INFERENCE_TOKEN = os.getenv("FARMTWIN_INFERENCE_TOKEN")
+INFERENCE_TIMEOUT = float(os.getenv("FARMTWIN_INFERENCE_TIMEOUT", "5"))  # seconds
+INFERENCE_MAX_WAIT_MS = float(os.getenv("FARMTWIN_INFERENCE_MAX_WAIT_MS", "5"))
+INFERENCE_MAX_BATCH = int(os.getenv("FARMTWIN_INFERENCE_MAX_BATCH", "1024"))  # rows
+FEATURE_COUNT = 7  # hygiene, mortality, feed, water, ventilation, temperature, humidity
+
+_local_batcher = None
+_local_batcher_lock = threading.Lock()
+
+
+def validate_feature_rows(rows):
+    """Rows as lists of FEATURE_COUNT finite floats; raises ValueError otherwise"""
+    validated = []
+    for i, row in enumerate(rows):
+        try:
+            values = [float(value) for value in row]
+        except (TypeError, ValueError):
+            raise ValueError(f"Row {i} is not a list of numbers")
+        if len(values) != FEATURE_COUNT:
+            raise ValueError(f"Row {i} needs {FEATURE_COUNT} features, got {len(values)}")
+        if not all(math.isfinite(value) for value in values):
+            raise ValueError(f"Row {i} has a non-finite value")
+        validated.append(values)
+    return validated
+
+
+class MicroBatcher:
+    """Collects concurrent scoring requests and scores them as one batch"""
+
+    def __init__(self, score_batch, max_wait_ms=INFERENCE_MAX_WAIT_MS, max_rows=INFERENCE_MAX_BATCH,
+                 validate=None):
+        self.score_batch = score_batch
+        self.validate = validate  # rejects a request's rows before they can join a batch
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_rows = max_rows
+        self.queue = queue.Queue()
+        self.batches = 0
+        self.rows = 0
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="inference-batcher", daemon=True)
+                self._thread.start()
+
+    def submit(self, rows):
+        """Queue feature rows for scoring; the Future resolves to one result per row"""
+        future = Future()
+        if len(rows) == 0:
+            future.set_result([])
+            return future
+        if self.validate is not None:
+            try:
+                rows = self.validate(rows)
+            except ValueError as e:
+                future.set_exception(e)
+                return future
+        self._ensure_started()
+        self.queue.put((list(rows), future))
+        return future
+
+    def score(self, rows, timeout=None):
+        return self.submit(rows).result(timeout)
+
+    def _collect(self):
+        """Block for one request, then gather more until the wait or row limit is reached"""
+        batch = [self.queue.get()]
+        n_rows = len(batch[0][0])
+        deadline = time.monotonic() + self.max_wait
+
+        while n_rows < self.max_rows:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self.queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(item)
+            n_rows += len(item[0])
+
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            rows = [row for request_rows, _ in batch for row in request_rows]
+
+            started = time.perf_counter()
+            try:
+                results = self.score_batch(rows)
+            except Exception as e:
+                if len(batch) == 1:
+                    batch[0][1].set_exception(e)
+                else:
+                    # Score each request alone so only the one that breaks the model fails
+                    logger.warning("Inference batch of %d requests failed, retrying them one by one: %s", len(batch), e)
+                    self._run_individually(batch)
+                continue
+
+            record_inference_batch(time.perf_counter() - started, len(rows))
+            self.batches += 1
+            self.rows += len(rows)
+
+            offset = 0
+            for request_rows, future in batch:
+                future.set_result(results[offset:offset + len(request_rows)])
+                offset += len(request_rows)
+
+    def _run_individually(self, batch):
+        for request_rows, future in batch:
+            started = time.perf_counter()
+            try:
+                results = self.score_batch(request_rows)
+            except Exception as e:
+                future.set_exception(e)
+                continue
+            record_inference_batch(time.perf_counter() - started, len(request_rows))
+            self.batches += 1
+            self.rows += len(request_rows)
+            future.set_result(results)
+
+
+def get_local_batcher():
+    """Process-wide batcher around the in-process risk model"""
+    global _local_batcher
+    with _local_batcher_lock:
+        if _local_batcher is None:
+            from ai_engine import risk_predictor
+            _local_batcher = MicroBatcher(risk_predictor.build_feature_snapshots, validate=validate_feature_rows)
+        return _local_batcher
+
+
+def _score_remote(feature_rows):
+    request = urllib.request.Request(
+        f"{INFERENCE_URL.rstrip('/')}/api/inference/score",
+        data=json.dumps({"rows": feature_rows}).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+        method="POST"
+    )
+    if INFERENCE_TOKEN:
+        request.add_header("X-Inference-Token", INFERENCE_TOKEN)
+
+    with urllib.request.urlopen(request, timeout=INFERENCE_TIMEOUT) as response:
+        snapshots = json.loads(response.read())["results"]
+    return [(snapshot["risk_level"].title(), snapshot) for snapshot in snapshots]
+
+
+def score_features(feature_rows):
+    """[(risk label, snapshot)] for feature rows, from the inference service when configured"""
+    feature_rows = [[float(value) for value in row] for row in feature_rows]
+    if INFERENCE_URL:
+        try:
+            with measure_inference("remote"):
+                return _score_remote(feature_rows)
+        except (urllib.error.URLError, OSError, ValueError, KeyError) as e:
+            logger.warning("Inference service unavailable, scoring in-process: %s", e)
+    with measure_inference("local"):
+        return get_local_batcher().score(feature_rows)
+
+
+def score_checklists(checklists):
+    """[(risk label, snapshot)] per checklist, including the source checklist id"""
+    from ai_engine import risk_predictor
+
+    results = score_features([risk_predictor.checklist_features(cl) for cl in checklists])
+    for checklist, (_, snapshot) in zip(checklists, results):
+        snapshot["checklist_id"] = checklist.id
+    return results
@@ -0,0 +1,262 @@
+"""
+Request, render, SQL and inference timing.
+
+A Timing is opened per FastAPI request (MetricsMiddleware) and per Streamlit
+component render (@instrument_render) and held in a context variable. The
+SQLAlchemy cursor events add each statement's count and duration to the
+current Timing, and score_features adds model inference time. Nested timings
+are inclusive: a page's totals contain its components'.
+
+Finished timings go to a process-wide registry rendered in the Prometheus
+text format (GET /metrics on the mobile backend), and the Timings of one
+Streamlit script run are kept for the page debug panel.
+
+    FARMTWIN_INSTRUMENTATION=0  disable all of it
+    FARMTWIN_DEBUG_PANEL=1      show the per-page panel in the Streamlit sidebar
+"""
+
+import functools
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+INSTRUMENTATION_ENABLED = os.getenv("FARMTWIN_INSTRUMENTATION", "1") != "0"
+DEBUG_PANEL_ENABLED = os.getenv("FARMTWIN_DEBUG_PANEL", "0") == "1"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_current_timing = ContextVar("farmtwin_timing", default=None)
+_page_timings = ContextVar("farmtwin_page_timings", default=None)
+
+
+# ===== REGISTRY =====
+
+class MetricsRegistry:
+    """Thread-safe counters and histograms with Prometheus text output"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}  # name -> (type, help, {labels: value or [bucket counts..., sum, count]})
+
+    def declare(self, name, metric_type, help_text):
+        self._metrics.setdefault(name, (metric_type, help_text, {}))
+
+    def inc(self, name, amount=1.0, /, **labels):
+        key = tuple(sorted(labels.items()))
+        series = self._metrics[name][2]
+        with self._lock:
+            series[key] = series.get(key, 0.0) + amount
+
+    def observe(self, name, value, /, **labels):
+        key = tuple(sorted(labels.items()))
+        series = self._metrics[name][2]
+        with self._lock:
+            state = series.get(key)
+            if state is None:
+                state = series[key] = [0] * len(LATENCY_BUCKETS) + [0.0, 0]
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def snapshot(self, name):
+        """{labels dict as tuple: value} of one counter, or [buckets..., sum, count] of a histogram"""
+        with self._lock:
+            return {key: (list(value) if isinstance(value, list) else value)
+                    for key, value in self._metrics[name][2].items()}
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            for name, (metric_type, help_text, series) in sorted(self._metrics.items()):
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {metric_type}")
+                for key, value in sorted(series.items()):
+                    if metric_type == "histogram":
+                        for bound, count in zip(LATENCY_BUCKETS, value):
+                            lines.append(f"{name}_bucket{_labels(key, le=f'{bound:g}')} {count}")
+                        lines.append(f"{name}_bucket{_labels(key, le='+Inf')} {value[-1]}")
+                        lines.append(f"{name}_sum{_labels(key)} {value[-2]:.6f}")
+                        lines.append(f"{name}_count{_labels(key)} {value[-1]}")
+                    else:
+                        lines.append(f"{name}{_labels(key)} {value:g}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(key, **extra):
+    pairs = list(key) + list(extra.items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{label}="{_escape(value)}"' for label, value in pairs) + "}"
+
+
+registry = MetricsRegistry()
+registry.declare("farmtwin_http_request_seconds", "histogram", "Mobile API request wall time by route")
+registry.declare("farmtwin_render_seconds", "histogram", "Streamlit component render wall time, including nested components")
+registry.declare("farmtwin_scope_sql_statements_total", "counter", "SQL statements run inside a request or render, including nested renders")
+registry.declare("farmtwin_scope_sql_seconds_total", "counter", "SQL time inside a request or render, including nested renders")
+registry.declare("farmtwin_scope_inference_seconds_total", "counter", "Risk inference time inside a request or render")
+registry.declare("farmtwin_db_statements_total", "counter", "All SQL statements executed by this process")
+registry.declare("farmtwin_db_seconds_total", "counter", "Total SQL execution time of this process")
+registry.declare("farmtwin_inference_seconds", "histogram", "Risk scoring wall time per score_features call")
+registry.declare("farmtwin_inference_batch_seconds", "histogram", "Model time per micro-batch")
+registry.declare("farmtwin_inference_batch_rows_total", "counter", "Rows scored by the micro-batcher")
+
+
+# ===== TIMINGS =====
+
+class Timing:
+    """Wall, SQL and inference time of one request or render"""
+    __slots__ = ("kind", "name", "parent", "depth", "started", "wall_seconds",
+                 "sql_statements", "sql_seconds", "inference_seconds")
+
+    def __init__(self, kind, name, parent=None):
+        self.kind = kind
+        self.name = name
+        self.parent = parent
+        self.depth = parent.depth + 1 if parent is not None else 0
+        self.started = time.perf_counter()
+        self.wall_seconds = None
+        self.sql_statements = 0
+        self.sql_seconds = 0.0
+        self.inference_seconds = 0.0
+
+
+@contextmanager
+def measure(kind, name):
+    """Time a block as a request or render; nested blocks add their totals to the enclosing one"""
+    parent = _current_timing.get()
+    timing = Timing(kind, name, parent)
+    page = _page_timings.get()
+    if page is not None:
+        page.append(timing)
+
+    token = _current_timing.set(timing)
+    try:
+        yield timing
+    finally:
+        _current_timing.reset(token)
+        timing.wall_seconds = time.perf_counter() - timing.started
+        if parent is not None:
+            parent.sql_statements += timing.sql_statements
+            parent.sql_seconds += timing.sql_seconds
+            parent.inference_seconds += timing.inference_seconds
+        _record_scope(timing)
+
+
+def _record_scope(timing):
+    labels = {"kind": timing.kind, "scope": timing.name}
+    registry.inc("farmtwin_scope_sql_statements_total", timing.sql_statements, **labels)
+    registry.inc("farmtwin_scope_sql_seconds_total", timing.sql_seconds, **labels)
+    registry.inc("farmtwin_scope_inference_seconds_total", timing.inference_seconds, **labels)
+
+
+def instrument_render(func):
+    """Record wall, SQL and inference time of a Streamlit render function"""
+    if not INSTRUMENTATION_ENABLED:
+        return func
+
+    # Module-qualified, since several components define functions with the same name
+    module = "app" if func.__module__ == "__main__" else func.__module__.rsplit(".", 1)[-1]
+    name = f"{module}.{func.__qualname__}"
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with measure("render", name) as timing:
+            try:
+                return func(*args, **kwargs)
+            finally:
+                registry.observe("farmtwin_render_seconds", time.perf_counter() - timing.started, component=name)
+    return wrapper
+
+
+def start_page_timings():
+    """Collect the Timings of this Streamlit script run; returns the list they are appended to"""
+    timings = []
+    _page_timings.set(timings)
+    return timings
+
+
+@contextmanager
+def measure_inference(source):
+    """Time a scoring call and add it to the current request or render"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        registry.observe("farmtwin_inference_seconds", elapsed, source=source)
+        timing = _current_timing.get()
+        if timing is not None:
+            timing.inference_seconds += elapsed
+
+
+def record_inference_batch(seconds, rows):
+    registry.observe("farmtwin_inference_batch_seconds", seconds)
+    registry.inc("farmtwin_inference_batch_rows_total", rows)
+
+
+# ===== SQLALCHEMY =====
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("farmtwin_query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["farmtwin_query_started"].pop()
+    elapsed = time.perf_counter() - started
+    registry.inc("farmtwin_db_statements_total")
+    registry.inc("farmtwin_db_seconds_total", elapsed)
+    timing = _current_timing.get()
+    if timing is not None:
+        timing.sql_statements += 1
+        timing.sql_seconds += elapsed
+
+
+if INSTRUMENTATION_ENABLED:
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+
+# ===== ASGI =====
+
+class MetricsMiddleware:
+    """ASGI middleware timing every HTTP request by route template and status"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not INSTRUMENTATION_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        # The router stores the matched route in the shared scope, so the name is known afterwards
+        with measure("http", scope["path"]) as timing:
+            try:
+                await self.app(scope, receive, send_with_status)
+            finally:
+                route = getattr(scope.get("route"), "path", None) or "unmatched"
+                timing.name = route
+                registry.observe(
+                    "farmtwin_http_request_seconds", time.perf_counter() - timing.started,
+                    method=scope["method"], route=route, status=str(status)
+                )
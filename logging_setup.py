@@ -0,0 +1,92 @@
+"""
+Logging for the Streamlit app, the mobile backend and scripts.
+
+configure_logging() puts a single QueueHandler on the root logger. Records
+are only enqueued on the calling thread; a QueueListener thread formats them
+and writes them to stderr (and FARMTWIN_LOG_FILE when set), so request
+threads never wait on terminal or disk I/O and lines from concurrent
+requests never interleave.
+
+    FARMTWIN_LOG_LEVEL   DEBUG, INFO (default), WARNING, ...
+    FARMTWIN_LOG_FORMAT  text (default) or json, one object per line
+                         including any ``extra`` fields
+    FARMTWIN_LOG_FILE    optional log file
+
+Modules call get_logger(__name__) and pass values as arguments
+(``logger.debug("Notifying %d users", n)``), so a disabled level costs one
+level check and no formatting.
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+from datetime import datetime, timezone
+
+LOG_LEVEL = os.getenv("FARMTWIN_LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("FARMTWIN_LOG_FORMAT", "text").lower()
+LOG_FILE = os.getenv("FARMTWIN_LOG_FILE")
+
+TEXT_FORMAT = "%(asctime)s %(levelname)s [%(name)s] %(message)s"
+
+# Attributes every LogRecord has; anything else came from ``extra``
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+_listener = None
+_configure_lock = threading.Lock()
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record with the standard fields and any extras"""
+
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "thread": record.threadName,
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def _build_handlers():
+    formatter = JsonFormatter() if LOG_FORMAT == "json" else logging.Formatter(TEXT_FORMAT)
+    handlers = [logging.StreamHandler()]
+    if LOG_FILE:
+        handlers.append(logging.FileHandler(LOG_FILE, encoding="utf-8"))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    return handlers
+
+
+def configure_logging(level=None):
+    """Install the queue-backed root handler once per process; later calls only adjust the level"""
+    global _listener
+    root = logging.getLogger()
+    with _configure_lock:
+        if _listener is not None:
+            if level:
+                root.setLevel(level)
+            return
+
+        root.setLevel(level or LOG_LEVEL)
+        log_queue = queue.SimpleQueue()
+        _listener = logging.handlers.QueueListener(log_queue, *_build_handlers(), respect_handler_level=True)
+        _listener.start()
+        root.addHandler(logging.handlers.QueueHandler(log_queue))
+        atexit.register(_listener.stop)
+
+
+def get_logger(name):
+    """Logger for a module, configuring logging on first use"""
+    configure_logging()
+    return logging.getLogger(name)
@@ -1,9 +1,14 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, Header, Request, Response, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import StreamingResponse, FileResponse, JSONResponse, PlainTextResponse
+from starlette.background import BackgroundTask
+from pydantic import BaseModel, Field, ValidationError
 from typing import Optional, List
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta, timezone
+from email.utils import format_datetime
+import hashlib
 import jwt
 import bcrypt
 import sys
@@ -11,11 +16,46 @@ import os
 
 # Add parent directory to path to import existing modules
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from database import get_db, get_accessible_farm_ids
+from database import get_db, get_read_db, mark_user_write, get_accessible_farm_ids, can_access_all_farms, bump_data_version
 from models import User, Farm, Barn, Checklist, Incident, Visitor, Alert
+from risk_scheduler import mark_barns_dirty, get_risk_scheduler
+from inference import INFERENCE_TOKEN, INFERENCE_MAX_BATCH, get_local_batcher, score_checklists, validate_feature_rows
+from drift import record_checklist
+from anomaly import score_checklist, update_baselines
+from logging_setup import get_logger
+from instrumentation import MetricsMiddleware, measure_inference, registry
+from changelog import get_changes, get_table_versions
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
+from exports import (
+    EXPORT_SOURCES, EXPORT_FORMATS, stream_csv, write_export_file,
+    get_export_filename, get_export_mime_type
+)
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    from brotli_asgi import BrotliMiddleware
+except ImportError:
+    BrotliMiddleware = None
+
+COMPRESSION_MIN_BYTES = 500
+LIST_FORMATS = ["objects", "columns"]
+
+class FastJSONResponse(JSONResponse):
+    """JSON response encoded with orjson when it is installed"""
+    def render(self, content) -> bytes:
+        if orjson is None:
+            return super().render(content)
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
 
-app = FastAPI(title="FarmTwin360 Mobile API")
+logger = get_logger(__name__)
+
+app = FastAPI(title="FarmTwin360 Mobile API", default_response_class=FastJSONResponse)
 security = HTTPBearer()
 
 SECRET_KEY = os.getenv("SESSION_SECRET", "farmtwin-secret-key-change-in-production")
@@ -29,6 +69,20 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress responses as negotiated by Accept-Encoding: brotli when brotli-asgi is installed, else gzip
+if BrotliMiddleware is not None:
+    app.add_middleware(BrotliMiddleware, minimum_size=COMPRESSION_MIN_BYTES, gzip_fallback=True)
+else:
+    app.add_middleware(GZipMiddleware, minimum_size=COMPRESSION_MIN_BYTES, compresslevel=6)
+
+# Outermost, so request timings include compression
+app.add_middleware(MetricsMiddleware)
+
+# Recompute barn risk queued by approvals in the background
+@app.on_event("startup")
+def start_risk_scheduler():
+    get_risk_scheduler()
+
 # Pydantic models
 class LoginRequest(BaseModel):
     email: str
@@ -40,16 +94,21 @@ class LoginResponse(BaseModel):
 
 class ChecklistCreate(BaseModel):
     barn_id: int
-    hygiene_score: int
-    mortality_count: int
-    feed_quality: int
-    water_quality: int
-    ventilation_score: int
-    temperature: float
-    humidity: float
+    hygiene_score: int = Field(..., ge=1, le=10)
+    mortality_count: int = Field(..., ge=0, le=50)
+    feed_quality: int = Field(..., ge=1, le=10)
+    water_quality: int = Field(..., ge=1, le=10)
+    ventilation_score: int = Field(..., ge=1, le=10)
+    temperature: float = Field(..., ge=-10, le=50)
+    humidity: float = Field(..., ge=0, le=100)
     notes: Optional[str] = None
-    gps_lat: Optional[float] = None
-    gps_lng: Optional[float] = None
+    gps_lat: Optional[float] = Field(None, ge=-90, le=90)
+    gps_lng: Optional[float] = Field(None, ge=-180, le=180)
+    client_uuid: Optional[str] = Field(None, max_length=36)
+
+class InferenceRequest(BaseModel):
+    # hygiene, mortality, feed, water, ventilation, temperature, humidity
+    rows: List[List[float]] = Field(..., max_length=INFERENCE_MAX_BATCH)
 
 class IncidentCreate(BaseModel):
     barn_id: int
@@ -57,6 +116,22 @@ class IncidentCreate(BaseModel):
     severity: str
     description: str
     actions_taken: Optional[str] = None
+    client_uuid: Optional[str] = Field(None, max_length=36)
+
+class BulkChecklistItem(ChecklistCreate):
+    client_uuid: str = Field(..., min_length=1, max_length=36)
+    recorded_at: Optional[datetime] = None  # when the checklist was filled in offline
+
+class BulkIncidentItem(IncidentCreate):
+    client_uuid: str = Field(..., min_length=1, max_length=36)
+    recorded_at: Optional[datetime] = None
+
+class BulkSyncRequest(BaseModel):
+    # Items are validated one by one so a bad item doesn't reject the whole batch
+    checklists: List[dict] = []
+    incidents: List[dict] = []
+
+BULK_SYNC_MAX_ITEMS = 500
 
 # Helper functions
 def create_jwt_token(user_id: int, role: str) -> str:
@@ -81,6 +156,32 @@ def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(securit
     payload = verify_jwt_token(token)
     return payload
 
+def conditional_headers(db, key, tables, farm_ids=None):
+    """ETag and Last-Modified for a response built from the given tables and farms"""
+    versions, last_modified = get_table_versions(db, tables, farm_ids)
+    digest = hashlib.sha1(repr((key, versions)).encode("utf-8")).hexdigest()[:24]
+    headers = {"ETag": f'W/"{digest}"', "Cache-Control": "private, no-cache"}
+    if last_modified:
+        headers["Last-Modified"] = format_datetime(last_modified.replace(tzinfo=timezone.utc), usegmt=True)
+    return headers
+
+def list_response(rows: list, format: str):
+    """Rows as a list of objects, or as a column header plus value arrays for format=columns"""
+    if format not in LIST_FORMATS:
+        raise HTTPException(status_code=400, detail="Unsupported list format")
+    if format == "objects":
+        return rows
+    columns = list(rows[0]) if rows else []
+    return {"columns": columns, "rows": [[row[column] for column in columns] for row in rows]}
+
+def is_not_modified(if_none_match: Optional[str], headers: dict) -> bool:
+    """Whether If-None-Match matches the current ETag (weak comparison)"""
+    if not if_none_match:
+        return False
+    etag = headers["ETag"].removeprefix("W/")
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
 def verify_password(password: str, hashed: str) -> bool:
     return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
 
@@ -123,42 +224,65 @@ def get_profile(current_user: dict = Depends(get_current_user)):
         db.close()
 
 @app.get("/api/farms")
-def get_farms(current_user: dict = Depends(get_current_user)):
-    db = get_db()
+def get_farms(response: Response, if_none_match: Optional[str] = Header(None),
+              format: str = "objects", current_user: dict = Depends(get_current_user)):
+    db = get_read_db(current_user['user_id'])
     try:
         farm_ids = get_accessible_farm_ids(current_user['user_id'], current_user['role'], db)
+        headers = conditional_headers(db, ("farms", format, sorted(farm_ids)), ["farms"], farm_ids)
+        if is_not_modified(if_none_match, headers):
+            return Response(status_code=304, headers=headers)
+        response.headers.update(headers)
+        
         farms = db.query(Farm).filter(Farm.id.in_(farm_ids)).all()
-        return [{
+        return list_response([{
             "id": f.id,
             "name": f.name,
             "location": f.location,
             "description": f.description
-        } for f in farms]
+        } for f in farms], format)
     finally:
         db.close()
 
 @app.get("/api/farms/{farm_id}/barns")
-def get_barns(farm_id: int, current_user: dict = Depends(get_current_user)):
-    db = get_db()
+def get_barns(farm_id: int, response: Response, if_none_match: Optional[str] = Header(None),
+              format: str = "objects", current_user: dict = Depends(get_current_user)):
+    db = get_read_db(current_user['user_id'])
     try:
         farm_ids = get_accessible_farm_ids(current_user['user_id'], current_user['role'], db)
         if farm_id not in farm_ids:
             raise HTTPException(status_code=403, detail="Access denied")
         
+        headers = conditional_headers(db, ("barns", format, farm_id), ["barns"], [farm_id])
+        if is_not_modified(if_none_match, headers):
+            return Response(status_code=304, headers=headers)
+        response.headers.update(headers)
+        
         barns = db.query(Barn).filter(Barn.farm_id == farm_id).all()
-        return [{
+        return list_response([{
             "id": b.id,
             "name": b.name,
             "capacity": b.capacity,
-            "risk_level": b.risk_level
-        } for b in barns]
+            "risk_level": b.risk_level,
+            "risk_snapshot": b.risk_snapshot
+        } for b in barns], format)
     finally:
         db.close()
 
+def _stored_submission_id(db, model, client_uuid, user_id):
+    """Id of the user's checklist or incident already stored under client_uuid, if any"""
+    return db.query(model.id).filter(model.client_uuid == client_uuid, model.user_id == user_id).scalar()
+
 @app.post("/api/checklists")
 def create_checklist(data: ChecklistCreate, current_user: dict = Depends(get_current_user)):
     db = get_db()
     try:
+        # A retried submission returns the checklist already stored
+        if data.client_uuid:
+            existing_id = _stored_submission_id(db, Checklist, data.client_uuid, current_user['user_id'])
+            if existing_id is not None:
+                return {"id": existing_id, "message": "Checklist already received"}
+        
         # Create checklist
         checklist = Checklist(
             barn_id=data.barn_id,
@@ -173,20 +297,37 @@ def create_checklist(data: ChecklistCreate, current_user: dict = Depends(get_cur
             notes=data.notes,
             gps_lat=data.gps_lat,
             gps_lng=data.gps_lng,
-            submitted_at=datetime.utcnow()
+            submitted_at=datetime.utcnow(),
+            client_uuid=data.client_uuid
         )
+        
+        # Compare with the barn's rolling baseline so managers review outliers first
+        try:
+            score_checklist(checklist, db)
+        except Exception as e:
+            logger.warning("Failed to score checklist anomalies: %s", e)
+        
         db.add(checklist)
-        db.commit()
+        try:
+            db.commit()
+        except IntegrityError:
+            # A concurrent retry stored the same client_uuid between the lookup and this insert
+            db.rollback()
+            if not data.client_uuid:
+                raise
+            existing_id = _stored_submission_id(db, Checklist, data.client_uuid, current_user['user_id'])
+            if existing_id is None:
+                raise HTTPException(status_code=409, detail="client_uuid already used by another submission")
+            return {"id": existing_id, "message": "Checklist already received"}
+        mark_user_write(current_user['user_id'])
         db.refresh(checklist)
         
         # Get user and barn info for notification
         user = db.query(User).filter(User.id == current_user['user_id']).first()
         barn = db.query(Barn).filter(Barn.id == data.barn_id).first()
         
-        print(f"\n[NOTIFICATION DEBUG] Creating notifications for checklist:")
-        print(f"  - Checklist ID: {checklist.id}")
-        print(f"  - Reporter: {user.name} (ID: {user.id})")
-        print(f"  - Barn: {barn.name}")
+        logger.debug("Creating notifications for checklist %s from %s (user %s) at %s",
+                     checklist.id, user.name, user.id, barn.name)
         
         # Create notifications for managers and admins
         notification_users = db.query(User).filter(
@@ -194,10 +335,9 @@ def create_checklist(data: ChecklistCreate, current_user: dict = Depends(get_cur
             User.is_active == True
         ).all()
         
-        print(f"  - Found {len(notification_users)} users to notify")
+        logger.debug("Notifying %d users about checklist %s", len(notification_users), checklist.id)
         
         for notif_user in notification_users:
-            print(f"  - Creating notification for {notif_user.name} (Role: {notif_user.role})")
             alert = Alert(
                 type="checklist_submitted",
                 message=f"New checklist submitted by {user.name} for {barn.name} - ⏳ PENDING REVIEW",
@@ -210,19 +350,49 @@ def create_checklist(data: ChecklistCreate, current_user: dict = Depends(get_cur
             db.add(alert)
         
         db.commit()
-        print(f"  ✓ All notifications committed to database\n")
-        return {"id": checklist.id, "message": "Checklist created successfully"}
+        
+        # Fold the committed checklist into its barn's anomaly baseline
+        try:
+            update_baselines(checklist, db)
+        except Exception as e:
+            db.rollback()
+            logger.warning("Failed to update anomaly baseline: %s", e)
+        
+        # Update the drift monitor's running feature statistics
+        try:
+            record_checklist(checklist, db, farm_id=barn.farm_id)
+        except Exception as e:
+            db.rollback()
+            logger.warning("Failed to update drift statistics: %s", e)
+        
+        # Risk preview for the worker; the barn itself only changes after approval
+        predicted_risk = None
+        try:
+            _, snapshot = score_checklists([checklist])[0]
+            predicted_risk = {
+                "risk_level": snapshot["risk_level"],
+                "probabilities": snapshot["probabilities"]
+            }
+        except Exception as e:
+            logger.warning("Failed to score checklist %s: %s", checklist.id, e)
+        
+        return {
+            "id": checklist.id,
+            "message": "Checklist created successfully",
+            "predicted_risk": predicted_risk,
+            "anomaly_flags": checklist.anomaly_flags or []
+        }
     finally:
         db.close()
 
 @app.get("/api/checklists")
-def get_checklists(current_user: dict = Depends(get_current_user)):
-    db = get_db()
+def get_checklists(format: str = "objects", current_user: dict = Depends(get_current_user)):
+    db = get_read_db(current_user['user_id'])
     try:
         farm_ids = get_accessible_farm_ids(current_user['user_id'], current_user['role'], db)
         checklists = db.query(Checklist).join(Barn).filter(Barn.farm_id.in_(farm_ids)).order_by(Checklist.submitted_at.desc()).limit(50).all()
         
-        return [{
+        return list_response([{
             "id": c.id,
             "barn_name": c.barn.name,
             "hygiene_score": c.hygiene_score,
@@ -231,7 +401,7 @@ def get_checklists(current_user: dict = Depends(get_current_user)):
             "humidity": c.humidity,
             "submitted_at": c.submitted_at.isoformat(),
             "approved": c.approved
-        } for c in checklists]
+        } for c in checklists], format)
     finally:
         db.close()
 
@@ -239,6 +409,12 @@ def get_checklists(current_user: dict = Depends(get_current_user)):
 def create_incident(data: IncidentCreate, current_user: dict = Depends(get_current_user)):
     db = get_db()
     try:
+        # A retried submission returns the incident already stored
+        if data.client_uuid:
+            existing_id = _stored_submission_id(db, Incident, data.client_uuid, current_user['user_id'])
+            if existing_id is not None:
+                return {"id": existing_id, "message": "Incident already received"}
+        
         # Create incident
         incident = Incident(
             barn_id=data.barn_id,
@@ -247,22 +423,30 @@ def create_incident(data: IncidentCreate, current_user: dict = Depends(get_curre
             severity=data.severity,
             description=data.description,
             actions_taken=data.actions_taken,
-            reported_at=datetime.utcnow()
+            reported_at=datetime.utcnow(),
+            client_uuid=data.client_uuid
         )
         db.add(incident)
-        db.commit()
+        try:
+            db.commit()
+        except IntegrityError:
+            # A concurrent retry stored the same client_uuid between the lookup and this insert
+            db.rollback()
+            if not data.client_uuid:
+                raise
+            existing_id = _stored_submission_id(db, Incident, data.client_uuid, current_user['user_id'])
+            if existing_id is None:
+                raise HTTPException(status_code=409, detail="client_uuid already used by another submission")
+            return {"id": existing_id, "message": "Incident already received"}
+        mark_user_write(current_user['user_id'])
         db.refresh(incident)
         
         # Get user and barn info for notification
         user = db.query(User).filter(User.id == current_user['user_id']).first()
         barn = db.query(Barn).filter(Barn.id == data.barn_id).first()
         
-        print(f"\n[NOTIFICATION DEBUG] Creating notifications for incident:")
-        print(f"  - Incident ID: {incident.id}")
-        print(f"  - Reporter: {user.name} (ID: {user.id})")
-        print(f"  - Barn: {barn.name}")
-        print(f"  - Severity: {data.severity}")
-        print(f"  - Type: {data.incident_type}")
+        logger.debug("Creating notifications for %s %s incident %s from %s (user %s) at %s",
+                     data.severity, data.incident_type, incident.id, user.name, user.id, barn.name)
         
         # Determine notification severity based on incident severity
         alert_severity = data.severity  # high, medium, or low
@@ -272,17 +456,15 @@ def create_incident(data: IncidentCreate, current_user: dict = Depends(get_curre
         if data.severity == 'high' or data.incident_type == 'disease':
             notification_roles.append('vet')  # Notify vets for high severity or disease
         
-        print(f"  - Notifying roles: {notification_roles}")
-        
         notification_users = db.query(User).filter(
             User.role.in_(notification_roles),
             User.is_active == True
         ).all()
         
-        print(f"  - Found {len(notification_users)} users to notify")
+        logger.debug("Notifying %d users with roles %s about incident %s",
+                     len(notification_users), notification_roles, incident.id)
         
         for notif_user in notification_users:
-            print(f"  - Creating notification for {notif_user.name} (Role: {notif_user.role}, ID: {notif_user.id})")
             alert = Alert(
                 type="incident_reported",
                 message=f"🚨 {data.severity.upper()} incident reported by {user.name} at {barn.name}: {data.incident_type} - ⚠️ PENDING APPROVAL",
@@ -293,22 +475,20 @@ def create_incident(data: IncidentCreate, current_user: dict = Depends(get_curre
                 created_at=datetime.utcnow()
             )
             db.add(alert)
-            print(f"    ✓ Alert added to session")
         
         db.commit()
-        print(f"  ✓ All notifications committed to database\n")
         return {"id": incident.id, "message": "Incident reported successfully"}
     finally:
         db.close()
 
 @app.get("/api/incidents")
-def get_incidents(current_user: dict = Depends(get_current_user)):
-    db = get_db()
+def get_incidents(format: str = "objects", current_user: dict = Depends(get_current_user)):
+    db = get_read_db(current_user['user_id'])
     try:
         farm_ids = get_accessible_farm_ids(current_user['user_id'], current_user['role'], db)
         incidents = db.query(Incident).join(Barn).filter(Barn.farm_id.in_(farm_ids)).order_by(Incident.reported_at.desc()).limit(50).all()
         
-        return [{
+        return list_response([{
             "id": i.id,
             "barn_name": i.barn.name,
             "incident_type": i.incident_type,
@@ -317,15 +497,22 @@ def get_incidents(current_user: dict = Depends(get_current_user)):
             "resolved": i.resolved,
             "reported_at": i.reported_at.isoformat(),
             "approved": i.approved
-        } for i in incidents]
+        } for i in incidents], format)
     finally:
         db.close()
 
 @app.get("/api/dashboard/stats")
-def get_dashboard_stats(current_user: dict = Depends(get_current_user)):
-    db = get_db()
+def get_dashboard_stats(response: Response, if_none_match: Optional[str] = Header(None),
+                        current_user: dict = Depends(get_current_user)):
+    db = get_read_db(current_user['user_id'])
     try:
         farm_ids = get_accessible_farm_ids(current_user['user_id'], current_user['role'], db)
+        headers = conditional_headers(
+            db, ("dashboard_stats", sorted(farm_ids)), ["barns", "checklists", "incidents"], farm_ids
+        )
+        if is_not_modified(if_none_match, headers):
+            return Response(status_code=304, headers=headers)
+        response.headers.update(headers)
         
         total_barns = db.query(Barn).filter(Barn.farm_id.in_(farm_ids)).count()
         total_checklists = db.query(Checklist).join(Barn).filter(Barn.farm_id.in_(farm_ids)).count()
@@ -343,18 +530,18 @@ def get_dashboard_stats(current_user: dict = Depends(get_current_user)):
         db.close()
 
 @app.get("/api/alerts")
-def get_alerts(current_user: dict = Depends(get_current_user)):
-    db = get_db()
+def get_alerts(format: str = "objects", current_user: dict = Depends(get_current_user)):
+    db = get_read_db(current_user['user_id'])
     try:
         alerts = db.query(Alert).filter(Alert.user_id == current_user['user_id'], Alert.read == False).order_by(Alert.created_at.desc()).all()
         
-        return [{
+        return list_response([{
             "id": a.id,
             "type": a.type,
             "message": a.message,
             "severity": a.severity,
             "created_at": a.created_at.isoformat()
-        } for a in alerts]
+        } for a in alerts], format)
     finally:
         db.close()
 
@@ -372,6 +559,7 @@ def mark_alert_read(alert_id: int, current_user: dict = Depends(get_current_user
         
         alert.read = True
         db.commit()
+        mark_user_write(current_user['user_id'])
         return {"message": "Alert marked as read"}
     finally:
         db.close()
@@ -385,46 +573,51 @@ def mark_all_alerts_read(current_user: dict = Depends(get_current_user)):
             Alert.read == False
         ).update({"read": True})
         db.commit()
+        mark_user_write(current_user['user_id'])
         return {"message": "All alerts marked as read"}
     finally:
         db.close()
 
 @app.get("/api/notifications/recent")
-def get_recent_notifications(limit: int = 20, current_user: dict = Depends(get_current_user)):
+def get_recent_notifications(limit: int = 20, format: str = "objects", current_user: dict = Depends(get_current_user)):
     """Get recent notifications (both read and unread)"""
-    db = get_db()
+    db = get_read_db(current_user['user_id'])
     try:
         notifications = db.query(Alert).filter(
             Alert.user_id == current_user['user_id']
         ).order_by(Alert.created_at.desc()).limit(limit).all()
         
-        return [{
+        return list_response([{
             "id": n.id,
             "type": n.type,
             "message": n.message,
             "severity": n.severity,
             "read": n.read,
             "created_at": n.created_at.isoformat()
-        } for n in notifications]
+        } for n in notifications], format)
     finally:
         db.close()
 
 # ===== MANAGER APPROVAL ENDPOINTS =====
 @app.get("/api/manager/pending-checklists")
-def get_pending_checklists(current_user: dict = Depends(get_current_user)):
+def get_pending_checklists(format: str = "objects", current_user: dict = Depends(get_current_user)):
     """Get pending checklists for manager approval"""
     if current_user['role'] not in ['manager', 'admin']:
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    db = get_db()
+    db = get_read_db(current_user['user_id'])
     try:
         farm_ids = get_accessible_farm_ids(current_user['user_id'], current_user['role'], db)
+        # Most anomalous first, then newest
         pending = db.query(Checklist).join(Barn).filter(
             Barn.farm_id.in_(farm_ids),
             Checklist.approved == False
-        ).order_by(Checklist.submitted_at.desc()).all()
+        ).order_by(
+            func.coalesce(Checklist.anomaly_score, 0).desc(),
+            Checklist.submitted_at.desc()
+        ).all()
         
-        return [{
+        return list_response([{
             "id": c.id,
             "barn_name": c.barn.name,
             "user_name": c.user.name,
@@ -436,18 +629,20 @@ def get_pending_checklists(current_user: dict = Depends(get_current_user)):
             "temperature": c.temperature,
             "humidity": c.humidity,
             "notes": c.notes,
+            "anomaly_score": c.anomaly_score,
+            "anomaly_flags": c.anomaly_flags or [],
             "submitted_at": c.submitted_at.isoformat()
-        } for c in pending]
+        } for c in pending], format)
     finally:
         db.close()
 
 @app.get("/api/manager/pending-incidents")
-def get_pending_incidents(current_user: dict = Depends(get_current_user)):
+def get_pending_incidents(format: str = "objects", current_user: dict = Depends(get_current_user)):
     """Get pending incidents for manager approval"""
     if current_user['role'] not in ['manager', 'admin']:
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    db = get_db()
+    db = get_read_db(current_user['user_id'])
     try:
         farm_ids = get_accessible_farm_ids(current_user['user_id'], current_user['role'], db)
         pending = db.query(Incident).join(Barn).filter(
@@ -455,7 +650,7 @@ def get_pending_incidents(current_user: dict = Depends(get_current_user)):
             Incident.approved == False
         ).order_by(Incident.reported_at.desc()).all()
         
-        return [{
+        return list_response([{
             "id": i.id,
             "barn_name": i.barn.name,
             "user_name": i.user.name,
@@ -465,7 +660,7 @@ def get_pending_incidents(current_user: dict = Depends(get_current_user)):
             "actions_taken": i.actions_taken,
             "resolved": i.resolved,
             "reported_at": i.reported_at.isoformat()
-        } for i in pending]
+        } for i in pending], format)
     finally:
         db.close()
 
@@ -476,7 +671,7 @@ def get_all_users(current_user: dict = Depends(get_current_user)):
     if current_user['role'] != 'admin':
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    db = get_db()
+    db = get_read_db(current_user['user_id'])
     try:
         users = db.query(User).all()
         return [{
@@ -496,7 +691,7 @@ def get_all_farms(current_user: dict = Depends(get_current_user)):
     if current_user['role'] != 'admin':
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    db = get_db()
+    db = get_read_db(current_user['user_id'])
     try:
         farms = db.query(Farm).all()
         return [{
@@ -515,7 +710,7 @@ def get_farm_assignments(current_user: dict = Depends(get_current_user)):
     if current_user['role'] != 'admin':
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    db = get_db()
+    db = get_read_db(current_user['user_id'])
     try:
         users = db.query(User).filter(User.role != 'admin').all()
         assignments = []
@@ -532,23 +727,31 @@ def get_farm_assignments(current_user: dict = Depends(get_current_user)):
         db.close()
 
 @app.get("/api/admin/barns")
-def get_all_barns(current_user: dict = Depends(get_current_user)):
+def get_all_barns(response: Response, if_none_match: Optional[str] = Header(None),
+                  format: str = "objects", current_user: dict = Depends(get_current_user)):
     """Get all barns (admin only)"""
     if current_user['role'] != 'admin':
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    db = get_db()
+    db = get_read_db(current_user['user_id'])
     try:
+        # Farm versions are included because each barn carries its farm's name
+        headers = conditional_headers(db, ("admin_barns", format), ["barns", "farms"])
+        if is_not_modified(if_none_match, headers):
+            return Response(status_code=304, headers=headers)
+        response.headers.update(headers)
+        
         barns = db.query(Barn).all()
-        return [{
+        return list_response([{
             "id": b.id,
             "name": b.name,
             "farm_id": b.farm_id,
             "farm_name": b.farm.name if b.farm else "Unknown",
             "capacity": b.capacity,
             "risk_level": b.risk_level,
+            "risk_snapshot": b.risk_snapshot,
             "position": f"({b.position_x}, {b.position_y}, {b.position_z})"
-        } for b in barns]
+        } for b in barns], format)
     finally:
         db.close()
 
@@ -558,7 +761,7 @@ def get_system_stats(current_user: dict = Depends(get_current_user)):
     if current_user['role'] != 'admin':
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    db = get_db()
+    db = get_read_db(current_user['user_id'])
     try:
         return {
             "total_users": db.query(User).count(),
@@ -595,6 +798,10 @@ def approve_checklist(checklist_id: int, current_user: dict = Depends(get_curren
         worker = db.query(User).filter(User.id == checklist.user_id).first()
         barn = db.query(Barn).filter(Barn.id == checklist.barn_id).first()
         
+        # Queue the barn for the background risk recompute
+        if barn:
+            mark_barns_dirty([barn.id], db)
+        
         # Notify the worker
         if worker:
             alert = Alert(
@@ -609,6 +816,10 @@ def approve_checklist(checklist_id: int, current_user: dict = Depends(get_curren
             db.add(alert)
         
         db.commit()
+        mark_user_write(current_user['user_id'])
+        if barn:
+            bump_data_version(barn.farm_id, db)
+        get_risk_scheduler().wake()
         return {"message": "Checklist approved successfully"}
     finally:
         db.close()
@@ -650,10 +861,432 @@ def approve_incident(incident_id: int, current_user: dict = Depends(get_current_
             db.add(alert)
         
         db.commit()
+        mark_user_write(current_user['user_id'])
+        if barn:
+            bump_data_version(barn.farm_id, db)
         return {"message": "Incident approved successfully"}
     finally:
         db.close()
 
+# ===== SYNC ENDPOINTS =====
+
+def _sync_timestamp(recorded_at, now):
+    """Client capture time in naive UTC, never later than the server clock"""
+    if recorded_at is None:
+        return now
+    if recorded_at.tzinfo is not None:
+        recorded_at = recorded_at.astimezone(timezone.utc).replace(tzinfo=None)
+    return min(recorded_at, now)
+
+def _parse_sync_items(kind, raw_items, item_model, results):
+    """Validate raw items; invalid and repeated ones go straight to results"""
+    items = []
+    seen = set()
+    for index, raw in enumerate(raw_items):
+        client_uuid = raw.get("client_uuid") if isinstance(raw, dict) else None
+        try:
+            item = item_model(**raw)
+        except (ValidationError, TypeError) as e:
+            results.append({"kind": kind, "index": index, "client_uuid": client_uuid,
+                            "status": "invalid", "error": str(e)})
+            continue
+        if item.client_uuid in seen:
+            results.append({"kind": kind, "index": index, "client_uuid": item.client_uuid,
+                            "status": "duplicate", "id": None})
+            continue
+        seen.add(item.client_uuid)
+        items.append((index, item))
+    return items
+
+def _summarize_barns(names, limit=3):
+    names = sorted(set(names))
+    summary = ", ".join(names[:limit])
+    if len(names) > limit:
+        summary += f" and {len(names) - limit} more"
+    return summary
+
+def _add_sync_notifications(db, user, checklists, incidents, barns):
+    """One summary alert per recipient for a whole sync batch instead of one per item"""
+    now = datetime.utcnow()
+    
+    if checklists:
+        flagged = sum(1 for checklist in checklists if checklist.anomaly_flags)
+        barn_ids = {checklist.barn_id for checklist in checklists}
+        message = (
+            f"📥 {user.name} synced {len(checklists)} checklist(s) for "
+            f"{_summarize_barns(barns[barn_id].name for barn_id in barn_ids)} - ⏳ PENDING REVIEW"
+        )
+        if flagged:
+            message += f" ({flagged} with unusual values)"
+        recipients = db.query(User).filter(User.role.in_(['admin', 'manager']), User.is_active == True).all()
+        db.add_all([Alert(
+            type="checklist_submitted",
+            message=message,
+            severity="medium" if flagged else "low",
+            barn_id=next(iter(barn_ids)) if len(barn_ids) == 1 else None,
+            user_id=recipient.id,
+            read=False,
+            created_at=now
+        ) for recipient in recipients])
+    
+    if incidents:
+        high = sum(1 for incident in incidents if incident.severity == 'high')
+        severities = {incident.severity for incident in incidents}
+        severity = next((s for s in ['high', 'medium', 'low'] if s in severities), 'medium')
+        roles = ['admin', 'manager']
+        if high or any(incident.incident_type == 'disease' for incident in incidents):
+            roles.append('vet')
+        barn_ids = {incident.barn_id for incident in incidents}
+        message = (
+            f"🚨 {len(incidents)} incident(s) synced by {user.name} at "
+            f"{_summarize_barns(barns[barn_id].name for barn_id in barn_ids)}"
+            f"{f' ({high} high severity)' if high else ''} - ⚠️ PENDING APPROVAL"
+        )
+        recipients = db.query(User).filter(User.role.in_(roles), User.is_active == True).all()
+        db.add_all([Alert(
+            type="incident_reported",
+            message=message,
+            severity=severity,
+            barn_id=next(iter(barn_ids)) if len(barn_ids) == 1 else None,
+            user_id=recipient.id,
+            read=False,
+            created_at=now
+        ) for recipient in recipients])
+
+@app.post("/api/sync/bulk")
+def bulk_sync(data: BulkSyncRequest, current_user: dict = Depends(get_current_user)):
+    """Store checklists and incidents queued offline in one transaction; returns a status per item"""
+    if len(data.checklists) + len(data.incidents) > BULK_SYNC_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {BULK_SYNC_MAX_ITEMS} items per sync")
+    
+    results = []
+    checklist_items = _parse_sync_items("checklist", data.checklists, BulkChecklistItem, results)
+    incident_items = _parse_sync_items("incident", data.incidents, BulkIncidentItem, results)
+    
+    db = get_db()
+    try:
+        user = db.query(User).filter(User.id == current_user['user_id']).first()
+        farm_ids = get_accessible_farm_ids(current_user['user_id'], current_user['role'], db)
+        barn_ids = {item.barn_id for _, item in checklist_items + incident_items}
+        barns = {
+            barn.id: barn for barn in db.query(Barn).filter(
+                Barn.id.in_(barn_ids), Barn.farm_id.in_(farm_ids)
+            ).all()
+        } if barn_ids and farm_ids else {}
+        
+        # Items stored by an earlier, interrupted sync are reported, not inserted again;
+        # client_uuid is unique across users, so keys of other users' submissions are rejected
+        existing_checklists = {
+            client_uuid: (checklist_id, user_id) for client_uuid, checklist_id, user_id in db.query(
+                Checklist.client_uuid, Checklist.id, Checklist.user_id
+            ).filter(Checklist.client_uuid.in_([item.client_uuid for _, item in checklist_items])).all()
+        } if checklist_items else {}
+        existing_incidents = {
+            client_uuid: (incident_id, user_id) for client_uuid, incident_id, user_id in db.query(
+                Incident.client_uuid, Incident.id, Incident.user_id
+            ).filter(Incident.client_uuid.in_([item.client_uuid for _, item in incident_items])).all()
+        } if incident_items else {}
+        
+        def accept(kind, items, existing):
+            accepted = []
+            for index, item in items:
+                result = {"kind": kind, "index": index, "client_uuid": item.client_uuid}
+                stored_id, owner_id = existing.get(item.client_uuid, (None, None))
+                if stored_id is not None and owner_id == current_user['user_id']:
+                    results.append({**result, "status": "duplicate", "id": stored_id})
+                elif stored_id is not None:
+                    results.append({**result, "status": "rejected",
+                                    "error": "client_uuid already used by another submission"})
+                elif item.barn_id not in barns:
+                    results.append({**result, "status": "rejected", "error": "Barn not found or not accessible"})
+                else:
+                    accepted.append((index, item))
+            return accepted
+        
+        checklist_items = accept("checklist", checklist_items, existing_checklists)
+        incident_items = accept("incident", incident_items, existing_incidents)
+        
+        now = datetime.utcnow()
+        created_checklists = []
+        # Oldest first so each barn's anomaly baseline evolves in capture order
+        for index, item in sorted(checklist_items, key=lambda entry: _sync_timestamp(entry[1].recorded_at, now)):
+            checklist = Checklist(
+                barn_id=item.barn_id,
+                user_id=current_user['user_id'],
+                hygiene_score=item.hygiene_score,
+                mortality_count=item.mortality_count,
+                feed_quality=item.feed_quality,
+                water_quality=item.water_quality,
+                ventilation_score=item.ventilation_score,
+                temperature=item.temperature,
+                humidity=item.humidity,
+                notes=item.notes,
+                gps_lat=item.gps_lat,
+                gps_lng=item.gps_lng,
+                submitted_at=_sync_timestamp(item.recorded_at, now),
+                client_uuid=item.client_uuid
+            )
+            try:
+                score_checklist(checklist, db)
+            except Exception as e:
+                logger.warning("Failed to score checklist anomalies: %s", e)
+            db.add(checklist)
+            db.flush()
+            created_checklists.append((index, checklist))
+        
+        created_incidents = []
+        for index, item in incident_items:
+            incident = Incident(
+                barn_id=item.barn_id,
+                user_id=current_user['user_id'],
+                incident_type=item.incident_type,
+                severity=item.severity,
+                description=item.description,
+                actions_taken=item.actions_taken,
+                reported_at=_sync_timestamp(item.recorded_at, now),
+                client_uuid=item.client_uuid
+            )
+            db.add(incident)
+            created_incidents.append((index, incident))
+        db.flush()
+        
+        created_results = [
+            {"kind": kind, "index": index, "client_uuid": obj.client_uuid, "status": "created", "id": obj.id}
+            for kind, created in (("checklist", created_checklists), ("incident", created_incidents))
+            for index, obj in created
+        ]
+        
+        _add_sync_notifications(
+            db, user,
+            [checklist for _, checklist in created_checklists],
+            [incident for _, incident in created_incidents],
+            barns
+        )
+        
+        try:
+            db.commit()
+        except IntegrityError:
+            # Another request stored some of these keys first; a retry reports them as duplicates
+            db.rollback()
+            raise HTTPException(status_code=409, detail="Sync conflict, please retry")
+        mark_user_write(current_user['user_id'])
+        
+        results.extend(created_results)
+        
+        # Fold the committed checklists into their barns' anomaly baselines in one commit
+        try:
+            for _, checklist in created_checklists:
+                update_baselines(checklist, db, commit=False)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.warning("Failed to update anomaly baselines: %s", e)
+        
+        # Update the drift monitor's running feature statistics in one commit
+        try:
+            for _, checklist in created_checklists:
+                record_checklist(checklist, db, farm_id=barns[checklist.barn_id].farm_id, commit=False)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.warning("Failed to update drift statistics: %s", e)
+        
+        results.sort(key=lambda result: (result["kind"] != "checklist", result["index"]))
+        return {
+            "results": results,
+            "created": sum(1 for result in results if result["status"] == "created"),
+            "duplicates": sum(1 for result in results if result["status"] == "duplicate"),
+            "failed": sum(1 for result in results if result["status"] in ("invalid", "rejected"))
+        }
+    finally:
+        db.close()
+
+CHANGE_FEED_MAX_LIMIT = 5000
+
+# Serializers for the change feed; full rows so clients can upsert them locally
+SYNC_SERIALIZERS = {
+    "farms": (Farm, lambda f: {
+        "id": f.id,
+        "name": f.name,
+        "location": f.location,
+        "description": f.description
+    }),
+    "barns": (Barn, lambda b: {
+        "id": b.id,
+        "farm_id": b.farm_id,
+        "name": b.name,
+        "capacity": b.capacity,
+        "risk_level": b.risk_level,
+        "risk_snapshot": b.risk_snapshot,
+        "last_updated": b.last_updated.isoformat() if b.last_updated else None
+    }),
+    "checklists": (Checklist, lambda c: {
+        "id": c.id,
+        "barn_id": c.barn_id,
+        "client_uuid": c.client_uuid,
+        "hygiene_score": c.hygiene_score,
+        "mortality_count": c.mortality_count,
+        "feed_quality": c.feed_quality,
+        "water_quality": c.water_quality,
+        "ventilation_score": c.ventilation_score,
+        "temperature": c.temperature,
+        "humidity": c.humidity,
+        "notes": c.notes,
+        "submitted_at": c.submitted_at.isoformat() if c.submitted_at else None,
+        "approved": c.approved
+    }),
+    "incidents": (Incident, lambda i: {
+        "id": i.id,
+        "barn_id": i.barn_id,
+        "client_uuid": i.client_uuid,
+        "incident_type": i.incident_type,
+        "severity": i.severity,
+        "description": i.description,
+        "actions_taken": i.actions_taken,
+        "resolved": i.resolved,
+        "reported_at": i.reported_at.isoformat() if i.reported_at else None,
+        "approved": i.approved
+    }),
+    "alerts": (Alert, lambda a: {
+        "id": a.id,
+        "type": a.type,
+        "message": a.message,
+        "severity": a.severity,
+        "barn_id": a.barn_id,
+        "read": a.read,
+        "created_at": a.created_at.isoformat() if a.created_at else None
+    }),
+}
+
+@app.get("/api/sync/changes")
+def get_sync_changes(since: int = 0, limit: int = 1000, current_user: dict = Depends(get_current_user)):
+    """Rows changed or deleted since a version; pass the returned version back as since"""
+    if since < 0 or limit < 1:
+        raise HTTPException(status_code=400, detail="since must be >= 0 and limit >= 1")
+    limit = min(limit, CHANGE_FEED_MAX_LIMIT)
+    
+    db = get_read_db(current_user['user_id'])
+    try:
+        farm_ids = get_accessible_farm_ids(current_user['user_id'], current_user['role'], db)
+        entries, version, has_more = get_changes(db, since, limit, farm_ids, current_user['user_id'])
+        
+        upserted = {table: [] for table in SYNC_SERIALIZERS}
+        deleted = {table: [] for table in SYNC_SERIALIZERS}
+        for table_name, row_id, operation, _ in entries:
+            if table_name in SYNC_SERIALIZERS:
+                (deleted if operation == "delete" else upserted)[table_name].append(row_id)
+        
+        changes = {}
+        for table_name, (model, serialize) in SYNC_SERIALIZERS.items():
+            ids = upserted[table_name]
+            rows = db.query(model).filter(model.id.in_(ids)).all() if ids else []
+            changes[table_name] = [serialize(row) for row in rows]
+            # Rows deleted after their last logged change are reported as deleted
+            found = {row.id for row in rows}
+            deleted[table_name].extend(row_id for row_id in ids if row_id not in found)
+        
+        return {
+            "version": version,
+            "has_more": has_more,
+            "changes": changes,
+            "deleted": deleted
+        }
+    finally:
+        db.close()
+
+# ===== INFERENCE ENDPOINTS =====
+
+LOCAL_CLIENT_HOSTS = {"127.0.0.1", "::1", "localhost"}
+
+def is_local_client(request: Request) -> bool:
+    return request.client is not None and request.client.host in LOCAL_CLIENT_HOSTS
+
+@app.post("/api/inference/score")
+def score_risk(data: InferenceRequest, request: Request, x_inference_token: Optional[str] = Header(None)):
+    """Score feature rows with the shared model; concurrent requests are micro-batched
+    
+    Without FARMTWIN_INFERENCE_TOKEN only local clients may call it, as for /metrics.
+    """
+    if INFERENCE_TOKEN:
+        if x_inference_token != INFERENCE_TOKEN:
+            raise HTTPException(status_code=403, detail="Invalid inference token")
+    elif not is_local_client(request):
+        raise HTTPException(status_code=403, detail="Set FARMTWIN_INFERENCE_TOKEN to score from other hosts")
+    
+    try:
+        rows = validate_feature_rows(data.rows)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    
+    with measure_inference("service"):
+        results = get_local_batcher().score(rows)
+    return {"results": [snapshot for _, snapshot in results]}
+
+# ===== METRICS =====
+
+METRICS_PUBLIC = os.getenv("FARMTWIN_METRICS_PUBLIC", "0") == "1"
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics(request: Request):
+    """Request, SQL and inference timings in the Prometheus text format (local clients only by default)"""
+    if not METRICS_PUBLIC and not is_local_client(request):
+        raise HTTPException(status_code=403, detail="Metrics are only served to local clients")
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+# ===== EXPORT ENDPOINTS =====
+@app.get("/api/export/{kind}")
+def export_data(
+    kind: str,
+    format: str = "csv",
+    farm_id: Optional[int] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Stream checklists, incidents, alerts or visitors as CSV or Parquet"""
+    if current_user['role'] not in ['admin', 'manager', 'auditor']:
+        raise HTTPException(status_code=403, detail="Not authorized")
+    if kind not in EXPORT_SOURCES:
+        raise HTTPException(status_code=404, detail="Unknown export type")
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail="Unsupported export format")
+    
+    db = get_read_db(current_user['user_id'])
+    try:
+        farm_ids = get_accessible_farm_ids(current_user['user_id'], current_user['role'], db)
+    finally:
+        db.close()
+    
+    # Admins and auditors also get rows tied to no farm, unless they pick one
+    include_unscoped = can_access_all_farms(current_user['role']) and farm_id is None
+    if farm_id is not None:
+        if farm_id not in farm_ids:
+            raise HTTPException(status_code=403, detail="Access denied")
+        farm_ids = [farm_id]
+    
+    filename = get_export_filename(kind, start_date, end_date, format)
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    
+    if format == "csv":
+        return StreamingResponse(
+            stream_csv(kind, farm_ids, start_date, end_date, include_unscoped=include_unscoped),
+            media_type=get_export_mime_type(format),
+            headers=headers
+        )
+    
+    try:
+        path = write_export_file(kind, farm_ids, start_date, end_date, format,
+                                 include_unscoped=include_unscoped)
+    except RuntimeError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    
+    return FileResponse(
+        path,
+        media_type=get_export_mime_type(format),
+        filename=filename,
+        background=BackgroundTask(os.remove, path)
+    )
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -46,6 +46,7 @@ class Barn(Base):
     position_y = Column(Float, default=0)
     position_z = Column(Float, default=0)
     risk_level = Column(String(10), default="low")  # high, medium, low
+    risk_snapshot = Column(JSON, nullable=True)  # probabilities, model version, checklist id, contributions
     last_updated = Column(DateTime, default=datetime.utcnow)
     
     farm = relationship("Farm")
@@ -68,12 +69,17 @@ class Checklist(Base):
     gps_lng = Column(Float)
     photo_path = Column(String(500))
     submitted_at = Column(DateTime, default=datetime.utcnow)
+    client_uuid = Column(String(36), unique=True, index=True, nullable=True)  # idempotency key from mobile sync
     
     # Manager approval workflow
     approved = Column(Boolean, default=False)
     approved_by = Column(Integer, ForeignKey("users.id"), nullable=True)
     approved_at = Column(DateTime, nullable=True)
     
+    # Ingest-time anomaly check against the barn's rolling baseline
+    anomaly_score = Column(Float, nullable=True)  # largest per-feature z-score
+    anomaly_flags = Column(JSON, nullable=True)  # [{feature, value, expected, score, reason}]
+    
     barn = relationship("Barn")
     user = relationship("User", foreign_keys=[user_id])
     approved_by_user = relationship("User", foreign_keys=[approved_by])
@@ -91,6 +97,7 @@ class Incident(Base):
     photo_path = Column(String(500))
     resolved = Column(Boolean, default=False)
     reported_at = Column(DateTime, default=datetime.utcnow)
+    client_uuid = Column(String(36), unique=True, index=True, nullable=True)  # idempotency key from mobile sync
     
     # Manager approval workflow
     approved = Column(Boolean, default=False)
@@ -131,3 +138,83 @@ class Alert(Base):
     
     barn = relationship("Barn")
     user = relationship("User")
+
+class FarmDataVersion(Base):
+    __tablename__ = "farm_data_versions"
+    
+    farm_id = Column(Integer, ForeignKey("farms.id"), primary_key=True)
+    version = Column(Integer, default=0, nullable=False)  # bumped on approvals and risk updates
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+class DirtyBarn(Base):
+    __tablename__ = "dirty_barns"
+    
+    barn_id = Column(Integer, ForeignKey("barns.id"), primary_key=True)
+    marked_at = Column(DateTime, default=datetime.utcnow, nullable=False)  # re-marking during a run keeps the barn queued
+
+class RiskRecomputeRun(Base):
+    __tablename__ = "risk_recompute_runs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    status = Column(String(20), default="running")  # running, completed, failed
+    barns_total = Column(Integer, default=0)
+    barns_done = Column(Integer, default=0)
+    barns_changed = Column(Integer, default=0)
+    error = Column(Text, nullable=True)
+    started_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+
+class FeatureBaseline(Base):
+    __tablename__ = "feature_baselines"
+    
+    feature = Column(String(50), primary_key=True)
+    model_version = Column(String(100))
+    count = Column(Integer, default=0)
+    mean = Column(Float, default=0.0)
+    std = Column(Float, default=0.0)
+    histogram = Column(JSON)  # share of training rows per drift bin
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class FeatureStat(Base):
+    __tablename__ = "feature_stats"
+    
+    farm_id = Column(Integer, ForeignKey("farms.id"), primary_key=True)
+    feature = Column(String(50), primary_key=True)
+    count = Column(Integer, default=0)
+    mean = Column(Float, default=0.0)
+    m2 = Column(Float, default=0.0)  # running sum of squared deviations (Welford)
+    histogram = Column(JSON)  # exponentially decayed counts per drift bin
+    missing = Column(Integer, default=0)
+    out_of_range = Column(Integer, default=0)
+    psi = Column(Float, nullable=True)
+    last_alert_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+class BarnFeatureBaseline(Base):
+    __tablename__ = "barn_feature_baselines"
+    
+    barn_id = Column(Integer, ForeignKey("barns.id"), primary_key=True)
+    feature = Column(String(50), primary_key=True)
+    count = Column(Integer, default=0)
+    mean = Column(Float, default=0.0)  # exponentially weighted
+    variance = Column(Float, default=0.0)  # exponentially weighted
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+class ChangeLog(Base):
+    __tablename__ = "change_log"
+    
+    id = Column(Integer, primary_key=True, index=True)  # doubles as the sync version
+    table_name = Column(String(50), nullable=False)
+    row_id = Column(Integer, nullable=False)
+    operation = Column(String(10), nullable=False)  # upsert, delete
+    farm_id = Column(Integer, nullable=True, index=True)  # no foreign keys so tombstones outlive their rows
+    user_id = Column(Integer, nullable=True, index=True)
+    changed_at = Column(DateTime, default=datetime.utcnow)
+
+class TableVersion(Base):
+    __tablename__ = "table_versions"
+    
+    table_name = Column(String(50), primary_key=True)
+    farm_id = Column(Integer, primary_key=True)  # 0 for rows without a farm
+    version = Column(Integer, default=0, nullable=False)  # bumped with every logged change
+    updated_at = Column(DateTime, default=datetime.utcnow)
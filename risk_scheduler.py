@@ -0,0 +1,247 @@
+"""
+Background recompute of barn risk.
+
+Approvals and the dashboard refresh buttons only mark barns dirty (the
+dirty_barns table). A worker recomputes dirty barns in batches every
+RISK_RECOMPUTE_INTERVAL seconds from each barn's latest approved checklist
+(scored through inference.score_checklists), stores the risk label and snapshot, raises a high-risk alert when a barn
+turns high, and records progress in risk_recompute_runs for the dashboards.
+
+The worker runs as a daemon thread inside the app (see get_risk_scheduler)
+or on its own with ``python risk_scheduler.py``. Several workers can run at
+once: recomputing a barn twice is harmless, and a barn re-marked while it
+is being processed stays queued for the next batch. A run left "running" by
+a worker that died is marked failed when a scheduler next starts.
+"""
+
+import os
+import threading
+from datetime import datetime, timedelta
+import streamlit as st
+from sqlalchemy import func
+from database import get_db, bump_data_version, dialect_insert, get_latest_approved_checklists
+from inference import score_checklists
+from models import Barn, Alert, DirtyBarn, RiskRecomputeRun
+from logging_setup import get_logger
+
+logger = get_logger(__name__)
+
+RISK_RECOMPUTE_INTERVAL = float(os.getenv("FARMTWIN_RISK_INTERVAL", "30"))  # seconds
+RISK_RECOMPUTE_BATCH = int(os.getenv("FARMTWIN_RISK_BATCH", "500"))
+# Set to 0 when a standalone worker process does the recomputing
+RISK_SCHEDULER_ENABLED = os.getenv("FARMTWIN_RISK_SCHEDULER", "1") != "0"
+# A run still "running" after this many intervals belonged to a worker that died
+RISK_STALE_RUN_INTERVALS = int(os.getenv("FARMTWIN_RISK_STALE_RUN_INTERVALS", "20"))
+
+
+def mark_barns_dirty(barn_ids, db):
+    """Queue barns for a risk recompute; the caller commits"""
+    barn_ids = set(barn_ids)
+    if not barn_ids:
+        return 0
+
+    # One upsert: a read-then-write races with recompute_batch deleting the row
+    # and with concurrent first marks of the same barn
+    now = datetime.utcnow()
+    insert = dialect_insert(db)
+    statement = insert(DirtyBarn).values([{"barn_id": barn_id, "marked_at": now} for barn_id in barn_ids])
+    db.execute(statement.on_conflict_do_update(
+        index_elements=[DirtyBarn.barn_id],
+        set_={"marked_at": statement.excluded.marked_at}
+    ))
+    return len(barn_ids)
+
+
+def get_pending_count(db):
+    """Number of barns waiting for a recompute"""
+    return db.query(func.count(DirtyBarn.barn_id)).scalar() or 0
+
+
+def get_latest_run(db):
+    """Most recent recompute run, or None"""
+    return db.query(RiskRecomputeRun).order_by(RiskRecomputeRun.id.desc()).first()
+
+
+def fail_stale_runs(db, max_age_seconds):
+    """Mark runs started more than max_age_seconds ago and still running as failed"""
+    now = datetime.utcnow()
+    failed = db.query(RiskRecomputeRun).filter(
+        RiskRecomputeRun.status == "running",
+        RiskRecomputeRun.started_at < now - timedelta(seconds=max_age_seconds)
+    ).update({
+        "status": "failed",
+        "error": "Worker stopped before the run finished",
+        "finished_at": now
+    }, synchronize_session=False)
+    db.commit()
+    return failed
+
+
+def recompute_batch(db, dirty, score=score_checklists):
+    """Recompute one batch of (barn_id, marked_at); returns (done, changed)"""
+    barn_ids = [barn_id for barn_id, _ in dirty]
+    barns = {barn.id: barn for barn in db.query(Barn).filter(Barn.id.in_(barn_ids)).all()}
+
+    checklists = get_latest_approved_checklists(barn_ids, db)
+
+    changed = 0
+    touched_farm_ids = set()
+    for checklist, (risk_label, snapshot) in zip(checklists, score(checklists)):
+        barn = barns.get(checklist.barn_id)
+        if not barn:
+            continue
+
+        new_level = risk_label.lower()
+        if barn.risk_level != new_level:
+            changed += 1
+            # Alert once when a barn becomes high risk, not on every recompute
+            if new_level == "high":
+                db.add(Alert(
+                    type="high_risk",
+                    message=f"High risk detected in {barn.name} after approved checklist",
+                    severity="high",
+                    barn_id=barn.id,
+                    user_id=checklist.user_id
+                ))
+
+        barn.risk_level = new_level
+        barn.risk_snapshot = snapshot
+        barn.last_updated = datetime.utcnow()
+        touched_farm_ids.add(barn.farm_id)
+
+    # Only clear barns that were not re-marked while this batch ran
+    for barn_id, marked_at in dirty:
+        db.query(DirtyBarn).filter(
+            DirtyBarn.barn_id == barn_id,
+            DirtyBarn.marked_at == marked_at
+        ).delete(synchronize_session=False)
+
+    db.commit()
+
+    for farm_id in touched_farm_ids:
+        bump_data_version(farm_id, db)
+
+    return len(dirty), changed
+
+
+def process_dirty_barns(batch_size=RISK_RECOMPUTE_BATCH, score=score_checklists):
+    """Recompute all currently dirty barns in batches; returns the run record id or None"""
+    db = get_db()
+    try:
+        pending = get_pending_count(db)
+        if not pending:
+            return None
+
+        run = RiskRecomputeRun(status="running", barns_total=pending, started_at=datetime.utcnow())
+        db.add(run)
+        db.commit()
+
+        try:
+            seen = set()
+            while True:
+                dirty = [
+                    (barn_id, marked_at)
+                    for barn_id, marked_at in db.query(DirtyBarn.barn_id, DirtyBarn.marked_at)
+                    .order_by(DirtyBarn.marked_at)
+                    .limit(batch_size)
+                    .all()
+                    if barn_id not in seen
+                ]
+                if not dirty:
+                    break
+
+                # Barns re-marked during this run are left for the next one
+                seen.update(barn_id for barn_id, _ in dirty)
+                done, changed = recompute_batch(db, dirty, score)
+
+                run.barns_done += done
+                run.barns_changed += changed
+                run.barns_total = max(run.barns_total, run.barns_done)
+                db.commit()
+
+            run.status = "completed"
+        except Exception as e:
+            db.rollback()
+            run.status = "failed"
+            run.error = str(e)
+            logger.exception("Error recomputing barn risks")
+
+        run.finished_at = datetime.utcnow()
+        db.commit()
+        return run.id
+    finally:
+        db.close()
+
+
+class RiskScheduler:
+    """Recomputes dirty barns every interval seconds until stopped"""
+
+    def __init__(self, interval=RISK_RECOMPUTE_INTERVAL, batch_size=RISK_RECOMPUTE_BATCH):
+        self.interval = interval
+        self.batch_size = batch_size
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self.run_forever, name="risk-scheduler", daemon=True)
+            self._thread.start()
+        return self
+
+    def run_forever(self):
+        db = get_db()
+        try:
+            stale = fail_stale_runs(db, RISK_STALE_RUN_INTERVALS * self.interval)
+            if stale:
+                logger.warning("Marked %d interrupted risk recompute run(s) as failed", stale)
+        except Exception as e:
+            db.rollback()
+            logger.exception("Could not clean up interrupted risk recompute runs")
+        finally:
+            db.close()
+
+        while not self._stop.is_set():
+            try:
+                process_dirty_barns(self.batch_size)
+            except Exception as e:
+                logger.exception("Risk scheduler error")
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def wake(self):
+        """Process the dirty set now instead of at the next tick"""
+        self._wake.set()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+
+@st.cache_resource
+def get_risk_scheduler():
+    """The process-wide scheduler, started on first use when enabled"""
+    scheduler = RiskScheduler()
+    if RISK_SCHEDULER_ENABLED:
+        scheduler.start()
+    return scheduler
+
+
+def request_risk_recompute(barn_ids, db):
+    """Mark barns dirty, commit, and wake the local scheduler; returns the number queued"""
+    queued = mark_barns_dirty(barn_ids, db)
+    db.commit()
+    get_risk_scheduler().wake()
+    return queued
+
+
+if __name__ == "__main__":
+    from database import init_database
+
+    init_database()
+    logger.info("Risk scheduler running every %gs, batches of %d", RISK_RECOMPUTE_INTERVAL, RISK_RECOMPUTE_BATCH)
+    scheduler = RiskScheduler()
+    try:
+        scheduler.run_forever()
+    except KeyboardInterrupt:
+        scheduler.stop()
@@ -0,0 +1,212 @@
+"""
+Monte Carlo "what-if" scenarios around the barn risk model.
+
+A scenario shifts the checklist features of selected barns (for example
+ventilation -3 in barns 3-7). Every barn's latest approved checklist is
+resampled with measurement noise many times, with and without the shift,
+and all samples are scored with batched predict_proba calls, spread over a
+long-lived ProcessPoolExecutor for large runs. The result is a probability band per barn. Results
+are kept in a bounded LRU keyed by a hash of the scenario and the farm
+data versions, so repeated views are instant and approvals invalidate them.
+
+The pool uses the spawn start method: forking the Streamlit server would copy
+its logging and scheduler threads' held locks into the workers. It is created
+once per model version and replaced when a worker dies.
+"""
+
+import hashlib
+import json
+import multiprocessing
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import numpy as np
+from database import get_db, get_latest_approved_checklists
+from ai_engine import FEATURE_COLUMNS, FEATURE_DEFAULTS
+from drift import VALID_RANGES
+from logging_setup import get_logger
+
+logger = get_logger(__name__)
+
+# Per-feature measurement noise (std) and valid range used when resampling
+FEATURE_NOISE = np.array([0.75, 0.75, 0.75, 0.5, 0.75, 1.0, 3.0])
+FEATURE_MIN = np.array([VALID_RANGES[column][0] for column in FEATURE_COLUMNS])
+FEATURE_MAX = np.array([VALID_RANGES[column][1] for column in FEATURE_COLUMNS])
+
+DEFAULT_SAMPLES = 500
+SCENARIO_WORKERS = min(4, os.cpu_count() or 1)
+# Below this many rows a process pool costs more than it saves
+PARALLEL_MIN_ROWS = 50000
+SCENARIO_CACHE_SIZE = 64
+
+_scenario_cache = OrderedDict()
+_scenario_cache_lock = threading.Lock()
+
+_worker_predictor = None
+
+_pool = None
+_pool_key = None
+_pool_lock = threading.Lock()
+
+
+def _init_worker(predictor_bytes):
+    global _worker_predictor
+    _worker_predictor = pickle.loads(predictor_bytes)
+
+
+def _score_chunk(features):
+    _, probabilities = _worker_predictor.predict_risk_batch(features)
+    return probabilities
+
+
+def scenario_hash(barn_ids, adjustments, target_barn_ids, samples, seed, data_version):
+    """Stable identifier of a scenario run"""
+    payload = json.dumps({
+        "barns": sorted(barn_ids),
+        "adjustments": sorted((k, float(v)) for k, v in adjustments.items() if v),
+        "targets": sorted(target_barn_ids),
+        "samples": samples,
+        "seed": seed,
+        "data_version": [list(v) for v in data_version],
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def load_barn_features(barn_ids, predictor=None):
+    """Latest approved checklist features per barn (defaults when a barn has none)"""
+    if predictor is None:
+        from ai_engine import risk_predictor as predictor
+    db = get_db()
+    try:
+        checklists = get_latest_approved_checklists(barn_ids, db)
+    finally:
+        db.close()
+
+    features = {barn_id: list(FEATURE_DEFAULTS) for barn_id in barn_ids}
+    for checklist in checklists:
+        features[checklist.barn_id] = predictor.checklist_features(checklist)
+    return features
+
+
+def _get_pool(predictor, workers):
+    """The shared scoring pool, started again when the predictor or worker count changes"""
+    global _pool, _pool_key
+    key = (id(predictor), predictor.model_version, workers)
+    with _pool_lock:
+        if _pool is None or _pool_key != key:
+            if _pool is not None:
+                _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(pickle.dumps(predictor),)
+            )
+            _pool_key = key
+        return _pool
+
+
+def _reset_pool(pool):
+    """Drop a broken pool so the next large run starts a fresh one"""
+    global _pool, _pool_key
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+            _pool_key = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _score(predictor, features, workers):
+    """predict_proba over (n, 7) rows, split across the process pool when large"""
+    if workers <= 1 or len(features) < PARALLEL_MIN_ROWS:
+        return predictor.predict_risk_batch(features)[1]
+
+    chunks = np.array_split(features, workers * 4)
+    pool = _get_pool(predictor, workers)
+    try:
+        return np.concatenate(list(pool.map(_score_chunk, chunks)))
+    except BrokenProcessPool as e:
+        logger.warning("Scenario worker pool broke, scoring in process: %s", e)
+        _reset_pool(pool)
+        return predictor.predict_risk_batch(features)[1]
+
+
+def run_scenario(barn_features, adjustments, target_barn_ids, samples=DEFAULT_SAMPLES,
+                 seed=42, predictor=None, workers=SCENARIO_WORKERS):
+    """Monte Carlo risk bands per barn for baseline and adjusted features
+
+    barn_features: {barn_id: [7 features]}
+    adjustments: {feature name: additive shift} applied to target_barn_ids
+    """
+    if predictor is None:
+        from ai_engine import risk_predictor as predictor
+    if not predictor.is_trained:
+        predictor.train_model()
+
+    barn_ids = list(barn_features.keys())
+    base = np.array([barn_features[barn_id] for barn_id in barn_ids], dtype=float)
+
+    shift = np.zeros(len(FEATURE_COLUMNS))
+    for feature, value in adjustments.items():
+        shift[FEATURE_COLUMNS.index(feature)] = value
+    target_mask = np.isin(barn_ids, list(target_barn_ids))
+
+    # Same noise for baseline and scenario so the difference is the shift alone
+    rng = np.random.default_rng(seed)
+    noise = rng.normal(0.0, FEATURE_NOISE, size=(samples, len(barn_ids), len(FEATURE_COLUMNS)))
+    baseline = np.clip(base[None, :, :] + noise, FEATURE_MIN, FEATURE_MAX)
+    scenario = baseline.copy()
+    scenario[:, target_mask, :] = np.clip(
+        scenario[:, target_mask, :] + shift, FEATURE_MIN, FEATURE_MAX
+    )
+
+    rows = np.concatenate([baseline, scenario]).reshape(-1, len(FEATURE_COLUMNS))
+    probabilities = _score(predictor, rows, workers)
+
+    # P(high) per sample, split back into (2, samples, barns)
+    classes = list(predictor.model.classes_)
+    if 2 in classes:
+        high = probabilities[:, classes.index(2)]
+    else:
+        high = np.zeros(len(probabilities))
+    high = high.reshape(2, samples, len(barn_ids))
+
+    def bands(values):
+        return {
+            "mean": values.mean(axis=0),
+            "p05": np.percentile(values, 5, axis=0),
+            "p95": np.percentile(values, 95, axis=0),
+        }
+
+    return {
+        "barn_ids": barn_ids,
+        "targets": target_mask,
+        "baseline": bands(high[0]),
+        "scenario": bands(high[1]),
+        "samples": samples,
+    }
+
+
+def get_scenario_result(barn_ids, adjustments, target_barn_ids, data_version,
+                        samples=DEFAULT_SAMPLES, seed=42):
+    """Run a scenario for the given barns, reusing a cached result for the same scenario hash"""
+    key = scenario_hash(barn_ids, adjustments, target_barn_ids, samples, seed, data_version)
+
+    with _scenario_cache_lock:
+        if key in _scenario_cache:
+            _scenario_cache.move_to_end(key)
+            return _scenario_cache[key]
+
+    result = run_scenario(
+        load_barn_features(barn_ids), adjustments, target_barn_ids, samples, seed
+    )
+
+    with _scenario_cache_lock:
+        _scenario_cache[key] = result
+        while len(_scenario_cache) > SCENARIO_CACHE_SIZE:
+            _scenario_cache.popitem(last=False)
+
+    return result
@@ -0,0 +1,156 @@
+"""
+Opt-in slow-query recorder.
+
+With FARMTWIN_SLOW_QUERY_MS set, get_engine attaches cursor listeners that
+log every statement slower than the threshold with its parameters and the
+application function that issued it, and keep the most recent
+SLOW_QUERY_BUFFER of them in memory for the admin System Settings page.
+
+SELECTs that cross the threshold are explained once (EXPLAIN QUERY PLAN on
+SQLite, EXPLAIN on PostgreSQL) and the plan is reused for later occurrences
+of the same statement. The EXPLAIN runs inside the application's transaction,
+so on PostgreSQL it is wrapped in a savepoint: a failing EXPLAIN is rolled
+back to it instead of aborting the transaction. FARMTWIN_SLOW_QUERY_ANALYZE=1
+switches to EXPLAIN ANALYZE, which runs the statement a second time. Other
+statements and SELECT ... FOR UPDATE are never explained, since that would
+repeat their writes or take their locks again. Nothing beyond a timer is done
+for statements under the threshold.
+"""
+
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import datetime
+from sqlalchemy import event
+from logging_setup import get_logger
+
+logger = get_logger(__name__)
+
+SLOW_QUERY_MS = float(os.getenv("FARMTWIN_SLOW_QUERY_MS", "0"))  # 0 disables the recorder
+SLOW_QUERY_BUFFER = int(os.getenv("FARMTWIN_SLOW_QUERY_BUFFER", "200"))
+SLOW_QUERY_EXPLAIN = os.getenv("FARMTWIN_SLOW_QUERY_EXPLAIN", "1") != "0"
+SLOW_QUERY_ANALYZE = os.getenv("FARMTWIN_SLOW_QUERY_ANALYZE", "0") == "1"
+MAX_CACHED_PLANS = 500
+MAX_PARAMETERS_LENGTH = 500
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+# Frames from these files are plumbing, not the code that asked for the query
+IGNORED_CALLER_FILES = {"slow_queries.py", "instrumentation.py", "database.py"}
+
+_records = deque(maxlen=SLOW_QUERY_BUFFER)
+_plans = OrderedDict()
+_lock = threading.Lock()
+
+
+def find_caller():
+    """'path:function:line' of the innermost project frame outside the database plumbing"""
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if (filename.startswith(PROJECT_ROOT) and "site-packages" not in filename
+                and os.path.basename(filename) not in IGNORED_CALLER_FILES):
+            relative = os.path.relpath(filename, PROJECT_ROOT)
+            return f"{relative}:{frame.f_code.co_name}:{frame.f_lineno}"
+        frame = frame.f_back
+    return "unknown"
+
+
+def is_explainable(statement):
+    """Plain SELECTs only: explaining anything else could repeat writes or locks"""
+    normalized = " ".join(statement.upper().split())
+    return normalized.startswith("SELECT") and " FOR UPDATE" not in normalized
+
+
+def _explain(cursor, dialect_name, statement, parameters):
+    """Query plan of a SELECT as text, cached per statement"""
+    with _lock:
+        if statement in _plans:
+            _plans.move_to_end(statement)
+            return _plans[statement]
+
+    explain_cursor = cursor.connection.cursor()
+    try:
+        if dialect_name == "sqlite":
+            # Only describes the plan; never runs the statement or writes
+            explain_cursor.execute("EXPLAIN QUERY PLAN " + statement, parameters)
+            rows = explain_cursor.fetchall()
+        else:
+            prefix = "EXPLAIN ANALYZE " if SLOW_QUERY_ANALYZE else "EXPLAIN "
+            explain_cursor.execute("SAVEPOINT slow_query_explain")
+            try:
+                explain_cursor.execute(prefix + statement, parameters)
+                rows = explain_cursor.fetchall()
+            except Exception:
+                explain_cursor.execute("ROLLBACK TO SAVEPOINT slow_query_explain")
+                raise
+            finally:
+                explain_cursor.execute("RELEASE SAVEPOINT slow_query_explain")
+    finally:
+        explain_cursor.close()
+
+    if dialect_name == "sqlite":
+        # (id, parent, notused, detail)
+        plan = "\n".join(str(row[-1]) for row in rows)
+    else:
+        plan = "\n".join(str(row[0]) for row in rows)
+
+    with _lock:
+        _plans[statement] = plan
+        while len(_plans) > MAX_CACHED_PLANS:
+            _plans.popitem(last=False)
+    return plan
+
+
+def install_slow_query_recorder(engine, threshold_ms=None):
+    """Record statements on this engine slower than threshold_ms (default FARMTWIN_SLOW_QUERY_MS)"""
+    threshold = (threshold_ms if threshold_ms is not None else SLOW_QUERY_MS) / 1000.0
+    dialect_name = engine.dialect.name
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("slow_query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _record_if_slow(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["slow_query_started"].pop()
+        if elapsed < threshold:
+            return
+
+        caller = find_caller()
+        plan = None
+        if SLOW_QUERY_EXPLAIN and not executemany and is_explainable(statement):
+            try:
+                plan = _explain(cursor, dialect_name, statement, parameters)
+            except Exception as e:
+                logger.warning("Could not explain slow query: %s", e)
+
+        parameters_text = repr(parameters)
+        if len(parameters_text) > MAX_PARAMETERS_LENGTH:
+            parameters_text = parameters_text[:MAX_PARAMETERS_LENGTH] + "…"
+
+        with _lock:
+            _records.append({
+                "recorded_at": datetime.utcnow(),
+                "duration_ms": elapsed * 1000,
+                "caller": caller,
+                "statement": statement,
+                "parameters": parameters_text,
+                "plan": plan,
+            })
+        logger.warning("Slow query (%.1f ms) from %s: %s | parameters: %s",
+                       elapsed * 1000, caller, " ".join(statement.split()), parameters_text)
+
+    return engine
+
+
+def get_slow_queries():
+    """Recorded slow queries, newest first"""
+    with _lock:
+        return list(reversed(_records))
+
+
+def clear_slow_queries():
+    with _lock:
+        _records.clear()
@@ -0,0 +1,144 @@
+"""
+Per-farm spatial index over barn positions for map viewport queries.
+
+Each farm's barns are bucketed into a uniform grid on position_x/y. Map
+views ask for the barns of the user's farms inside the visible extent and
+only touch the grid cells that overlap it. Indexes are cached per farm and
+rebuilt when that farm's barn-set fingerprint changes.
+"""
+
+import math
+from collections import defaultdict, namedtuple
+import streamlit as st
+from database import get_db, get_barn_set_versions
+from models import Barn
+
+GRID_CELL_SIZE = 25.0  # meters
+
+BarnPoint = namedtuple(
+    "BarnPoint",
+    ["id", "farm_id", "name", "capacity", "risk_level", "x", "y", "z"]
+)
+
+Viewport = namedtuple("Viewport", ["x_min", "x_max", "y_min", "y_max"])
+
+
+class BarnGridIndex:
+    """Uniform grid of barns keyed by (column, row) cell"""
+
+    def __init__(self, barns, cell_size=GRID_CELL_SIZE):
+        self.cell_size = cell_size
+        self.barns = list(barns)
+        self.cells = defaultdict(list)
+
+        for barn in self.barns:
+            self.cells[self._cell(barn.x, barn.y)].append(barn)
+
+        if self.barns:
+            xs = [barn.x for barn in self.barns]
+            ys = [barn.y for barn in self.barns]
+            self.bounds = Viewport(min(xs), max(xs), min(ys), max(ys))
+        else:
+            self.bounds = None
+
+    def _cell(self, x, y):
+        return (math.floor(x / self.cell_size), math.floor(y / self.cell_size))
+
+    def __len__(self):
+        return len(self.barns)
+
+    def query(self, viewport=None):
+        """Return the barns inside a viewport (all barns when viewport is None)"""
+        if viewport is None or self.bounds is None:
+            return list(self.barns)
+
+        # Clip to the populated area so huge viewports don't scan empty cells
+        x_min = max(viewport.x_min, self.bounds.x_min)
+        x_max = min(viewport.x_max, self.bounds.x_max)
+        y_min = max(viewport.y_min, self.bounds.y_min)
+        y_max = min(viewport.y_max, self.bounds.y_max)
+        if x_min > x_max or y_min > y_max:
+            return []
+
+        col_min, row_min = self._cell(x_min, y_min)
+        col_max, row_max = self._cell(x_max, y_max)
+
+        if (col_max - col_min + 1) * (row_max - row_min + 1) > len(self.cells):
+            # Viewport spans more cells than are populated: walk populated cells
+            candidates = (
+                barn
+                for (col, row), cell in self.cells.items()
+                if col_min <= col <= col_max and row_min <= row <= row_max
+                for barn in cell
+            )
+        else:
+            candidates = (
+                barn
+                for col in range(col_min, col_max + 1)
+                for row in range(row_min, row_max + 1)
+                for barn in self.cells.get((col, row), ())
+            )
+
+        return [
+            barn for barn in candidates
+            if x_min <= barn.x <= x_max and y_min <= barn.y <= y_max
+        ]
+
+
+def load_barn_points(db, farm_id):
+    """Load the lightweight barn records of one farm"""
+    rows = db.query(
+        Barn.id, Barn.farm_id, Barn.name, Barn.capacity, Barn.risk_level,
+        Barn.position_x, Barn.position_y, Barn.position_z
+    ).filter(Barn.farm_id == farm_id).order_by(Barn.id).all()
+
+    return [
+        BarnPoint(
+            row.id, row.farm_id, row.name, row.capacity, row.risk_level or "low",
+            row.position_x or 0.0, row.position_y or 0.0, row.position_z or 0.0
+        )
+        for row in rows
+    ]
+
+
+@st.cache_resource(max_entries=256)
+def get_farm_barn_index(farm_id, barn_set_version):
+    """Grid index for one farm; barn_set_version is part of the cache key only"""
+    db = get_db()
+    try:
+        return BarnGridIndex(load_barn_points(db, farm_id))
+    finally:
+        db.close()
+
+
+def get_scope_version(farm_ids):
+    """((farm_id, barn-set fingerprint), ...) for farms that have barns"""
+    db = get_db()
+    try:
+        versions = get_barn_set_versions(db, farm_ids)
+    finally:
+        db.close()
+    return tuple(sorted(versions.items()))
+
+
+def query_barns(scope_version, viewport=None):
+    """Barns of every farm in scope_version inside the viewport"""
+    barns = []
+    for farm_id, barn_set_version in scope_version:
+        barns.extend(get_farm_barn_index(farm_id, barn_set_version).query(viewport))
+    return barns
+
+
+def get_scope_bounds(scope_version):
+    """Overall extent of the barns in scope, or None when there are none"""
+    bounds = [
+        get_farm_barn_index(farm_id, barn_set_version).bounds
+        for farm_id, barn_set_version in scope_version
+    ]
+    bounds = [b for b in bounds if b is not None]
+    if not bounds:
+        return None
+    return Viewport(
+        min(b.x_min for b in bounds), max(b.x_max for b in bounds),
+        min(b.y_min for b in bounds), max(b.y_max for b in bounds)
+    )
@@ -0,0 +1,59 @@
+"""Shared fixtures: a throwaway SQLite database and lockstep threads"""
+
+import os
+import sys
+import threading
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import Base
+
+
+@pytest.fixture
+def engine(tmp_path):
+    """SQLite engine with the full schema, usable from several threads"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def Session(engine):
+    return sessionmaker(bind=engine)
+
+
+def run_in_lockstep(Session, items, step, threads=2):
+    """Call step(db, item) for every item in each of several threads, each with its own session
+
+    The threads wait for each other before every item, so they hit the same
+    rows at the same moment. The first error (other than the broken barrier
+    it causes in the other threads) is raised.
+    """
+    barrier = threading.Barrier(threads)
+    errors = []
+
+    def work():
+        db = Session()
+        try:
+            for item in items:
+                barrier.wait(timeout=30)
+                step(db, item)
+        except Exception as e:
+            errors.append(e)
+            barrier.abort()
+        finally:
+            db.close()
+
+    workers = [threading.Thread(target=work) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    causes = [e for e in errors if not isinstance(e, threading.BrokenBarrierError)]
+    if causes or errors:
+        raise (causes or errors)[0]
@@ -0,0 +1,48 @@
+"""Barn baseline upserts"""
+
+import os
+import sys
+from types import SimpleNamespace
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import BarnFeatureBaseline
+from anomaly import ANOMALY_ALPHA, ANOMALY_FEATURES, update_baselines
+from conftest import run_in_lockstep
+
+
+def checklist(barn_id, value):
+    return SimpleNamespace(barn_id=barn_id, **{feature: value for feature in ANOMALY_FEATURES})
+
+
+def test_upsert_matches_exponentially_weighted_update(Session):
+    values = [10.0, 12.0, 7.0, 15.0, 9.0]
+    db = Session()
+    try:
+        for value in values:
+            update_baselines(checklist(1, value), db)
+        baseline = db.get(BarnFeatureBaseline, (1, "temperature"))
+    finally:
+        db.close()
+
+    mean, variance = values[0], 0.0
+    for value in values[1:]:
+        diff = value - mean
+        mean += ANOMALY_ALPHA * diff
+        variance = (1.0 - ANOMALY_ALPHA) * (variance + ANOMALY_ALPHA * diff * diff)
+
+    assert baseline.count == len(values)
+    assert baseline.mean == pytest.approx(mean)
+    assert baseline.variance == pytest.approx(variance)
+
+
+def test_concurrent_first_checklists_of_a_barn(Session):
+    barn_ids = list(range(1, 31))
+    run_in_lockstep(Session, barn_ids, lambda db, barn_id: update_baselines(checklist(barn_id, 5.0), db))
+    db = Session()
+    try:
+        counts = {count for count, in db.query(BarnFeatureBaseline.count).all()}
+    finally:
+        db.close()
+    assert counts == {2}
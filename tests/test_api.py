@@ -0,0 +1,171 @@
+"""Mobile API conditional GETs, columnar lists and offline bulk sync"""
+
+import os
+import sys
+import pytest
+from fastapi.testclient import TestClient
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.join(ROOT, "mobile-backend"))
+
+import api
+from models import Barn, Checklist, Farm, Incident, User
+
+ADMIN_ID = 1
+
+
+@pytest.fixture
+def db(Session, monkeypatch):
+    monkeypatch.setattr(api, "get_db", lambda: Session())
+    monkeypatch.setattr(api, "get_read_db", lambda user_id=None: Session())
+    db = Session()
+    db.add(User(id=ADMIN_ID, name="Admin", email="admin@example.com", password_hash="-", role="admin"))
+    db.add_all([Farm(id=1, name="North"), Farm(id=2, name="South")])
+    db.add_all([Barn(id=1, farm_id=1, name="A", capacity=100), Barn(id=2, farm_id=2, name="B", capacity=50)])
+    db.commit()
+    yield db
+    db.close()
+
+
+@pytest.fixture
+def client(db):
+    # Not used as a context manager, so the risk scheduler is not started
+    client = TestClient(api.app)
+    client.headers["Authorization"] = f"Bearer {api.create_jwt_token(ADMIN_ID, 'admin')}"
+    return client
+
+
+@pytest.mark.parametrize("if_none_match, expected", [
+    (None, False),
+    ('W/"abc"', True),
+    ('"abc"', True),
+    ('W/"other", W/"abc"', True),
+    ("*", True),
+    ('W/"other"', False),
+])
+def test_if_none_match_uses_weak_comparison(if_none_match, expected):
+    assert api.is_not_modified(if_none_match, {"ETag": 'W/"abc"'}) is expected
+
+
+def test_unchanged_list_is_not_modified(client):
+    first = client.get("/api/farms/1/barns")
+    assert first.status_code == 200
+    assert "Last-Modified" in first.headers
+
+    second = client.get("/api/farms/1/barns", headers={"If-None-Match": first.headers["ETag"]})
+    assert second.status_code == 304
+    assert second.content == b""
+    assert second.headers["ETag"] == first.headers["ETag"]
+
+
+def test_etag_changes_with_the_data_it_covers(client, db):
+    etag = client.get("/api/farms/1/barns").headers["ETag"]
+
+    # A change in another farm leaves this farm's list valid
+    db.get(Barn, 2).capacity = 60
+    db.commit()
+    assert client.get("/api/farms/1/barns", headers={"If-None-Match": etag}).status_code == 304
+
+    db.get(Barn, 1).capacity = 120
+    db.commit()
+    changed = client.get("/api/farms/1/barns", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert changed.json()[0]["capacity"] == 120
+
+
+def test_etag_differs_per_format(client):
+    objects = client.get("/api/farms").headers["ETag"]
+    columns = client.get("/api/farms", params={"format": "columns"}).headers["ETag"]
+    assert objects != columns
+
+
+def from_columns(body):
+    return [dict(zip(body["columns"], row)) for row in body["rows"]]
+
+
+@pytest.mark.parametrize("path", ["/api/farms", "/api/farms/1/barns", "/api/admin/barns"])
+def test_columns_format_round_trips(client, path):
+    objects = client.get(path).json()
+    columns = client.get(path, params={"format": "columns"}).json()
+
+    assert objects
+    assert columns["columns"] == list(objects[0])
+    assert from_columns(columns) == objects
+
+
+def test_columns_format_of_an_empty_list():
+    assert api.list_response([], "columns") == {"columns": [], "rows": []}
+
+
+def test_unknown_format_is_rejected(client):
+    assert client.get("/api/farms", params={"format": "csv"}).status_code == 400
+
+
+def checklist(client_uuid, barn_id=1, **values):
+    return {
+        "client_uuid": client_uuid, "barn_id": barn_id, "hygiene_score": 8, "mortality_count": 0,
+        "feed_quality": 7, "water_quality": 8, "ventilation_score": 7, "temperature": 24.0,
+        "humidity": 60.0, **values
+    }
+
+
+def test_bulk_sync_reports_each_item(client, db):
+    response = client.post("/api/sync/bulk", json={
+        "checklists": [
+            checklist("c-1"),
+            checklist("c-2", hygiene_score=11),
+            checklist("c-1"),
+            checklist("c-3", barn_id=999),
+        ],
+        "incidents": [
+            {"client_uuid": "i-1", "barn_id": 2, "incident_type": "disease", "severity": "high",
+             "description": "Coughing"},
+        ],
+    })
+    assert response.status_code == 200
+    body = response.json()
+
+    statuses = [(r["kind"], r["index"], r["client_uuid"], r["status"]) for r in body["results"]]
+    assert statuses == [
+        ("checklist", 0, "c-1", "created"),
+        ("checklist", 1, "c-2", "invalid"),
+        ("checklist", 2, "c-1", "duplicate"),
+        ("checklist", 3, "c-3", "rejected"),
+        ("incident", 0, "i-1", "created"),
+    ]
+    assert "hygiene_score" in body["results"][1]["error"]
+    assert body["results"][3]["error"] == "Barn not found or not accessible"
+    assert (body["created"], body["duplicates"], body["failed"]) == (2, 1, 2)
+
+    assert db.query(Checklist).count() == 1
+    assert db.query(Incident).count() == 1
+
+
+def test_bulk_sync_retry_returns_the_stored_ids(client, db):
+    payload = {"checklists": [checklist("c-1"), checklist("c-2")]}
+    first = client.post("/api/sync/bulk", json=payload).json()
+    retry = client.post("/api/sync/bulk", json=payload).json()
+
+    assert [r["status"] for r in retry["results"]] == ["duplicate", "duplicate"]
+    assert [r["id"] for r in retry["results"]] == [r["id"] for r in first["results"]]
+    assert retry["created"] == 0
+    assert db.query(Checklist).count() == 2
+
+
+def test_another_users_client_uuid_is_rejected(client, db):
+    db.add(User(id=2, name="Other", email="other@example.com", password_hash="-", role="admin"))
+    db.commit()
+    client.post("/api/sync/bulk", json={"checklists": [checklist("c-1")]})
+
+    other = client.post(
+        "/api/sync/bulk", json={"checklists": [checklist("c-1"), checklist("c-2")]},
+        headers={"Authorization": f"Bearer {api.create_jwt_token(2, 'admin')}"}
+    )
+    assert other.status_code == 200
+    assert [(r["status"], r.get("error")) for r in other.json()["results"]] == [
+        ("rejected", "client_uuid already used by another submission"),
+        ("created", None),
+    ]
+    assert db.query(Checklist).count() == 2
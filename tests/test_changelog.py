@@ -0,0 +1,93 @@
+"""Change feed pagination and settle window"""
+
+import os
+import sys
+from datetime import datetime, timedelta
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import Alert, Barn, ChangeLog, Checklist, Farm
+from changelog import CHANGE_FEED_SETTLE_SECONDS, get_changes
+
+USER_ID = 7
+
+
+def settle(db):
+    """Age every change_log entry past the settle window"""
+    db.query(ChangeLog).update(
+        {"changed_at": datetime.utcnow() - timedelta(seconds=CHANGE_FEED_SETTLE_SECONDS + 60)},
+        synchronize_session=False
+    )
+    db.commit()
+
+
+@pytest.fixture
+def db(Session):
+    db = Session()
+    db.add_all([Farm(id=1, name="Mine"), Farm(id=2, name="Other")])
+    db.add_all([Barn(id=1, farm_id=1, name="A"), Barn(id=2, farm_id=2, name="B")])
+    db.flush()
+    db.add_all([Checklist(id=i, barn_id=1 if i <= 6 else 2) for i in range(1, 10)])
+    db.add_all([
+        Alert(id=1, type="risk", message="mine", user_id=USER_ID),
+        Alert(id=2, type="risk", message="someone else's", user_id=USER_ID + 1),
+    ])
+    db.commit()
+    settle(db)
+    yield db
+    db.close()
+
+
+def read_all(db, since=0, limit=2):
+    pages = []
+    while True:
+        entries, since, has_more = get_changes(db, since, limit, [1], USER_ID)
+        pages.append(entries)
+        if not has_more:
+            return pages, since
+
+
+def test_pages_cover_the_scope_once_in_version_order(db):
+    pages, _ = read_all(db)
+    entries = [entry for page in pages for entry in page]
+
+    assert all(len(page) <= 2 for page in pages)
+    assert [version for *_, version in entries] == sorted(version for *_, version in entries)
+    assert sorted((table, row_id) for table, row_id, _, _ in entries) == sorted(
+        [("farms", 1), ("barns", 1), ("alerts", 1)] + [("checklists", i) for i in range(1, 7)]
+    )
+
+
+def test_only_the_latest_change_of_a_row_is_sent(db):
+    _, since = read_all(db)
+    checklist = db.get(Checklist, 2)
+    checklist.notes = "first"
+    db.commit()
+    checklist.notes = "second"
+    db.commit()
+    db.delete(db.get(Checklist, 3))
+    db.commit()
+    settle(db)
+
+    entries, next_since, has_more = get_changes(db, since, 10, [1], USER_ID)
+    assert [(table, row_id, operation) for table, row_id, operation, _ in entries] == [
+        ("checklists", 2, "upsert"), ("checklists", 3, "delete")
+    ]
+    assert not has_more
+    assert next_since == entries[-1][3]
+
+
+def test_recent_changes_are_sent_but_not_acknowledged(db):
+    _, since = read_all(db)
+    db.get(Checklist, 4).notes = "just now"
+    db.commit()
+
+    # Inside the settle window the entry is delivered but since does not move past it
+    entries, next_since, _ = get_changes(db, since, 10, [1], USER_ID)
+    assert [(table, row_id) for table, row_id, _, _ in entries] == [("checklists", 4)]
+    assert next_since == since
+
+    settle(db)
+    entries, next_since, _ = get_changes(db, since, 10, [1], USER_ID)
+    assert next_since == entries[-1][3] > since
@@ -0,0 +1,54 @@
+"""Feature statistics under concurrent checklists and drift alert recipients"""
+
+import os
+import sys
+from types import SimpleNamespace
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import Alert, Farm, FeatureBaseline, FeatureStat, User
+from drift import DRIFT_BINS, DRIFT_MIN_SAMPLES, record_checklist
+from conftest import run_in_lockstep
+
+
+def checklist(value, barn_id=1):
+    return SimpleNamespace(barn_id=barn_id, **{feature: value for feature in DRIFT_BINS})
+
+
+def test_concurrent_checklists_of_a_farm(Session):
+    values = [float(value) for value in range(1, 11)]
+    run_in_lockstep(Session, values, lambda db, value: record_checklist(checklist(value), db, farm_id=1))
+    db = Session()
+    try:
+        stat = db.get(FeatureStat, (1, "hygiene_score"))
+    finally:
+        db.close()
+    samples = values * 2
+    mean = sum(samples) / len(samples)
+    assert stat.count == len(samples)
+    assert stat.mean == pytest.approx(mean)
+    assert stat.m2 == pytest.approx(sum((value - mean) ** 2 for value in samples))
+
+
+def test_drift_alert_goes_to_admins_and_managers(Session):
+    db = Session()
+    try:
+        db.add(Farm(id=1, name="North", location="Somewhere"))
+        for role in ["admin", "manager", "worker", "visitor"]:
+            db.add(User(name=role, email=f"{role}@example.com", password_hash="x", role=role))
+        for feature, edges in DRIFT_BINS.items():
+            # Training data entirely in the lowest bin, checklists in the highest
+            db.add(FeatureBaseline(feature=feature, model_version="test", count=100, mean=0.0, std=0.0,
+                                   histogram=[1.0] + [0.0] * len(edges)))
+        db.commit()
+
+        for _ in range(DRIFT_MIN_SAMPLES):
+            record_checklist(checklist(99.0), db, farm_id=1)
+
+        roles = {role for role, in db.query(User.role).join(Alert, Alert.user_id == User.id)
+                 .filter(Alert.type == "data_drift").all()}
+        assert roles == {"admin", "manager"}
+        assert db.query(Alert).filter(Alert.type == "data_drift", Alert.user_id.is_(None)).count() == 0
+    finally:
+        db.close()
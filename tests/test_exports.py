@@ -0,0 +1,35 @@
+"""Export filters for rows that belong to no farm"""
+
+import os
+import sys
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import Alert, Barn, Farm
+from exports import build_export_statement
+
+
+@pytest.fixture
+def db(Session):
+    session = Session()
+    session.add_all([Farm(id=1, name="North"), Farm(id=2, name="South")])
+    session.add_all([Barn(id=1, farm_id=1, name="A"), Barn(id=2, farm_id=2, name="B")])
+    session.add_all([
+        Alert(type="risk", message="north", barn_id=1),
+        Alert(type="risk", message="south", barn_id=2),
+        Alert(type="data_drift", message="global", barn_id=None),
+    ])
+    session.commit()
+    yield session
+    session.close()
+
+
+def exported_messages(db, **kwargs):
+    stmt = build_export_statement("alerts", [1], **kwargs)
+    return sorted(row.message for row in db.execute(stmt))
+
+
+def test_alerts_without_barn_only_with_include_unscoped(db):
+    assert exported_messages(db) == ["north"]
+    assert exported_messages(db, include_unscoped=True) == ["global", "north"]
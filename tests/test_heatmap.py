@@ -0,0 +1,121 @@
+"""Incremental IDW heatmap updates"""
+
+import os
+import sys
+import numpy as np
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from heatmap import RiskHeatmapEngine
+from components import visualization
+
+
+def farm_points(n=40, seed=0):
+    rng = np.random.default_rng(seed)
+    return {
+        barn_id: (float(x), float(y), float(value))
+        for barn_id, (x, y, value) in enumerate(
+            np.column_stack([rng.uniform(0, 200, n), rng.uniform(0, 100, n), rng.uniform(1, 3, n)]), start=1
+        )
+    }
+
+
+def full_recompute(points):
+    engine = RiskHeatmapEngine(resolution=30)
+    engine.update(points)
+    return engine
+
+
+def assert_same_surface(engine, points):
+    expected = full_recompute(points)
+    assert engine.bounds == expected.bounds
+    np.testing.assert_allclose(engine.numerator, expected.numerator, rtol=1e-9, atol=1e-6)
+    np.testing.assert_allclose(engine.denominator, expected.denominator, rtol=1e-9, atol=1e-6)
+    for actual, wanted in zip(engine.surface(), expected.surface()):
+        np.testing.assert_allclose(actual, wanted, atol=0.011)
+
+
+def test_changed_risk_values_match_full_recompute():
+    points = farm_points()
+    engine = full_recompute(points)
+    numerator_before = engine.numerator.copy()
+
+    points[3] = (points[3][0], points[3][1], 3.0)
+    points[17] = (points[17][0], points[17][1], 1.0)
+    assert engine.update(points) == 2
+
+    assert not np.allclose(engine.numerator, numerator_before)
+    assert_same_surface(engine, points)
+
+
+def test_moved_added_and_removed_barns_match_full_recompute():
+    points = farm_points()
+    engine = full_recompute(points)
+
+    # Stay inside the current bounds so the incremental path is taken
+    points[5] = (points[5][0] + 3.0, points[5][1] - 2.0, points[5][2])
+    del points[9]
+    points[100] = (100.0, 50.0, 2.5)
+    bounds = engine.bounds
+    assert engine.update(points) == 3
+    assert engine.bounds == bounds
+
+    assert_same_surface(engine, points)
+
+
+def test_unchanged_points_touch_nothing():
+    points = farm_points()
+    engine = full_recompute(points)
+    assert engine.update(dict(points)) == 0
+
+
+def test_many_updates_do_not_drift():
+    rng = np.random.default_rng(1)
+    points = farm_points()
+    engine = full_recompute(points)
+    for _ in range(200):
+        barn_id = int(rng.integers(1, len(points) + 1))
+        x, y, _ = points[barn_id]
+        points[barn_id] = (x, y, float(rng.uniform(1, 3)))
+        engine.update(points)
+    assert_same_surface(engine, points)
+
+
+@pytest.mark.parametrize("change", ["grow_bounds", "most_barns"])
+def test_rebuilds_match_full_recompute(change):
+    points = farm_points()
+    engine = full_recompute(points)
+    if change == "grow_bounds":
+        points[1] = (500.0, 500.0, 3.0)
+    else:
+        points = {barn_id: (x, y, 4.0 - value) for barn_id, (x, y, value) in points.items()}
+    engine.update(points)
+    assert_same_surface(engine, points)
+
+
+def test_surface_follows_data_version_not_cache_history(monkeypatch):
+    points = farm_points(n=10)
+    loads = []
+
+    def load_points(farm_id):
+        loads.append(farm_id)
+        return dict(points)
+
+    monkeypatch.setattr(visualization, "load_barn_risk_points", load_points)
+    visualization.get_heatmap_engine.clear()
+
+    first = visualization.load_risk_surface(1, 1, 1)
+    assert visualization.load_risk_surface(1, 1, 1)[2].tobytes() == first[2].tobytes()
+    assert len(loads) == 1
+
+    points[4] = (points[4][0], points[4][1], 3.0)
+    changed = visualization.load_risk_surface(1, 2, 1)
+    assert len(loads) == 2
+    assert visualization.get_heatmap_engine(1).points == points
+
+    # Going back to an earlier version reloads rather than serving a stale surface
+    points[4] = (points[4][0], points[4][1], 1.0)
+    visualization.load_risk_surface(1, 1, 1)
+    assert len(loads) == 3
+    assert changed[2].tobytes() != visualization.get_heatmap_engine(1).surface()[2].tobytes()
@@ -0,0 +1,34 @@
+"""Micro-batcher isolation of bad requests"""
+
+import os
+import sys
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from inference import MicroBatcher, validate_feature_rows
+
+
+def score_unless_negative(rows):
+    if any(row[0] < 0 for row in rows):
+        raise RuntimeError("model rejected a row")
+    return [sum(row) for row in rows]
+
+
+def test_failing_request_does_not_fail_its_batch():
+    batcher = MicroBatcher(score_unless_negative, max_wait_ms=200, validate=validate_feature_rows)
+    good = [[1.0] * 7]
+    futures = [batcher.submit(good), batcher.submit([[-1.0] + [1.0] * 6]), batcher.submit(good)]
+
+    assert futures[0].result(5) == [7.0]
+    assert futures[2].result(5) == [7.0]
+    with pytest.raises(RuntimeError):
+        futures[1].result(5)
+
+
+@pytest.mark.parametrize("rows", [[[1.0] * 6], [[float("nan")] * 7], [["high"] * 7]])
+def test_malformed_rows_are_rejected_before_queueing(rows):
+    batcher = MicroBatcher(score_unless_negative, validate=validate_feature_rows)
+    with pytest.raises(ValueError):
+        batcher.submit(rows).result(5)
+    assert batcher.queue.empty()
@@ -0,0 +1,41 @@
+"""Schema migration of databases created by older versions"""
+
+import logging
+import os
+import sys
+import pytest
+from sqlalchemy import create_engine, inspect, text
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+
+
+@pytest.fixture
+def old_engine(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE barns (id INTEGER PRIMARY KEY, name VARCHAR(100))"))
+        conn.execute(text("CREATE TABLE checklists (id INTEGER PRIMARY KEY, barn_id INTEGER)"))
+        conn.execute(text("CREATE TABLE incidents (id INTEGER PRIMARY KEY, barn_id INTEGER)"))
+        conn.execute(text("INSERT INTO checklists (barn_id) VALUES (1)"))
+    monkeypatch.setattr(database, "get_engine", lambda: engine)
+    yield engine
+    engine.dispose()
+
+
+def test_adds_missing_columns_once(old_engine, caplog):
+    with caplog.at_level(logging.ERROR):
+        database.migrate_schema()
+        database.migrate_schema()
+    assert not [record for record in caplog.records if record.levelno >= logging.ERROR]
+
+    inspector = inspect(old_engine)
+    for table in ["checklists", "incidents"]:
+        columns = {column["name"] for column in inspector.get_columns(table)}
+        assert {"approved", "approved_by", "approved_at", "client_uuid"} <= columns
+        assert f"ix_{table}_client_uuid" in {index["name"] for index in inspector.get_indexes(table)}
+    assert "risk_snapshot" in {column["name"] for column in inspector.get_columns("barns")}
+
+    with old_engine.connect() as conn:
+        assert conn.execute(text("SELECT approved FROM checklists")).scalar() == 0
@@ -0,0 +1,114 @@
+"""Dirty-barn marks racing the scheduler's batch delete, and interrupted runs"""
+
+import os
+import sys
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import event
+from sqlalchemy.orm import sessionmaker
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import Farm, Barn, DirtyBarn, RiskRecomputeRun
+from risk_scheduler import fail_stale_runs, mark_barns_dirty, recompute_batch
+from conftest import run_in_lockstep
+
+
+@pytest.fixture
+def Session(engine):
+    Session = sessionmaker(bind=engine, autoflush=False)
+    db = Session()
+    db.add(Farm(id=1, name="Farm"))
+    db.add(Barn(id=1, farm_id=1, name="B1"))
+    db.commit()
+    db.close()
+    return Session
+
+
+def _dirty(db):
+    return [(barn_id, marked_at) for barn_id, marked_at in db.query(DirtyBarn.barn_id, DirtyBarn.marked_at).all()]
+
+
+def no_scores(checklists):
+    return []
+
+
+def test_mark_interleaved_with_batch_delete(Session):
+    approval, scheduler = Session(), Session()
+    try:
+        mark_barns_dirty([1], approval)
+        approval.commit()
+        dirty = _dirty(scheduler)
+
+        # The scheduler clears the queue at the approval's flush, i.e. between
+        # reading and writing the row; a mark without a flush meets the delete
+        # after it commits instead. Either way the barn must stay queued.
+        cleared = []
+
+        def clear_queue(*args):
+            if not cleared:
+                cleared.append(True)
+                recompute_batch(scheduler, dirty, score=no_scores)
+
+        event.listen(approval, "before_flush", clear_queue)
+        mark_barns_dirty([1], approval)
+        approval.commit()
+        clear_queue()
+
+        assert [barn_id for barn_id, _ in _dirty(scheduler)] == [1]
+    finally:
+        approval.close()
+        scheduler.close()
+
+
+def test_remark_during_batch_stays_queued(Session):
+    approval, scheduler = Session(), Session()
+    try:
+        mark_barns_dirty([1], approval)
+        approval.commit()
+
+        # The scheduler snapshots the queue, then the barn is marked again before it deletes
+        dirty = _dirty(scheduler)
+        mark_barns_dirty([1], approval)
+        approval.commit()
+        recompute_batch(scheduler, dirty, score=no_scores)
+
+        assert [barn_id for barn_id, _ in _dirty(scheduler)] == [1]
+    finally:
+        approval.close()
+        scheduler.close()
+
+
+def test_concurrent_first_marks(Session):
+    barn_ids = list(range(100, 150))
+
+    def approve(db, barn_id):
+        mark_barns_dirty([barn_id], db)
+        db.commit()
+
+    run_in_lockstep(Session, barn_ids, approve)
+    db = Session()
+    try:
+        assert db.query(DirtyBarn).filter(DirtyBarn.barn_id.in_(barn_ids)).count() == len(barn_ids)
+    finally:
+        db.close()
+
+
+def test_interrupted_runs_are_marked_failed(Session):
+    now = datetime.utcnow()
+    db = Session()
+    try:
+        db.add_all([
+            RiskRecomputeRun(id=1, status="running", started_at=now - timedelta(hours=2)),
+            RiskRecomputeRun(id=2, status="running", started_at=now - timedelta(seconds=5)),
+            RiskRecomputeRun(id=3, status="completed", started_at=now - timedelta(hours=3),
+                             finished_at=now - timedelta(hours=3)),
+        ])
+        db.commit()
+
+        assert fail_stale_runs(db, max_age_seconds=600) == 1
+        statuses = dict(db.query(RiskRecomputeRun.id, RiskRecomputeRun.status).all())
+        assert statuses == {1: "failed", 2: "running", 3: "completed"}
+        assert db.get(RiskRecomputeRun, 1).finished_at is not None
+    finally:
+        db.close()
@@ -0,0 +1,103 @@
+"""Scenario scoring pool and barn feature loading"""
+
+import os
+import sys
+from datetime import datetime
+import numpy as np
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import scenarios
+from ai_engine import FarmRiskPredictor
+from database import get_latest_approved_checklists
+from models import Checklist
+
+
+class SumPredictor:
+    """Picklable stand-in for FarmRiskPredictor: P(class) from the feature sum"""
+
+    model_version = "sum-1"
+
+    def predict_risk_batch(self, features):
+        high = (np.asarray(features).sum(axis=1) % 10) / 10.0
+        probabilities = np.column_stack([1.0 - high, np.zeros(len(high)), high])
+        return probabilities.argmax(axis=1), probabilities
+
+
+@pytest.fixture
+def small_parallel_threshold(monkeypatch):
+    monkeypatch.setattr(scenarios, "PARALLEL_MIN_ROWS", 10)
+    yield
+    if scenarios._pool is not None:
+        scenarios._reset_pool(scenarios._pool)
+
+
+def test_pool_is_spawned_once_and_reused(small_parallel_threshold):
+    predictor = SumPredictor()
+    features = np.arange(700, dtype=float).reshape(100, 7)
+
+    first = scenarios._score(predictor, features, workers=2)
+    pool = scenarios._pool
+    second = scenarios._score(predictor, features, workers=2)
+
+    assert pool is scenarios._pool
+    assert pool._mp_context.get_start_method() == "spawn"
+    np.testing.assert_allclose(first, predictor.predict_risk_batch(features)[1])
+    np.testing.assert_allclose(second, first)
+
+
+def test_broken_pool_is_replaced(small_parallel_threshold):
+    predictor = SumPredictor()
+    features = np.arange(700, dtype=float).reshape(100, 7)
+    scenarios._score(predictor, features, workers=2)
+    broken = scenarios._pool
+    for process in list(broken._processes.values()):
+        process.kill()
+        process.join()
+
+    np.testing.assert_allclose(
+        scenarios._score(predictor, features, workers=2),
+        predictor.predict_risk_batch(features)[1]
+    )
+    assert scenarios._pool is None
+
+    scenarios._score(predictor, features, workers=2)
+    assert scenarios._pool is not None and scenarios._pool is not broken
+
+
+def test_latest_checklist_tie_goes_to_the_higher_id(Session):
+    submitted_at = datetime(2026, 1, 1, 8, 0)
+    db = Session()
+    try:
+        db.add_all([
+            Checklist(id=1, barn_id=1, hygiene_score=5, approved=True, submitted_at=submitted_at),
+            Checklist(id=2, barn_id=1, hygiene_score=6, approved=True, submitted_at=submitted_at),
+            Checklist(id=3, barn_id=1, hygiene_score=9, approved=False, submitted_at=datetime(2026, 1, 2)),
+            Checklist(id=4, barn_id=2, hygiene_score=4, approved=True, submitted_at=submitted_at),
+        ])
+        db.commit()
+        latest = {checklist.barn_id: checklist.id for checklist in get_latest_approved_checklists([1, 2, 3], db)}
+    finally:
+        db.close()
+    assert latest == {1: 2, 2: 4}
+
+
+def test_barn_features_match_the_predictor(Session, monkeypatch):
+    db = Session()
+    db.add(Checklist(id=1, barn_id=1, hygiene_score=6, mortality_count=0, feed_quality=None,
+                     water_quality=9, ventilation_score=5, temperature=0.0, humidity=40.0,
+                     approved=True, submitted_at=datetime(2026, 1, 1)))
+    db.commit()
+    db.close()
+    monkeypatch.setattr(scenarios, "get_db", Session)
+
+    predictor = FarmRiskPredictor()
+    features = scenarios.load_barn_features([1, 2], predictor=predictor)
+
+    db = Session()
+    try:
+        assert features[1] == predictor.checklist_features(db.get(Checklist, 1))
+    finally:
+        db.close()
+    assert features[2] == predictor.feature_defaults
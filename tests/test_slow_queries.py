@@ -0,0 +1,88 @@
+"""Slow-query plan capture"""
+
+import os
+import sys
+import pytest
+from sqlalchemy import create_engine, text
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import slow_queries
+from slow_queries import install_slow_query_recorder, is_explainable
+
+
+class FakeCursor:
+    """DB-API cursor recording statements; EXPLAIN fails when fail is set"""
+
+    def __init__(self, log, fail):
+        self.log = log
+        self.fail = fail
+        self.connection = self
+
+    def cursor(self):
+        return self
+
+    def execute(self, statement, parameters=None):
+        self.log.append(statement)
+        if statement.startswith("EXPLAIN") and self.fail:
+            raise RuntimeError("explain failed")
+
+    def fetchall(self):
+        return [("Seq Scan on barns",)]
+
+    def close(self):
+        pass
+
+
+@pytest.fixture(autouse=True)
+def empty_caches():
+    slow_queries._plans.clear()
+    slow_queries.clear_slow_queries()
+    yield
+    slow_queries._plans.clear()
+    slow_queries.clear_slow_queries()
+
+
+@pytest.mark.parametrize("statement, expected", [
+    ("SELECT * FROM barns", True),
+    ("  select id from barns", True),
+    ("SELECT * FROM dirty_barns\nFOR UPDATE", False),
+    ("SELECT * FROM feature_stats FOR UPDATE SKIP LOCKED", False),
+    ("UPDATE barns SET name = 'x'", False),
+    ("INSERT INTO barns (name) VALUES ('x')", False),
+])
+def test_only_plain_selects_are_explained(statement, expected):
+    assert is_explainable(statement) == expected
+
+
+def test_postgres_explain_is_plain_and_wrapped_in_a_savepoint():
+    log = []
+    plan = slow_queries._explain(FakeCursor(log, fail=False), "postgresql", "SELECT * FROM barns", ())
+    assert plan == "Seq Scan on barns"
+    assert log == [
+        "SAVEPOINT slow_query_explain",
+        "EXPLAIN SELECT * FROM barns",
+        "RELEASE SAVEPOINT slow_query_explain",
+    ]
+
+
+def test_failed_postgres_explain_rolls_back_to_the_savepoint():
+    log = []
+    with pytest.raises(RuntimeError):
+        slow_queries._explain(FakeCursor(log, fail=True), "postgresql", "SELECT * FROM barns", ())
+    assert "ROLLBACK TO SAVEPOINT slow_query_explain" in log
+    assert log[-1] == "RELEASE SAVEPOINT slow_query_explain"
+
+
+def test_sqlite_slow_select_is_recorded_with_its_plan(tmp_path):
+    engine = install_slow_query_recorder(create_engine(f"sqlite:///{tmp_path / 'slow.db'}"), threshold_ms=0)
+    try:
+        with engine.begin() as conn:
+            conn.execute(text("CREATE TABLE barns (id INTEGER PRIMARY KEY, name TEXT)"))
+            conn.execute(text("SELECT * FROM barns WHERE name = 'x'"))
+    finally:
+        engine.dispose()
+
+    records = {record["statement"]: record for record in slow_queries.get_slow_queries()}
+    assert records["SELECT * FROM barns WHERE name = 'x'"]["plan"]
+    assert records["CREATE TABLE barns (id INTEGER PRIMARY KEY, name TEXT)"]["plan"] is None
@@ -0,0 +1,86 @@
+"""Per-farm barn grid index and its invalidation"""
+
+import os
+import sys
+from datetime import datetime
+import numpy as np
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import spatial_index
+from database import get_barn_set_versions
+from models import Barn, Farm
+from spatial_index import BarnGridIndex, BarnPoint, Viewport, get_scope_version, query_barns
+
+
+def random_barns(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return [
+        BarnPoint(i, 1, f"B{i}", 100, "low", float(x), float(y), 0.0)
+        for i, (x, y) in enumerate(rng.uniform(-200, 400, size=(n, 2)))
+    ]
+
+
+def brute_force(barns, viewport):
+    return sorted(
+        barn.id for barn in barns
+        if viewport.x_min <= barn.x <= viewport.x_max and viewport.y_min <= barn.y <= viewport.y_max
+    )
+
+
+@pytest.mark.parametrize("viewport", [
+    Viewport(0, 50, 0, 50),            # a few cells
+    Viewport(-1000, 1000, -1000, 1000),  # more cells than populated
+    Viewport(25, 25, 25, 25),          # on a cell edge
+    Viewport(900, 950, 900, 950),      # outside the barns
+    Viewport(-200, 400, 100, 101),     # a thin strip
+])
+def test_grid_query_matches_brute_force(viewport):
+    barns = random_barns(500)
+    index = BarnGridIndex(barns)
+    assert sorted(barn.id for barn in index.query(viewport)) == brute_force(barns, viewport)
+
+
+def test_empty_index():
+    index = BarnGridIndex([])
+    assert index.bounds is None
+    assert index.query(Viewport(0, 1, 0, 1)) == []
+
+
+@pytest.fixture
+def farm_db(Session, monkeypatch):
+    monkeypatch.setattr(spatial_index, "get_db", Session)
+    spatial_index.get_farm_barn_index.clear()
+    db = Session()
+    db.add(Farm(id=1, name="North"))
+    db.add_all([Barn(id=1, farm_id=1, name="A", position_x=0.0, position_y=0.0),
+                Barn(id=2, farm_id=1, name="B", position_x=30.0, position_y=0.0)])
+    db.commit()
+    yield db
+    db.close()
+    spatial_index.get_farm_barn_index.clear()
+
+
+def test_new_barn_changes_the_version_and_rebuilds_the_index(farm_db):
+    scope = get_scope_version([1])
+    assert sorted(barn.id for barn in query_barns(scope)) == [1, 2]
+
+    farm_db.add(Barn(id=3, farm_id=1, name="C", position_x=60.0, position_y=0.0))
+    farm_db.commit()
+
+    # The old fingerprint still maps to the cached index; the new one is rebuilt
+    new_scope = get_scope_version([1])
+    assert new_scope != scope
+    assert sorted(barn.id for barn in query_barns(scope)) == [1, 2]
+    assert sorted(barn.id for barn in query_barns(new_scope)) == [1, 2, 3]
+    assert [barn.id for barn in query_barns(new_scope, Viewport(50, 70, -5, 5))] == [3]
+
+
+def test_barn_set_version_tracks_last_updated(farm_db):
+    before = get_barn_set_versions(farm_db, [1])
+    barn = farm_db.get(Barn, 2)
+    barn.position_y = 40.0
+    barn.last_updated = datetime(2030, 1, 1)
+    farm_db.commit()
+    assert get_barn_set_versions(farm_db, [1]) != before
@@ -0,0 +1,73 @@
+"""Time-series bucketing and LTTB downsampling"""
+
+import os
+import sys
+from datetime import date, timedelta
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from timeseries import bucket_series, choose_bucket, downsample, lttb_indices
+
+
+@pytest.mark.parametrize("n, threshold", [(1000, 100), (1000, 3), (101, 50), (10, 9)])
+def test_lttb_keeps_endpoints_and_size_with_increasing_indices(n, threshold):
+    rng = np.random.default_rng(0)
+    x = np.arange(n, dtype=float)
+    y = rng.normal(size=n).cumsum()
+
+    indices = lttb_indices(x, y, threshold)
+
+    assert len(indices) == threshold
+    assert indices[0] == 0 and indices[-1] == n - 1
+    assert np.all(np.diff(indices) > 0)
+
+
+@pytest.mark.parametrize("threshold", [2, 10, 20])
+def test_lttb_keeps_every_point_when_threshold_cannot_reduce(threshold):
+    np.testing.assert_array_equal(lttb_indices(np.arange(10), np.zeros(10), threshold), np.arange(10))
+
+
+def test_lttb_keeps_a_spike():
+    y = np.zeros(1000)
+    y[537] = 100.0
+    assert 537 in lttb_indices(np.arange(1000), y, 50)
+
+
+@pytest.mark.parametrize("days, expected", [
+    (1, ("D", "Daily")),
+    (92, ("D", "Daily")),
+    (93, ("W-MON", "Weekly")),
+    (730, ("W-MON", "Weekly")),
+    (731, ("MS", "Monthly")),
+])
+def test_choose_bucket_by_range_length(days, expected):
+    start = date(2025, 1, 1)
+    assert choose_bucket(start, start + timedelta(days=days - 1)) == expected
+
+
+def test_bucket_series_drops_empty_buckets():
+    df = pd.DataFrame({
+        "day": pd.to_datetime(["2025-01-01", "2025-01-01", "2025-01-03"]),
+        "value": [1.0, 3.0, 5.0],
+    })
+    mean = bucket_series(df, "day", "value", "mean", "D")
+    count = bucket_series(df, "day", "value", "count", "D")
+
+    assert mean["value"].tolist() == [2.0, 5.0]
+    assert count["value"].tolist() == [2, 1]
+
+
+def test_downsample_caps_rows_and_keeps_first_and_last():
+    df = pd.DataFrame({
+        "day": pd.date_range("2020-01-01", periods=2000, freq="D"),
+        "value": np.sin(np.arange(2000) / 10.0),
+    })
+    reduced = downsample(df, "day", "value", max_points=400)
+
+    assert len(reduced) == 400
+    assert reduced["day"].iloc[0] == df["day"].iloc[0]
+    assert reduced["day"].iloc[-1] == df["day"].iloc[-1]
+    assert reduced["day"].is_monotonic_increasing
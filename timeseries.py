@@ -0,0 +1,102 @@
+"""
+Server-side reduction of analytics time series before they reach Plotly.
+
+Long date ranges are first bucketed (day/week/month) according to the
+selected range, then capped with Largest-Triangle-Three-Buckets (LTTB)
+downsampling so the rendered figure stays a bounded size.
+"""
+
+import numpy as np
+import pandas as pd
+
+MAX_CHART_POINTS = 400
+
+# (max days in range, pandas frequency, label)
+BUCKET_RULES = [
+    (92, "D", "Daily"),
+    (730, "W-MON", "Weekly"),
+    (None, "MS", "Monthly"),
+]
+
+
+def choose_bucket(start_date, end_date):
+    """Pick the bucket frequency and label for a date range"""
+    days = (end_date - start_date).days + 1
+    for max_days, freq, label in BUCKET_RULES:
+        if max_days is None or days <= max_days:
+            return freq, label
+    return BUCKET_RULES[-1][1], BUCKET_RULES[-1][2]
+
+
+def bucket_series(df, date_column, value_column, agg, freq):
+    """Aggregate a value column into date buckets, dropping empty buckets"""
+    frame = df[[date_column, value_column]].copy()
+    frame[date_column] = pd.to_datetime(frame[date_column])
+
+    grouped = frame.groupby(pd.Grouper(key=date_column, freq=freq, label="left", closed="left"))
+    if agg == "count":
+        series = grouped.size().rename(value_column)
+        series = series[series > 0]
+    else:
+        series = grouped[value_column].agg(agg)
+        counts = grouped[value_column].count()
+        series = series[counts > 0]
+
+    return series.reset_index()
+
+
+def lttb_indices(x, y, threshold):
+    """Return indices of the points kept by Largest-Triangle-Three-Buckets"""
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+
+    indices = np.empty(threshold, dtype=int)
+    indices[0] = 0
+    indices[-1] = n - 1
+
+    # Bucket edges over the interior points
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    selected = 0
+
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_start = end
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        bucket_x = x[start:end]
+        bucket_y = y[start:end]
+
+        # Area of the triangle (selected point, candidate, next bucket mean)
+        areas = np.abs(
+            (x[selected] - avg_x) * (bucket_y - y[selected])
+            - (x[selected] - bucket_x) * (avg_y - y[selected])
+        )
+        selected = start + int(areas.argmax())
+        indices[i + 1] = selected
+
+    return indices
+
+
+def downsample(df, date_column, value_column, max_points=MAX_CHART_POINTS):
+    """Cap a sorted series at max_points rows using LTTB"""
+    if len(df) <= max_points:
+        return df
+
+    x = pd.to_datetime(df[date_column]).astype("int64").to_numpy()
+    keep = lttb_indices(x, df[value_column].to_numpy(), max_points)
+    return df.iloc[keep].reset_index(drop=True)
+
+
+def prepare_time_series(df, date_column, value_column, agg, start_date, end_date,
+                        max_points=MAX_CHART_POINTS):
+    """Bucket and downsample a series for plotting; returns (frame, bucket label)"""
+    freq, label = choose_bucket(start_date, end_date)
+    series = bucket_series(df, date_column, value_column, agg, freq)
+    return downsample(series, date_column, value_column, max_points), label
@@ -53,6 +53,7 @@ translations = {
         "updating_predictions": "Updating AI predictions...",
         "predictions_updated": "AI predictions updated successfully!",
         "predictions_error": "Error updating predictions",
+        "predictions_queued": "Risk update queued. Barns will refresh in the background.",
         
         # Admin Panel
         "user_management": "User Management",
@@ -189,6 +190,7 @@ translations = {
         "updating_predictions": "Actualizando predicciones IA...",
         "predictions_updated": "¡Predicciones IA actualizadas exitosamente!",
         "predictions_error": "Error al actualizar predicciones",
+        "predictions_queued": "Actualización de riesgo en cola. Los establos se actualizarán en segundo plano.",
         
         # Panel de Administrador
         "user_management": "Gestión de Usuarios",
@@ -6,8 +6,11 @@ from PIL import Image
 import pandas as pd
 from datetime import datetime
 import os
-from database import get_db, get_accessible_farm_ids
+from database import get_db, get_read_db, get_accessible_farm_ids
 from models import Alert, User, Barn, Farm
+from logging_setup import get_logger
+
+logger = get_logger(__name__)
 
 def generate_qr_code(data):
     """Generate QR code for given data"""
@@ -59,7 +62,7 @@ def create_alert(alert_type, message, severity="medium", barn_id=None, user_id=N
         return True
     except Exception as e:
         db.rollback()
-        print(f"Error creating alert: {e}")
+        logger.exception("Error creating alert")
         return False
     finally:
         db.close()
@@ -158,7 +161,7 @@ def display_alerts_sidebar():
 
 def get_dashboard_metrics():
     """Get key metrics for dashboard filtered by user's assigned farms"""
-    db = get_db()
+    db = get_read_db(st.session_state.get('user').id)
     try:
         from models import Barn, Checklist, Incident
         